@@ -0,0 +1,453 @@
+"""
+HTTP/JSON API прачечной на стандартной библиотеке
+
+Сервер многопоточный (поток на соединение) и работает по HTTP/1.1:
+соединения keep-alive переиспользуются, конвейерные запросы одного
+соединения обрабатываются по очереди. К базе каждый запрос обращается
+через общий пул соединений Database.
+
+    python -m src.api --port 8000 --db laundry.db
+
+Маршруты:
+    GET    /clients?page_token=&limit=        страница клиентов
+    GET    /clients/search?q=&limit=          поиск клиентов по ФИО, email, телефону
+    POST   /clients                           регистрация клиента
+    GET    /clients/<id>                      клиент
+    DELETE /clients/<id>                      удаление клиента
+    GET    /clients/<id>/applications         заявки клиента со связанными данными
+    GET    /applications?page_token=&limit=   страница заявок со связанными данными
+    POST   /applications                      создание заявки
+    GET    /applications/<id>                 заявка
+    PATCH  /applications/<id>                 смена статуса {"status": "COMPLETED", "version": 3}
+    GET    /applications/<id>/history         история смены статусов заявки
+    POST   /applications/<id>/payments        оплата заявки (заголовок Idempotency-Key)
+    GET    /applications/<id>/payments        платежи заявки
+    DELETE /applications/<id>                 удаление заявки
+    GET    /statuses/application              статусы заявок (ETag)
+    GET    /statuses/pollution                степени загрязнения (ETag)
+    GET    /export/<json|csv|xml|yaml|columnar> выгрузка всех заявок
+    GET    /metrics?format=json|prometheus    статистика запросов к БД (с --metrics)
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import traceback
+import zlib
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from src.database.db import Database
+from src.database.metrics import QueryMetrics
+from src.export_db import FORMATS
+from src.main import LaundrySystem
+from src.repository.repository import StatusConflictError, DuplicatePhoneError
+
+
+# Ответы меньше этого размера не сжимаются: выигрыш меньше накладных расходов
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 5
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_CONTENT_TYPES = {
+    "json": "application/json; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "xml": "application/xml; charset=utf-8",
+    "yaml": "application/yaml; charset=utf-8",
+    "columnar": "application/octet-stream",
+}
+
+
+class HTTPError(Exception):
+    """Ошибка, которая отдается клиенту с заданным кодом ответа"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def to_dict(model):
+    """Модель с __slots__ -> словарь для JSON"""
+    return {name: getattr(model, name) for name in model.__slots__}
+
+
+class LaundryRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "LaundryAPI/1.0"
+    # Заголовки и тело уходят отдельными send: без TCP_NODELAY алгоритм Нейгла
+    # вместе с отложенным ACK задерживает ответы keep-alive на десятки мс
+    disable_nagle_algorithm = True
+    # Простаивающее keep-alive соединение закрывается через timeout секунд
+    timeout = 30
+
+    ROUTES = [
+        ("GET", re.compile(r"^/clients$"), "list_clients"),
+        ("POST", re.compile(r"^/clients$"), "create_client"),
+        ("GET", re.compile(r"^/clients/search$"), "search_clients"),
+        ("GET", re.compile(r"^/clients/(\d+)$"), "get_client"),
+        ("DELETE", re.compile(r"^/clients/(\d+)$"), "delete_client"),
+        ("GET", re.compile(r"^/clients/(\d+)/applications$"), "client_applications"),
+        ("GET", re.compile(r"^/applications$"), "list_applications"),
+        ("POST", re.compile(r"^/applications$"), "create_application"),
+        ("GET", re.compile(r"^/applications/(\d+)$"), "get_application"),
+        ("PATCH", re.compile(r"^/applications/(\d+)$"), "update_application_status"),
+        ("DELETE", re.compile(r"^/applications/(\d+)$"), "delete_application"),
+        ("GET", re.compile(r"^/applications/(\d+)/history$"), "application_history"),
+        ("POST", re.compile(r"^/applications/(\d+)/payments$"), "pay_application"),
+        ("GET", re.compile(r"^/applications/(\d+)/payments$"), "application_payments"),
+        ("GET", re.compile(r"^/statuses/application$"), "application_statuses"),
+        ("GET", re.compile(r"^/statuses/pollution$"), "pollution_statuses"),
+        ("GET", re.compile(r"^/export/(\w+)$"), "export"),
+        ("GET", re.compile(r"^/metrics$"), "metrics"),
+    ]
+
+    @property
+    def system(self):
+        return self.server.system
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self, method):
+        self.response_started = False
+        try:
+            url = urlsplit(self.path)
+            self.query = parse_qs(url.query)
+            # Тело читается до обработки, иначе при ошибке оно останется в сокете
+            # и будет принято за следующий запрос соединения
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                # Непрочитанное тело нельзя отделить от следующего запроса
+                self.close_connection = True
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Неверный заголовок Content-Length")
+            self.body = self.rfile.read(length) if length else b""
+            allowed = False
+            for route_method, pattern, handler_name in self.ROUTES:
+                match = pattern.match(url.path)
+                if not match:
+                    continue
+                allowed = True
+                if route_method == method:
+                    return getattr(self, handler_name)(*match.groups())
+            if allowed:
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Метод не поддерживается")
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Ресурс не найден")
+        except HTTPError as e:
+            self.send_error_json(e.message, e.status)
+        except (StatusConflictError, DuplicatePhoneError) as e:
+            self.send_error_json(str(e), HTTPStatus.CONFLICT)
+        except ValueError as e:
+            self.send_error_json(str(e), HTTPStatus.BAD_REQUEST)
+        except sqlite3.IntegrityError as e:
+            self.send_error_json(f"Нарушение целостности данных: {e}", HTTPStatus.CONFLICT)
+        except Exception:
+            # Непредвиденная ошибка: клиент получает 500, а не оборванное соединение
+            sys.stderr.write(f"Ошибка обработки {method} {self.path}\n")
+            traceback.print_exc()
+            self.send_error_json("Внутренняя ошибка сервера", HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def send_response(self, code, message=None):
+        self.response_started = True
+        super().send_response(code, message)
+
+    def send_error_json(self, message, status):
+        """Ответ с ошибкой; если ответ уже начат (потоковая выгрузка), соединение закрывается"""
+        if self.response_started:
+            self.close_connection = True
+            return
+        self.send_json({"error": message}, status)
+
+    # Запрос
+
+    def read_json(self):
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Тело запроса должно быть JSON") from None
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Тело запроса должно быть JSON-объектом")
+        return data
+
+    def required(self, data, *fields):
+        missing = [field for field in fields if data.get(field) in (None, "")]
+        if missing:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Не заполнены поля: {', '.join(missing)}")
+        return [data[field] for field in fields]
+
+    def int_field(self, value, field):
+        """Целое из JSON: число или строка цифр (bool, списки и объекты - 400)"""
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Поле {field} должно быть целым числом")
+        try:
+            return int(value)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Поле {field} должно быть целым числом") from None
+
+    def str_field(self, value, field):
+        if not isinstance(value, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Поле {field} должно быть строкой")
+        return value
+
+    def page_params(self):
+        page_token = self.query.get("page_token", [None])[0]
+        limit = self.query.get("limit", ["50"])[0]
+        if not limit.isdigit() or not 1 <= int(limit) <= 1000:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit должен быть числом от 1 до 1000")
+        return page_token, int(limit)
+
+    def accepts_gzip(self):
+        return "gzip" in self.headers.get("Accept-Encoding", "")
+
+    # Ответ
+
+    def send_json(self, data, status=HTTPStatus.OK, etag=None):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_body(body, "application/json; charset=utf-8", status, etag)
+
+    def send_body(self, body, content_type, status=HTTPStatus.OK, etag=None):
+        gzipped = self.accepts_gzip() and len(body) >= GZIP_MIN_SIZE
+        if gzipped:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Vary", "Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_conditional_json(self, data):
+        """Ответ с ETag; при совпадении If-None-Match тело не передается (304)"""
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+        if_none_match = self.headers.get("If-None-Match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_body(body, "application/json; charset=utf-8", etag=etag)
+
+    def send_chunked_file(self, path, content_type):
+        """Передает файл порциями (Transfer-Encoding: chunked), при возможности сжимая на лету"""
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if self.accepts_gzip() else None
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Vary", "Accept-Encoding")
+        if compressor:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.write_chunk(compressor.compress(chunk) if compressor else chunk)
+        if compressor:
+            self.write_chunk(compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data):
+        if data:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    # Клиенты
+
+    def list_clients(self):
+        clients, next_token = self.system.client_repo.find_page(*self.page_params())
+        self.send_json({"items": [to_dict(client) for client in clients], "next_page_token": next_token})
+
+    def search_clients(self):
+        query = self.query.get("q", [""])[0]
+        limit = self.query.get("limit", ["10"])[0]
+        if not limit.isdigit() or not 1 <= int(limit) <= 100:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit должен быть числом от 1 до 100")
+        clients = self.system.search_clients(query, int(limit))
+        self.send_json({"items": [to_dict(client) for client in clients]})
+
+    def create_client(self):
+        data = self.read_json()
+        last_name, name, patronymic, phone_number, email = self.required(
+            data, "last_name", "name", "patronymic", "phone_number", "email")
+        client = self.system.create_client(
+            self.str_field(last_name, "last_name"), self.str_field(name, "name"),
+            self.str_field(patronymic, "patronymic"), self.int_field(phone_number, "phone_number"),
+            self.str_field(email, "email"))
+        self.send_json(to_dict(client), HTTPStatus.CREATED)
+
+    def get_client(self, client_id):
+        client = self.system.get_client_by_id(int(client_id))
+        if not client:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Клиент с ID {client_id} не существует")
+        self.send_json(to_dict(client))
+
+    def delete_client(self, client_id):
+        if not self.system.delete_client(int(client_id)):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Клиент с ID {client_id} не существует")
+        self.send_json({"deleted": True})
+
+    def client_applications(self, client_id):
+        self.send_json({"items": self.system.get_client_applications_with_relations(int(client_id))})
+
+    # Заявки
+
+    def list_applications(self):
+        applications, next_token = self.system.application_repo.find_page_with_relations(*self.page_params())
+        self.send_json({"items": applications, "next_page_token": next_token})
+
+    def create_application(self):
+        data = self.read_json()
+        client_id, pollution_status_id, number_of_items = self.required(
+            data, "client_id", "pollution_status", "number_of_items")
+        slot_id = data.get("slot_id")
+        application = self.system.create_application(
+            self.int_field(client_id, "client_id"), self.str_field(pollution_status_id, "pollution_status"),
+            self.str_field(data.get("status", "IN_PROGRESS"), "status"),
+            self.int_field(number_of_items, "number_of_items"),
+            self.int_field(slot_id, "slot_id") if slot_id is not None else None)
+        self.send_json(to_dict(application), HTTPStatus.CREATED)
+
+    def get_application(self, application_id):
+        application = self.system.application_repo.find_by_id(int(application_id))
+        if not application:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Заявка с ID {application_id} не существует")
+        self.send_json(to_dict(application))
+
+    def update_application_status(self, application_id):
+        data = self.read_json()
+        status_id, = self.required(data, "status")
+        # version - необязательная проверка оптимистичной блокировки, при расхождении 409
+        version = data.get("version")
+        self.system.update_application_status(int(application_id), self.str_field(status_id, "status"),
+                                              self.int_field(version, "version") if version is not None else None)
+        self.send_json(to_dict(self.system.application_repo.find_by_id(int(application_id))))
+
+    def application_history(self, application_id):
+        self.send_json(self.system.get_application_status_history(int(application_id)))
+
+    def pay_application(self, application_id):
+        # Клиент повторяет запрос с тем же ключом, пока не получит ответ: деньги спишутся один раз
+        idempotency_key = self.headers.get("Idempotency-Key") or self.read_json().get("idempotency_key")
+        if not idempotency_key:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Не задан ключ идемпотентности (заголовок Idempotency-Key)")
+        payment = self.system.pay_application(int(application_id), self.str_field(idempotency_key, "idempotency_key"))
+        status = HTTPStatus.CREATED if payment.status == 'SUCCEEDED' else HTTPStatus.PAYMENT_REQUIRED
+        self.send_json(to_dict(payment), status)
+
+    def application_payments(self, application_id):
+        self.send_json({"items": [to_dict(payment)
+                                  for payment in self.system.get_application_payments(int(application_id))]})
+
+    def delete_application(self, application_id):
+        if not self.system.delete_application(int(application_id)):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Заявка с ID {application_id} не существует")
+        self.send_json({"deleted": True})
+
+    # Справочники
+
+    def application_statuses(self):
+        self.send_conditional_json([to_dict(status) for status in self.system.get_all_application_statuses()])
+
+    def pollution_statuses(self):
+        self.send_conditional_json([to_dict(status) for status in self.system.get_all_pollution_statuses()])
+
+    # Экспорт
+
+    def export(self, fmt):
+        if fmt not in FORMATS:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Неизвестный формат экспорта: {fmt}")
+        file_name, writer = FORMATS[fmt]
+        # Выгрузка пишется потоково во временный файл и отдается порциями,
+        # поэтому память сервера не зависит от размера таблицы
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(file_name)[1])
+        os.close(fd)
+        try:
+            writer(self.system.application_repo.iter_all_with_relations(), path)
+            self.send_chunked_file(path, EXPORT_CONTENT_TYPES[fmt])
+        finally:
+            os.remove(path)
+
+    # Статистика
+
+    def metrics(self):
+        metrics = self.system.db.metrics
+        if metrics is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Замер запросов выключен (запустите с --metrics)")
+        fmt = self.query.get("format", [""])[0]
+        if fmt == "prometheus" or (not fmt and "text/plain" in self.headers.get("Accept", "")):
+            self.send_body(metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+        elif fmt in ("", "json"):
+            self.send_json(metrics.snapshot())
+        else:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "format должен быть json или prometheus")
+
+
+class LaundryHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь входящих соединений больше стандартных 5 для пиковой нагрузки
+    request_queue_size = 128
+
+    def __init__(self, address, system, verbose=False):
+        self.system = system
+        self.verbose = verbose
+        super().__init__(address, LaundryRequestHandler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON API прачечной")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", default="laundry.db", help="путь к файлу базы данных")
+    parser.add_argument("--pool-size", type=int, default=8, help="размер пула соединений с базой")
+    parser.add_argument("--cache-size", type=int, default=None, help="размер LRU-кэша клиентов и заявок")
+    parser.add_argument("--verbose", action="store_true", help="журналировать каждый запрос")
+    parser.add_argument("--metrics", action="store_true", help="замерять запросы к БД и отдавать /metrics")
+    parser.add_argument("--slow-query-ms", type=float, default=100.0, help="порог медленного запроса, мс")
+    parser.add_argument("--slow-log", default=None, help="файл журнала медленных запросов (JSON по строке)")
+    args = parser.parse_args(argv)
+
+    metrics = QueryMetrics(args.slow_query_ms, args.slow_log) if args.metrics else None
+    system = LaundrySystem(db=Database(args.db, pool_size=args.pool_size, metrics=metrics), cache_size=args.cache_size)
+    server = LaundryHTTPServer((args.host, args.port), system, verbose=args.verbose)
+    print(f"API запущен на http://{args.host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        system.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Генератор нагрузки для AsyncLaundryService
+
+N одновременных сессий клиента: вход, создание заявки, просмотр своих
+заявок, смена статуса. Печатает p50/p99 задержки по операциям и общую
+пропускную способность. Запуск из корня проекта:
+    python -m src.benchmarks.bench_async_service --sessions 200 --iterations 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+
+from src.database.db import Database
+from src.main import LaundrySystem
+from src.service import AsyncLaundryService
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def timed(latencies, operation, coroutine):
+    start = time.perf_counter()
+    result = await coroutine
+    latencies[operation].append((time.perf_counter() - start) * 1000)
+    return result
+
+
+async def session(service, client, iterations, latencies):
+    """Одна клиентская сессия"""
+    await timed(latencies, "authenticate_client",
+                service.authenticate_client(client.name, client.phone_number))
+    for _ in range(iterations):
+        application = await timed(latencies, "create_application",
+                                  service.create_application(client.Client_ID, 'MEDIUM', 'IN_PROGRESS', 3))
+        await timed(latencies, "get_client_applications",
+                    service.get_client_applications_with_relations(client.Client_ID))
+        await timed(latencies, "update_application_status",
+                    service.update_application_status(application.Application_ID, 'COMPLETED'))
+
+
+async def run_load(service, clients, iterations):
+    latencies = defaultdict(list)
+    start = time.perf_counter()
+    await asyncio.gather(*(session(service, client, iterations, latencies) for client in clients))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузка на асинхронный сервисный слой")
+    parser.add_argument("--sessions", type=int, default=200, help="число одновременных сессий")
+    parser.add_argument("--iterations", type=int, default=5, help="заявок на сессию")
+    parser.add_argument("--workers", type=int, default=8, help="потоков для SQLite")
+    parser.add_argument("--concurrency", type=int, default=64, help="лимит одновременных операций")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = LaundrySystem(db=Database(os.path.join(tmp, "load.db"), pool_size=args.workers))
+        clients = system.create_clients(
+            ('Нагрузкин', f'Клиент{i}', 'Тестович', 78000000000 + i, f'load{i}@test.ru')
+            for i in range(args.sessions))
+        service = AsyncLaundryService(system, max_workers=args.workers, concurrency=args.concurrency)
+        latencies, elapsed = asyncio.run(run_load(service, clients, args.iterations))
+        service.close()
+        system.close()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"Сессий: {args.sessions}, операций: {total}, время: {elapsed:.2f} с, {total / elapsed:,.0f} оп/с")
+    print(f"{'операция':<28} {'p50, мс':>9} {'p99, мс':>9}")
+    for operation, values in latencies.items():
+        print(f"{operation:<28} {statistics.median(values):>9.2f} {percentile(values, 0.99):>9.2f}")
+    everything = [value for values in latencies.values() for value in values]
+    print(f"{'все операции':<28} {statistics.median(everything):>9.2f} {percentile(everything, 0.99):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
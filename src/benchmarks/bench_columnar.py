@@ -0,0 +1,79 @@
+"""
+Бенчмарк колоночного экспорта против CSV и JSON
+
+Сравнивает размер файла, время записи и время чтения обратно: всего файла
+и одной колонки (типичный запрос аналитики - например, только статусы).
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_columnar --applications 100000
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+
+from src.benchmarks.bench_export_memory import fill_database
+from src.database.db import Database
+from src.export_columnar import read_columnar, columnar_file_name, write_columnar
+from src.export_db import write_csv, write_json
+from src.repository.repository import ApplicationRepository
+
+
+def read_csv(path, column=None):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if column is None:
+            return list(reader)
+        index = header.index(column)
+        return [row[index] for row in reader]
+
+
+def read_json(path, column=None):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if column is None:
+        return data
+    return [item["application_status"]["name"] for item in data]
+
+
+def read_columnar_file(path, column=None):
+    return read_columnar(path, [column] if column else None)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Колоночный экспорт против CSV и JSON")
+    parser.add_argument("--applications", type=int, default=100000, help="заявок в тестовой базе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        fill_database(db_path, args.applications)
+        repository = ApplicationRepository(Database(db_path))
+        rows = repository.find_all_with_relations()
+
+        formats = [
+            ("csv", "data.csv", write_csv, read_csv, "application_status"),
+            ("json", "data.json", write_json, read_json, "application_status"),
+            ("columnar", columnar_file_name(), write_columnar, read_columnar_file, "application_status_name"),
+        ]
+        print(f"Заявок: {len(rows)}")
+        print(f"{'формат':<10} {'размер, КБ':>11} {'запись, с':>10} {'чтение, с':>10} {'колонка, с':>11}")
+        for name, file_name, write, read, column in formats:
+            path = os.path.join(tmp, file_name)
+            write_time = timed(write, rows, path)
+            size = os.path.getsize(path) / 1024
+            read_time = timed(read, path)
+            column_time = timed(read, path, column)
+            print(f"{name:<10} {size:>11,.0f} {write_time:>10.3f} {read_time:>10.3f} {column_time:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
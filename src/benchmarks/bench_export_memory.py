@@ -0,0 +1,76 @@
+"""
+Бенчмарк памяти экспорта: список в памяти против потокового режима
+
+Каждый замер выполняется в отдельном процессе, пиковый RSS берется из
+resource.getrusage. Запуск из корня проекта:
+    python -m src.benchmarks.bench_export_memory --sizes 5000 20000 50000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.database.db import Database
+
+
+def fill_database(db_path, applications):
+    """Заполняет базу синтетическими заявками для трех начальных клиентов"""
+    db = Database(db_path)
+    with db.connection() as conn:
+        conn.executemany(
+            'INSERT INTO Application (Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID) '
+            'VALUES (?, ?, ?, ?)',
+            ((i % 3 + 1, i % 20 + 1, ('LOW', 'MEDIUM', 'HIGH')[i % 3], 'IN_PROGRESS')
+             for i in range(applications)))
+    db.close()
+
+
+def run_child(mode, db_path, output_dir):
+    """Выполняет экспорт в текущем процессе и печатает пиковый RSS в КБ"""
+    from src.export_db import DataExporter
+
+    exporter = DataExporter(db=Database(db_path), output_dir=output_dir)
+    start = time.perf_counter()
+    sys.stdout = open(os.devnull, "w")
+    if mode == "stream":
+        exporter.run_streaming()
+    else:
+        exporter.run()
+    sys.stdout = sys.__stdout__
+    elapsed = time.perf_counter() - start
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed)
+
+
+def measure(mode, db_path, output_dir):
+    result = subprocess.run(
+        [sys.executable, "-m", "src.benchmarks.bench_export_memory", "--child", mode, db_path, output_dir],
+        check=True, capture_output=True, text=True)
+    rss, elapsed = result.stdout.split()
+    return int(rss), float(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пиковая память экспорта в зависимости от размера таблицы")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 50000])
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "DB", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    print(f"{'заявок':>10} {'режим':>8} {'RSS, МБ':>10} {'время, с':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            fill_database(db_path, size)
+            for mode in ("list", "stream"):
+                rss, elapsed = measure(mode, db_path, os.path.join(tmp, mode))
+                print(f"{size:>10} {mode:>8} {rss / 1024:>10.1f} {elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Нагрузочный тест HTTP API без внешних сервисов
+
+Поднимает LaundryHTTPServer на временной базе в этом же процессе и
+гоняет запросы из N потоков: с keep-alive (одно соединение на поток) и с
+новым соединением на каждый запрос. Печатает запросы/с и p50/p99.
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_http --threads 16 --requests 500
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from src.api import LaundryHTTPServer
+from src.database.db import Database
+from src.main import LaundrySystem
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def worker(port, paths, requests, keep_alive, latencies, errors):
+    headers = {"Accept-Encoding": "gzip"}
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    for i in range(requests):
+        if not keep_alive:
+            conn = http.client.HTTPConnection("127.0.0.1", port)
+            headers["Connection"] = "close"
+        start = time.perf_counter()
+        conn.request("GET", paths[i % len(paths)], headers=headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status >= 400:
+            errors.append(response.status)
+        if not keep_alive:
+            conn.close()
+    conn.close()
+
+
+def run(port, paths, threads, requests, keep_alive):
+    latencies, errors = [], []
+    workers = [threading.Thread(target=worker, args=(port, paths, requests, keep_alive, latencies, errors))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, statistics.median(latencies), percentile(latencies, 0.99), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP API")
+    parser.add_argument("--threads", type=int, default=16, help="число клиентских потоков")
+    parser.add_argument("--requests", type=int, default=500, help="запросов на поток")
+    parser.add_argument("--applications", type=int, default=300, help="заявок в тестовой базе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = LaundrySystem(db=Database(os.path.join(tmp, "http.db"), pool_size=8), cache_size=10000)
+        system.create_applications((1 + i % 3, 'MEDIUM', 'IN_PROGRESS', 1 + i % 5) for i in range(args.applications))
+        server = LaundryHTTPServer(("127.0.0.1", 0), system)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/applications?limit=1")
+        application_id = json.loads(conn.getresponse().read())["items"][0]["application_id"]
+        conn.close()
+        paths = ["/statuses/application", "/clients/1", f"/applications/{application_id}",
+                 "/applications?limit=20", "/clients/2/applications"]
+
+        print(f"Потоков: {args.threads}, запросов на поток: {args.requests}")
+        print(f"{'режим':<22} {'запр/с':>10} {'p50, мс':>9} {'p99, мс':>9} {'ошибок':>7}")
+        for name, keep_alive in (("keep-alive", True), ("соединение на запрос", False)):
+            rps, p50, p99, errors = run(port, paths, args.threads, args.requests, keep_alive)
+            print(f"{name:<22} {rps:>10,.0f} {p50:>9.2f} {p99:>9.2f} {errors:>7}")
+
+        server.shutdown()
+        server.server_close()
+        system.close()
+
+
+if __name__ == "__main__":
+    main()
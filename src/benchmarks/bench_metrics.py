@@ -0,0 +1,66 @@
+"""
+Накладные расходы замера запросов (QueryMetrics)
+
+Одни и те же операции репозиториев выполняются без замеров и с замерами.
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_metrics --clients 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.database.db import Database
+from src.database.metrics import QueryMetrics
+from src.main import LaundrySystem
+
+
+def operations(system, clients):
+    """Операции для замера: (название, функция, число вызовов)"""
+    return [
+        ("find_by_id", lambda i: system.get_client_by_id(i % clients + 1), 20000),
+        ("find_page (50)", lambda i: system.client_repo.find_page(None, 50), 5000),
+        ("iter_all clients", lambda i: sum(1 for _ in system.client_repo.iter_all()), 5),
+        ("create_application", lambda i: system.create_application(i % clients + 1, 'LOW', 'IN_PROGRESS', 1), 2000),
+    ]
+
+
+def run(db_path, metrics, clients):
+    system = LaundrySystem(db=Database(db_path, metrics=metrics))
+    results = {}
+    for name, operation, calls in operations(system, clients):
+        start = time.perf_counter()
+        for i in range(calls):
+            operation(i)
+        results[name] = (time.perf_counter() - start) / calls * 1e6
+    system.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Накладные расходы замера запросов")
+    parser.add_argument("--clients", type=int, default=20000, help="клиентов в тестовой базе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "metrics.db")
+        system = LaundrySystem(db=Database(db_path))
+        system.create_clients(('Иванов', 'Иван', 'Иванович', 79000000000 + i, f"client{i}@mail.ru")
+                              for i in range(args.clients))
+        system.close()
+
+        # Первый прогон прогревает кэш страниц, в таблицу идут повторные
+        run(db_path, None, args.clients)
+        plain = run(db_path, None, args.clients)
+        metrics = QueryMetrics(slow_query_ms=None)
+        measured = run(db_path, metrics, args.clients)
+
+        print(f"{'операция':<20} {'без замера, мкс':>16} {'с замером, мкс':>15} {'разница':>8}")
+        for name in plain:
+            overhead = (measured[name] / plain[name] - 1) * 100
+            print(f"{name:<20} {plain[name]:>16.1f} {measured[name]:>15.1f} {overhead:>7.1f}%")
+        print(f"Запросов учтено: {sum(query['calls'] for query in metrics.snapshot()['queries'])}")
+
+
+if __name__ == "__main__":
+    main()
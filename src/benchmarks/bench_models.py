@@ -0,0 +1,88 @@
+"""
+Микробенчмарк моделей: классы с __dict__ против классов со __slots__
+
+Показывает байт на объект (tracemalloc) и скорость построения объектов из
+строк курсора. Запуск из корня проекта:
+    python -m src.benchmarks.bench_models --rows 200000
+"""
+import argparse
+import sqlite3
+import time
+import tracemalloc
+
+from src.models.models import Application
+
+
+class DictApplication:
+    """Прежняя модель заявки: атрибуты хранятся в __dict__ экземпляра"""
+    def __init__(self, id, client_ID, number_of_items, pollutionStatus_ID, applicationStatus_ID):
+        self.Application_ID = id
+        self.Client_ID = client_ID
+        self.Number_of_items = number_of_items
+        self.PollutionStatus_ID = pollutionStatus_ID
+        self.ApplicationStatus_ID = applicationStatus_ID
+
+
+def make_connection(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE Application (Application_ID INTEGER PRIMARY KEY, Client_ID INTEGER, '
+                 'Number_of_items INTEGER, PollutionStatus_ID TEXT, ApplicationStatus_ID TEXT)')
+    conn.executemany('INSERT INTO Application VALUES (?, ?, ?, ?, ?)',
+                     ((i, i % 1000, i % 20 + 1, ('LOW', 'MEDIUM', 'HIGH')[i % 3], 'IN_PROGRESS')
+                      for i in range(1, rows + 1)))
+    return conn
+
+
+def bytes_per_object(factory, rows):
+    data = [(i, i % 1000, i % 20 + 1, 'LOW', 'IN_PROGRESS') for i in range(rows)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(*row) for row in data]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # вычитаем сам список ссылок на объекты
+    return (after - before - objects.__sizeof__()) / rows
+
+
+def objects_per_second(conn, build):
+    start = time.perf_counter()
+    objects = build(conn)
+    return len(objects) / (time.perf_counter() - start)
+
+
+def build_old(conn):
+    """Прежний путь: fetchall() и конструктор с индексами row[0]..row[4]"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID '
+                   'FROM Application')
+    applications = []
+    for row in cursor.fetchall():
+        applications.append(DictApplication(row[0], row[1], row[2], row[3], row[4]))
+    return applications
+
+
+def build_new(conn):
+    """Новый путь: row_factory модели со __slots__"""
+    cursor = conn.cursor()
+    cursor.row_factory = Application.from_row
+    cursor.execute('SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID '
+                   'FROM Application')
+    return cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память и скорость построения моделей")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    conn = make_connection(args.rows)
+    print(f"{'модель':>10} {'байт/объект':>12} {'объектов/с':>14}")
+    for label, factory, build in (("__dict__", DictApplication, build_old), ("__slots__", Application, build_new)):
+        size = bytes_per_object(factory, args.rows)
+        speed = objects_per_second(conn, build)
+        print(f"{label:>10} {size:>12.0f} {speed:>14,.0f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
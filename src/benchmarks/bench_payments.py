@@ -0,0 +1,83 @@
+"""
+Пропускная способность приема платежей: групповая фиксация против COMMIT на платеж
+
+Потоки-клиенты оплачивают заявки в статусе COMPLETED. Сравниваются
+LedgerWriter с batch_size=1 (каждый платеж - своя транзакция) и с пачками.
+После прогона проверяются инварианты: каждая заявка оплачена ровно один
+раз, сумма проводок равна нулю, повтор с тем же ключом не создает платеж.
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_payments --threads 16 --payments 20000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from src.database.db import Database
+from src.main import LaundrySystem
+from src.payments import PaymentProcessor, FakePaymentGateway
+
+
+def run(db_path, threads, payments, batch_size, synchronous, latency):
+    db = Database(db_path, pool_size=threads + 2, pragmas={'synchronous': synchronous})
+    system = LaundrySystem(db=db)
+    system.payments = PaymentProcessor(db, system.application_repo, FakePaymentGateway(latency=latency), batch_size)
+    client = system.create_client('Платежов', 'Клиент', 'Тестович', 78300000000, 'pay@test.ru')
+    application_ids = [application.Application_ID for application in system.create_applications(
+        (client.Client_ID, 'MEDIUM', 'IN_PROGRESS', 1 + i % 5) for i in range(payments))]
+    system.update_applications_status(application_ids, 'COMPLETED')
+
+    errors = []
+
+    def worker(offset):
+        try:
+            for application_id in application_ids[offset::threads]:
+                system.pay_application(application_id, f"pay-{application_id}")
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(offset,)) for offset in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    # Повтор с теми же ключами возвращает записанные платежи
+    replayed = [system.pay_application(application_id, f"pay-{application_id}")
+                for application_id in application_ids[:100]]
+    writer = system.payments.writer
+    with db.connection() as conn:
+        stored = conn.execute('SELECT COUNT(*) FROM Payment').fetchone()[0]
+        ledger_sum = conn.execute('SELECT SUM(amount) FROM Ledger').fetchone()[0]
+        paid = conn.execute("SELECT COUNT(*) FROM Application WHERE ApplicationStatus_ID = 'PAID'").fetchone()[0]
+    system.close()
+    ok = (not errors and stored == payments and paid == payments and ledger_sum == 0
+          and all(payment.status == 'SUCCEEDED' for payment in replayed))
+    return {"elapsed": elapsed, "rate": payments / elapsed, "batches": writer.batches,
+            "avg_batch": writer.written / max(writer.batches, 1), "ok": ok, "errors": errors[:3]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность приема платежей")
+    parser.add_argument("--threads", type=int, default=16, help="параллельных клиентов")
+    parser.add_argument("--payments", type=int, default=20000, help="платежей в прогоне")
+    parser.add_argument("--batch-size", type=int, default=512, help="максимальный размер пачки")
+    parser.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous (FULL - fsync на COMMIT)")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка шлюза, с")
+    args = parser.parse_args()
+
+    print(f"Потоков: {args.threads}, платежей: {args.payments}, synchronous={args.synchronous}")
+    print(f"{'режим':<22} {'время, с':>9} {'платежей/с':>11} {'пачек':>7} {'ср. пачка':>10}  проверка")
+    for name, batch_size in (("COMMIT на платеж", 1), (f"пачки до {args.batch_size}", args.batch_size)):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run(os.path.join(tmp, "payments.db"), args.threads, args.payments, batch_size,
+                         args.synchronous, args.latency)
+        print(f"{name:<22} {result['elapsed']:>9.2f} {result['rate']:>11.0f} {result['batches']:>7} "
+              f"{result['avg_batch']:>10.1f}  {'OK' if result['ok'] else 'ОШИБКА ' + repr(result['errors'])}")
+
+
+if __name__ == "__main__":
+    main()
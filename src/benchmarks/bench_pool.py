@@ -0,0 +1,59 @@
+"""
+Бенчмарк: соединение на каждый запрос против пула соединений
+
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_pool --ops 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.database.db import Database
+
+
+QUERY = 'SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client WHERE Client_ID = ?'
+
+
+def bench_connect_per_call(db, ops):
+    """Старый путь: sqlite3.connect() и close() на каждую операцию"""
+    start = time.perf_counter()
+    for i in range(ops):
+        conn = db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(QUERY, (i % 3 + 1,))
+        cursor.fetchone()
+        conn.close()
+    return ops / (time.perf_counter() - start)
+
+
+def bench_pooled(db, ops):
+    """Новый путь: соединение берется из пула"""
+    start = time.perf_counter()
+    for i in range(ops):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(QUERY, (i % 3 + 1,))
+            cursor.fetchone()
+    return ops / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение ops/sec до и после пула соединений")
+    parser.add_argument("--ops", type=int, default=20000, help="количество операций")
+    parser.add_argument("--pool-size", type=int, default=5, help="размер пула")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"), pool_size=args.pool_size)
+        before = bench_connect_per_call(db, args.ops)
+        after = bench_pooled(db, args.ops)
+        db.close()
+
+    print(f"Соединение на запрос: {before:,.0f} ops/sec")
+    print(f"Пул соединений:       {after:,.0f} ops/sec")
+    print(f"Ускорение:            x{after / before:.1f}")
+
+
+if __name__ == "__main__":
+    main()
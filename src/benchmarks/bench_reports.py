@@ -0,0 +1,63 @@
+"""
+Бенчмарк отчетов: сводные таблицы против GROUP BY по таблице Application
+
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_reports --applications 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.benchmarks.bench_export_memory import fill_database
+from src.database.db import Database
+from src.repository.reports import ReportRepository
+
+GROUP_BY_QUERIES = {
+    "applications_by_status": 'SELECT ApplicationStatus_ID, COUNT(*), SUM(Number_of_items) FROM Application '
+                              'GROUP BY ApplicationStatus_ID',
+    "items_by_pollution": 'SELECT PollutionStatus_ID, COUNT(*), SUM(Number_of_items) FROM Application '
+                          'GROUP BY PollutionStatus_ID',
+    "top_clients": 'SELECT Client_ID, COUNT(*), SUM(Number_of_items) AS items FROM Application '
+                   'GROUP BY Client_ID ORDER BY items DESC LIMIT 10',
+}
+
+
+def best_of(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчеты по сводным таблицам против GROUP BY")
+    parser.add_argument("--applications", type=int, default=1000000, help="заявок в тестовой базе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "reports.db")
+        start = time.perf_counter()
+        fill_database(db_path, args.applications)
+        print(f"Заявок: {args.applications}, заполнение с триггерами сводок: {time.perf_counter() - start:.1f} с")
+
+        db = Database(db_path)
+        reports = ReportRepository(db)
+        print(f"{'отчет':<24} {'сводка, мс':>11} {'GROUP BY, мс':>13}")
+        for name, sql in GROUP_BY_QUERIES.items():
+            summary = best_of(getattr(reports, name))
+
+            def group_by():
+                with db.connection() as conn:
+                    conn.execute(sql).fetchall()
+
+            print(f"{name:<24} {summary:>11.3f} {best_of(group_by, repeat=2):>13.1f}")
+        print(f"{'daily_throughput':<24} {best_of(reports.daily_throughput):>11.3f} {'-':>13}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
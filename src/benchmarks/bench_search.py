@@ -0,0 +1,91 @@
+"""
+Бенчмарк поиска клиентов (FTS5) против LIKE по таблице Client
+
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_search --clients 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from src.database.db import Database
+from src.repository.repository import ClientRepository
+
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+              'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров',
+              'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин']
+NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артем', 'Илья', 'Кирилл',
+         'Михаил', 'Никита', 'Матвей', 'Роман', 'Егор', 'Арсений', 'Иван', 'Денис', 'Евгений']
+PATRONYMICS = ['Александрович', 'Дмитриевич', 'Сергеевич', 'Андреевич', 'Алексеевич', 'Иванович',
+               'Михайлович', 'Петрович', 'Николаевич', 'Владимирович']
+
+QUERIES = {
+    "префикс фамилии": "Новик",
+    "фамилия и имя": "Петров Иван",
+    "ФИО целиком": "Орлов Матвей Петрович",
+    "телефон": "79000123455",
+    "начало телефона": "7900012",
+    "опечатка": "Никитен Арсени",
+}
+
+
+def fill_clients(db_path, clients):
+    """Заполняет базу клиентами со случайными ФИО и уникальными телефонами"""
+    db = Database(db_path)
+    rng = random.Random(1)
+    # Фамилии с числовым суффиксом: иначе несколько десятков фамилий на миллион
+    # клиентов дают слишком длинные списки совпадений
+    with db.connection() as conn:
+        conn.executemany(
+            'INSERT INTO Client (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?)',
+            ((f"{rng.choice(LAST_NAMES)}{'а' * (i % 2)}{'' if i % 5 == 0 else rng.choice('абвгдежзик')}",
+              rng.choice(NAMES), rng.choice(PATRONYMICS), 79000000000 + i * 7 + 3, f"client{i}@mail.ru")
+             for i in range(clients)))
+    db.close()
+
+
+def timings(func, repeat):
+    """Медиана и 99-й перцентиль времени вызова в мс"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск клиентов через FTS5 против LIKE")
+    parser.add_argument("--clients", type=int, default=1000000, help="клиентов в тестовой базе")
+    parser.add_argument("--repeat", type=int, default=200, help="повторов каждого запроса")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "search.db")
+        start = time.perf_counter()
+        fill_clients(db_path, args.clients)
+        print(f"Клиентов: {args.clients}, заполнение с индексами FTS5: {time.perf_counter() - start:.1f} с")
+
+        db = Database(db_path)
+        clients = ClientRepository(db)
+        print(f"{'запрос':<18} {'найдено':>8} {'p50, мс':>9} {'p99, мс':>9} {'LIKE, мс':>10}")
+        for name, query in QUERIES.items():
+            found = len(clients.search(query))
+            p50, p99 = timings(lambda: clients.search(query), args.repeat)
+            first_word = query.split()[0]
+
+            def like():
+                with db.connection() as conn:
+                    conn.execute('SELECT * FROM Client WHERE last_name LIKE ? OR CAST(phone_number AS TEXT) LIKE ? '
+                                 'LIMIT 10', (f"%{first_word}%", f"%{first_word}%")).fetchall()
+
+            like_p50, _ = timings(like, 3)
+            print(f"{name:<18} {found:>8} {p50:>9.3f} {p99:>9.3f} {like_p50:>10.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Бенчмарк подбора времени: поиск ближайших свободных слотов
+
+Создает слоты на несколько месяцев вперед, заполняет большую часть из них
+(тысячи записей в день) и замеряет поиск альтернатив. Дополнительно
+проверяет, что параллельные записи не переполняют слот.
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_slots --days 180 --slot-minutes 15 --capacity 100
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from src.database.db import Database
+from src.main import LaundrySystem
+from src.repository.repository import SLOT_TIME_FORMAT
+
+
+def fill_slots(db, fill_ratio):
+    """Заполняет долю fill_ratio слотов до отказа, остальные - частично"""
+    with db.connection() as conn:
+        conn.execute('UPDATE Slot SET booked = CASE WHEN abs(random()) % 1000 < ? THEN capacity '
+                     'ELSE abs(random()) % capacity END', (int(fill_ratio * 1000),))
+
+
+def bench_lookups(system, first_day, days, lookups):
+    latencies = []
+    for _ in range(lookups):
+        desired = first_day + timedelta(days=random.randrange(days), minutes=random.randrange(9 * 60, 21 * 60))
+        start = time.perf_counter()
+        system.find_alternative_slots(desired.strftime(SLOT_TIME_FORMAT), 5)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def check_concurrent_booking(system, threads, capacity):
+    """Параллельные записи в один слот: успешных должно быть ровно capacity"""
+    system.generate_slots('2099-01-01', 1, day_start_hour=9, day_end_hour=10, slot_minutes=60, capacity=capacity)
+    slot = system.slot_repo.find_by_start_time('2099-01-01 09:00')
+    results = []
+    barrier = threading.Barrier(threads)
+
+    def book():
+        barrier.wait()
+        try:
+            system.create_application(1, 'LOW', 'IN_PROGRESS', 1, slot.Slot_ID)
+            results.append(True)
+        except ValueError:
+            results.append(False)
+
+    workers = [threading.Thread(target=book) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results.count(True), system.slot_repo.find_by_id(slot.Slot_ID).booked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск ближайших свободных слотов")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--slot-minutes", type=int, default=15)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--fill", type=float, default=0.95, help="доля полностью занятых слотов")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = LaundrySystem(db=Database(os.path.join(tmp, "slots.db"), pool_size=8))
+        first_day = datetime(2030, 1, 1)
+        start = time.perf_counter()
+        created = system.generate_slots(first_day.strftime('%Y-%m-%d'), args.days,
+                                        slot_minutes=args.slot_minutes, capacity=args.capacity)
+        print(f"Создано слотов: {created} за {time.perf_counter() - start:.2f} с "
+              f"(до {created * args.capacity // args.days} записей в день)")
+        fill_slots(system.db, args.fill)
+
+        p50, p99 = bench_lookups(system, first_day, args.days, args.lookups)
+        print(f"Поиск 5 ближайших свободных слотов: p50 {p50:.3f} мс, p99 {p99:.3f} мс")
+
+        booked, counter = check_concurrent_booking(system, threads=16, capacity=5)
+        print(f"Параллельная запись 16 потоков в слот на 5 мест: успешно {booked}, занято {counter}")
+        system.close()
+
+
+if __name__ == "__main__":
+    main()
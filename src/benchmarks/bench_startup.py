@@ -0,0 +1,72 @@
+"""
+Бенчмарк холодного старта точек входа: LaundrySystem и DataExporter
+
+Каждый замер - отдельный процесс интерпретатора. Импорт модуля меряется
+через -X importtime (накопленное время верхнего модуля), запуск - временем
+работы процесса, который импортирует модуль и создает объект на базе с уже
+актуальной схемой. Отдельно меряется первая инициализация новой базы.
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_startup --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ENTRY_POINTS = {
+    "src.main": "from src.database.db import Database\n"
+                "from src.main import LaundrySystem\n"
+                "LaundrySystem(db=Database({db!r}))",
+    "src.export_db": "from src.database.db import Database\n"
+                     "from src.export_db import DataExporter\n"
+                     "DataExporter(db=Database({db!r}), output_dir={out!r})",
+}
+
+
+def import_time_us(module):
+    """Накопленное время импорта модуля в микросекундах по -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            check=True, capture_output=True, text=True)
+    for line in reversed(result.stderr.splitlines()):
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise ValueError(f"Нет данных -X importtime для {module}")
+
+
+def process_time_ms(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного старта точек входа")
+    parser.add_argument("--runs", type=int, default=10, help="замеров на точку входа (берется медиана)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        out_dir = os.path.join(tmp, "out")
+        baseline = statistics.median(process_time_ms("pass") for _ in range(args.runs))
+        print(f"Пустой интерпретатор: {baseline:.1f} мс")
+        print(f"{'точка входа':<16} {'импорт, мс':>11} {'старт, мс':>10} {'первый старт, мс':>17}")
+        for module, template in ENTRY_POINTS.items():
+            code = template.format(db=db_path, out=out_dir)
+            import_ms = statistics.median(import_time_us(module) for _ in range(args.runs)) / 1000
+
+            def first_start():
+                if os.path.exists(db_path):
+                    os.remove(db_path)
+                return process_time_ms(code)
+
+            first = statistics.median(first_start() for _ in range(args.runs))
+            warm = statistics.median(process_time_ms(code) for _ in range(args.runs))
+            print(f"{module:<16} {import_ms:>11.1f} {warm:>10.1f} {first:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
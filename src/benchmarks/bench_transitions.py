@@ -0,0 +1,91 @@
+"""
+Параллельная смена статусов заявок несколькими администраторами
+
+Каждый поток-администратор читает (статус, версия) заявки и пытается
+перевести ее по графу переходов с ожидаемой версией. Проверяется, что
+изменения не теряются: число успешных переходов каждой заявки совпадает
+с ее версией и с числом строк истории. Запуск из корня проекта:
+    python -m src.benchmarks.bench_transitions --admins 8 --applications 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from src.database.db import Database
+from src.main import LaundrySystem
+from src.repository.repository import StatusConflictError
+
+# Ручные переходы, по которым гуляют заявки; отмена - конечное состояние
+# (PAID ставится только оплатой)
+NEXT_STATUSES = {
+    'IN_PROGRESS': ['COMPLETED', 'COMPLETED', 'COMPLETED', 'CANCELLED'],
+    'COMPLETED': ['IN_PROGRESS', 'IN_PROGRESS', 'IN_PROGRESS', 'CANCELLED'],
+}
+
+
+def admin(system, application_ids, attempts, seed, stats, lock):
+    rng = random.Random(seed)
+    applied = conflicts = rejected = 0
+    for _ in range(attempts):
+        application_id = rng.choice(application_ids)
+        status, version = system.application_repo.find_status_version(application_id)
+        if status not in NEXT_STATUSES:
+            continue
+        try:
+            system.update_application_status(application_id, rng.choice(NEXT_STATUSES[status]), version)
+            applied += 1
+        except StatusConflictError:
+            conflicts += 1
+        except ValueError:
+            rejected += 1
+    with lock:
+        stats["applied"] += applied
+        stats["conflicts"] += conflicts
+        stats["rejected"] += rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Параллельная смена статусов заявок")
+    parser.add_argument("--admins", type=int, default=8, help="потоков-администраторов")
+    parser.add_argument("--applications", type=int, default=200, help="заявок, за которые идет гонка")
+    parser.add_argument("--attempts", type=int, default=2000, help="попыток смены статуса на поток")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        system = LaundrySystem(db=Database(os.path.join(tmp, "transitions.db"), pool_size=args.admins))
+        client = system.create_client('Гонкин', 'Админ', 'Тестович', 78200000000, 'race@test.ru')
+        application_ids = [application.Application_ID for application in system.create_applications(
+            (client.Client_ID, 'MEDIUM', 'IN_PROGRESS', 3) for _ in range(args.applications))]
+
+        stats = {"applied": 0, "conflicts": 0, "rejected": 0}
+        lock = threading.Lock()
+        threads = [threading.Thread(target=admin, args=(system, application_ids, args.attempts, seed, stats, lock))
+                   for seed in range(args.admins)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        with system.db.connection() as conn:
+            versions = conn.execute('SELECT COALESCE(SUM(version), 0) FROM Application').fetchone()[0]
+            history = conn.execute('SELECT COUNT(*) FROM ApplicationStatusHistory').fetchone()[0]
+            final = dict(conn.execute(
+                'SELECT ApplicationStatus_ID, COUNT(*) FROM Application GROUP BY ApplicationStatus_ID').fetchall())
+        system.close()
+
+    print(f"Администраторов: {args.admins}, заявок: {args.applications}, время: {elapsed:.2f} с")
+    print(f"Переходов: {stats['applied']} ({stats['applied'] / elapsed:.0f}/с), "
+          f"конфликтов версий: {stats['conflicts']}, запрещенных: {stats['rejected']}")
+    print(f"Сумма версий: {versions}, строк истории: {history}, итоговые статусы: {final}")
+    lost = stats["applied"] - versions
+    print("Потерянных изменений нет" if lost == 0 and history == versions
+          else f"ОШИБКА: расхождение {lost}, история {history}")
+
+
+if __name__ == "__main__":
+    main()
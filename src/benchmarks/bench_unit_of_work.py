@@ -0,0 +1,84 @@
+"""
+Бенчмарк бизнес-операций LaundrySystem: запросы, commit и время на операцию
+
+Пул из одного соединения, поэтому trace callback видит все SQL-запросы
+(повтор инструкции для каждого сработавшего триггера считается одним
+запросом). Каждый COMMIT - отдельная запись в журнал (и fsync при
+synchronous=FULL). Выдачи соединения из пула считаются отдельно.
+Запуск из корня проекта:
+    python -m src.benchmarks.bench_unit_of_work --iterations 300
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src.database.db import Database
+from src.main import LaundrySystem
+
+
+def measure(db, operation, iterations):
+    """Среднее число запросов, COMMIT, выдач соединения и время операции в мс"""
+    statements = []
+
+    def trace(statement):
+        if not statements or statements[-1] != statement:
+            statements.append(statement)
+
+    acquired = [0]
+    acquire = db.pool.acquire
+
+    def counting_acquire():
+        acquired[0] += 1
+        return acquire()
+
+    with db.connection() as conn:
+        conn.set_trace_callback(trace)
+    db.pool.acquire = counting_acquire
+    start = time.perf_counter()
+    for i in range(iterations):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    db.pool.acquire = acquire
+    with db.connection() as conn:
+        conn.set_trace_callback(None)
+    commits = sum(1 for statement in statements if statement.strip().upper().startswith('COMMIT'))
+    return (len(statements) / iterations, commits / iterations, acquired[0] / iterations,
+            elapsed / iterations * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запросы и commit на бизнес-операцию")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--synchronous", default="FULL", help="PRAGMA synchronous (FULL - fsync на каждый commit)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "uow.db"), pool_size=1, pragmas={'synchronous': args.synchronous})
+        system = LaundrySystem(db=db)
+        n = args.iterations
+        clients = system.create_clients(
+            ('Операций', f'Клиент{i}', 'Тестович', 78100000000 + i, f'uow{i}@test.ru') for i in range(n))
+        created = []
+
+        def create_application(i):
+            created.append(system.create_application(clients[i].Client_ID, 'MEDIUM', 'IN_PROGRESS', 3))
+
+        def update_status(i):
+            system.update_application_status(created[i].Application_ID, 'COMPLETED')
+
+        def delete_client(i):
+            system.delete_client(clients[i].Client_ID)
+
+        print(f"Операций каждого вида: {n}, synchronous={args.synchronous}")
+        print(f"{'операция':<28} {'запросов':>9} {'COMMIT':>7} {'соединений':>11} {'мс':>7}")
+        for name, operation in (("create_application", create_application),
+                                ("update_application_status", update_status),
+                                ("delete_client", delete_client)):
+            statements, commits, connections, ms = measure(db, operation, n)
+            print(f"{name:<28} {statements:>9.1f} {commits:>7.1f} {connections:>11.1f} {ms:>7.3f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
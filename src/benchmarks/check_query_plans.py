@@ -0,0 +1,158 @@
+"""
+Проверка планов запросов репозиториев (EXPLAIN QUERY PLAN)
+
+Все SQL-запросы, которые выполняют репозитории, перехватываются через
+trace callback, затем для каждого запроса с условием WHERE проверяется,
+что SQLite не делает полный просмотр таблицы. Код возврата 1 - есть
+запросы без индекса. Запуск из корня проекта:
+    python -m src.benchmarks.check_query_plans
+"""
+import os
+import re
+import sys
+import tempfile
+
+from src.database.db import Database
+from src.models.models import Client, Admin, Application, Slot
+from src.repository.repository import ClientRepository, AdminRepository, ApplicationRepository, \
+    ApplicationStatusRepository, PollutionStatusRepository, SlotRepository, ChangeLogRepository
+from src.repository.reports import ReportRepository
+from src.payments import PaymentProcessor
+
+
+def exercise_repositories(db):
+    """Вызывает методы репозиториев, чтобы собрать все их запросы"""
+    clients = ClientRepository(db)
+    admins = AdminRepository(db)
+    applications = ApplicationRepository(db)
+    application_statuses = ApplicationStatusRepository(db)
+    pollution_statuses = PollutionStatusRepository(db)
+    slots = SlotRepository(db)
+
+    client = clients.save(Client(None, 'Тестов', 'Тест', 'Тестович', 79000000001, 'test@test.ru'))
+    clients.save(client)
+    clients.find_all()
+    clients.find_by_id(client.Client_ID)
+    clients.authenticate('Тест', 79000000001)
+    clients.search('Тестов Тес')
+    clients.search('Тестоф Тестович')
+
+    admin = admins.save(Admin(None, 'Тестов', 'Тест', 'Тестович', 79000000002, 'admin@test.ru'))
+    admins.save(admin)
+    admins.find_all()
+    admins.find_by_id(admin.Admin_ID)
+    admins.authenticate('Тест', 79000000002)
+
+    application_statuses.find_all()
+    application_statuses.find_by_id('IN_PROGRESS')
+    pollution_statuses.find_all()
+    pollution_statuses.find_by_id('LOW')
+
+    application = applications.save(Application(None, client.Client_ID, 3, 'LOW', 'IN_PROGRESS'))
+    applications.save(application)
+    applications.find_all()
+    applications.find_by_id(application.Application_ID)
+    applications.find_by_client_id(client.Client_ID)
+    applications.find_by_status('IN_PROGRESS')
+    applications.find_all_with_relations()
+    applications.find_by_client_id_with_relations(client.Client_ID)
+    list(applications.iter_all_with_relations())
+    applications.update_status(application.Application_ID, 'COMPLETED')
+    applications.find_status_version(application.Application_ID)
+    applications.find_status_history(application.Application_ID)
+    application_statuses.find_transitions()
+
+    payments = PaymentProcessor(db, applications)
+    payment = payments.pay(application.Application_ID, 'check')
+    payments.pay(application.Application_ID, 'check')
+    payments.close()
+    payments.repository.find_by_application(application.Application_ID)
+    payments.repository.find_ledger(payment.Payment_ID)
+    payments.repository.balance()
+
+    slots.insert_many([Slot(None, '2030-01-01 09:00', '2030-01-01 10:00', 5)])
+    slot = slots.find_by_start_time('2030-01-01 09:00')
+    slots.find_by_id(slot.Slot_ID)
+    slots.find_nearest_free('2030-01-01 09:30')
+    applications.save(Application(None, client.Client_ID, 1, 'LOW', 'IN_PROGRESS', slot.Slot_ID))
+
+    changelog = ChangeLogRepository(db)
+    last_change = changelog.last_change_id()
+    applications.find_with_relations_by_ids(changelog.changed_application_ids(0, last_change))
+    changelog.save_watermark('check', last_change)
+    changelog.get_watermark('check')
+    changelog.prune()
+
+    reports = ReportRepository(db)
+    reports.applications_by_status()
+    reports.items_by_pollution()
+    reports.top_clients()
+    reports.client_totals(client.Client_ID)
+    reports.daily_throughput()
+
+
+def collect_statements(db, action):
+    """Выполняет action и возвращает список выполненных SQL-запросов"""
+    statements = []
+    with db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        action(db)
+    finally:
+        with db.connection() as conn:
+            conn.set_trace_callback(None)
+    return statements
+
+
+def full_scans(conn, statement):
+    """Строки плана с полным просмотром таблицы (SCAN без индекса)"""
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + statement).fetchall()
+    # Результат подзапроса (CO-ROUTINE/MATERIALIZE) уже ограничен, а поиск
+    # FTS5 по MATCH (INDEX 0:M...) идет по полнотекстовому индексу
+    subqueries = {row[3].split()[-1] for row in plan if row[3].startswith(('CO-ROUTINE', 'MATERIALIZE'))}
+    return [row[3] for row in plan
+            if row[3].startswith('SCAN') and 'USING' not in row[3]
+            and not re.search(r'VIRTUAL TABLE INDEX \d+:M', row[3])
+            and row[3].split()[1] not in subqueries]
+
+
+def check(statements, conn):
+    problems = []
+    checked = set()
+    for statement in statements:
+        normalized = ' '.join(statement.split())
+        if normalized in checked or not re.match(r'(SELECT|UPDATE|DELETE)\b', normalized, re.IGNORECASE):
+            continue
+        checked.add(normalized)
+        if not re.search(r'\bWHERE\b', normalized, re.IGNORECASE):
+            continue
+        # Служебные таблицы SQLite (sqlite_sequence и т.п.) - по строке на таблицу
+        if re.search(r'\bFROM sqlite_\w+', normalized):
+            continue
+        scans = full_scans(conn, normalized)
+        status = 'SCAN' if scans else 'OK'
+        print(f"[{status}] {normalized}")
+        if scans:
+            problems.append((normalized, scans))
+    return problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        # Один пул на одно соединение: trace callback видит все запросы
+        db = Database(os.path.join(tmp, "plans.db"), pool_size=1)
+        statements = collect_statements(db, exercise_repositories)
+        with db.connection() as conn:
+            problems = check(statements, conn)
+        db.close()
+
+    if problems:
+        print(f"\nЗапросов без индекса: {len(problems)}")
+        for statement, scans in problems:
+            print(f"  {statement}\n    {'; '.join(scans)}")
+        sys.exit(1)
+    print("\nВсе запросы с условием используют индекс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Генератор синтетических данных для бенчмарков
+
+Клиенты с русскими ФИО (мужские и женские формы), уникальными телефонами
+7XXXXXXXXXX и email, заявки со случайными клиентами, количеством вещей и
+статусами. Данные детерминированы: одинаковые seed и размеры дают одинаковую
+базу. Строки пишутся executemany порциями, каждая порция - одна транзакция.
+
+В быстром режиме (по умолчанию в CLI) триггеры таблиц Client и Application
+на время загрузки удаляются, а после нее поисковые индексы и сводки
+перестраиваются целиком - это в разы быстрее построчного обновления.
+Журнал изменений (ChangeLog) и дневная сводка в этом режиме не пополняются.
+
+Запуск из корня проекта:
+    python -m src.benchmarks.datagen --db bench.db --clients 1000000 --applications 10000000
+"""
+import argparse
+import random
+import time
+
+from src.database.db import Database
+from src.database.migrations import rebuild_summaries
+
+MALE_LAST_NAMES = [
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+    'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров', 'Павлов', 'Козлов',
+    'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров', 'Зайцев', 'Соловьев',
+    'Борисов', 'Яковлев', 'Григорьев', 'Романов', 'Воробьев', 'Сергеев', 'Кузьмин', 'Фролов', 'Александров',
+    'Дмитриев', 'Королев', 'Гусев', 'Киселев', 'Ильин', 'Максимов', 'Поляков', 'Сорокин', 'Виноградов',
+    'Ковалев', 'Белов', 'Медведев', 'Антонов', 'Тарасов', 'Жуков', 'Баранов', 'Филиппов', 'Комаров',
+    'Давыдов', 'Беляев', 'Герасимов', 'Богданов', 'Осипов', 'Сидоров', 'Матвеев', 'Титов', 'Марков',
+    'Миронов', 'Крылов', 'Куликов', 'Карпов', 'Власов', 'Мельников', 'Денисов', 'Гаврилов', 'Тихонов',
+]
+MALE_NAMES = [
+    'Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артем', 'Илья', 'Кирилл', 'Михаил',
+    'Никита', 'Матвей', 'Роман', 'Егор', 'Арсений', 'Иван', 'Денис', 'Евгений', 'Даниил', 'Тимофей',
+    'Владислав', 'Игорь', 'Владимир', 'Павел', 'Руслан', 'Марк', 'Константин', 'Тимур', 'Олег', 'Ярослав',
+]
+FEMALE_NAMES = [
+    'Анастасия', 'Мария', 'Анна', 'Виктория', 'Екатерина', 'Наталья', 'Марина', 'Полина', 'София', 'Дарья',
+    'Алиса', 'Ксения', 'Александра', 'Елена', 'Ольга', 'Татьяна', 'Юлия', 'Ирина', 'Светлана', 'Вероника',
+    'Есения', 'Евгения', 'Валерия', 'Алина', 'Варвара', 'Кристина', 'Людмила', 'Галина', 'Ульяна', 'Милана',
+]
+# Отчество от имени отца: мужская и женская форма
+PATRONYMICS = [
+    ('Александрович', 'Александровна'), ('Дмитриевич', 'Дмитриевна'), ('Сергеевич', 'Сергеевна'),
+    ('Андреевич', 'Андреевна'), ('Алексеевич', 'Алексеевна'), ('Иванович', 'Ивановна'),
+    ('Михайлович', 'Михайловна'), ('Петрович', 'Петровна'), ('Николаевич', 'Николаевна'),
+    ('Владимирович', 'Владимировна'), ('Викторович', 'Викторовна'), ('Юрьевич', 'Юрьевна'),
+    ('Олегович', 'Олеговна'), ('Евгеньевич', 'Евгеньевна'), ('Павлович', 'Павловна'),
+    ('Игоревич', 'Игоревна'), ('Романович', 'Романовна'), ('Максимович', 'Максимовна'),
+]
+EMAIL_DOMAINS = ['mail.ru', 'yandex.ru', 'gmail.com', 'bk.ru', 'inbox.ru', 'list.ru', 'rambler.ru']
+
+TRANSLIT = dict(zip('абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+                    ['a', 'b', 'v', 'g', 'd', 'e', 'e', 'zh', 'z', 'i', 'y', 'k', 'l', 'm', 'n', 'o', 'p', 'r',
+                     's', 't', 'u', 'f', 'kh', 'ts', 'ch', 'sh', 'shch', '', 'y', '', 'e', 'yu', 'ya']))
+
+# Степени загрязнения и статусы с долями, близкими к реальной работе
+POLLUTION_WEIGHTS = [('LOW', 5), ('MEDIUM', 4), ('HIGH', 1)]
+STATUS_WEIGHTS = [('IN_PROGRESS', 3), ('COMPLETED', 6), ('CANCELLED', 1)]
+
+# Телефон i-го клиента: 79XXXXXXXXX, где XXXXXXXXX = (i * PHONE_STEP + PHONE_OFFSET) mod 10^9.
+# PHONE_STEP взаимно прост с 10^9, поэтому отображение взаимно однозначно:
+# до миллиарда уникальных номеров без проверок и без хранения выданных
+PHONE_BASE = 79000000000
+PHONE_SPACE = 10 ** 9
+PHONE_STEP = 387420489  # 3^18
+PHONE_OFFSET = 104729
+
+CHUNK_SIZE = 50000
+
+
+def transliterate(text):
+    return ''.join(TRANSLIT.get(char, char) for char in text.lower())
+
+
+def client_phone(index):
+    """Уникальный телефон клиента с порядковым номером index (0, 1, ...)"""
+    return PHONE_BASE + (index * PHONE_STEP + PHONE_OFFSET) % PHONE_SPACE
+
+
+def _weighted(weights):
+    values, counts = zip(*weights)
+    return list(values), list(counts)
+
+
+def generate_clients(count, seed=1, start=0):
+    """Кортежи (фамилия, имя, отчество, телефон, email) клиентов с номерами start..start+count-1"""
+    rng = random.Random(seed * 1000003 + start)
+    # Транслитерация фамилий для email считается один раз
+    latin = {last_name: transliterate(last_name) for last_name in MALE_LAST_NAMES}
+    choice = rng.choice
+    random_value = rng.random
+    for index in range(start, start + count):
+        last_name = choice(MALE_LAST_NAMES)
+        patronymic = choice(PATRONYMICS)
+        if random_value() < 0.5:
+            yield (last_name, choice(MALE_NAMES), patronymic[0], client_phone(index),
+                   f"{latin[last_name]}.{index}@{choice(EMAIL_DOMAINS)}")
+        else:
+            yield (last_name + 'а', choice(FEMALE_NAMES), patronymic[1], client_phone(index),
+                   f"{latin[last_name]}a.{index}@{choice(EMAIL_DOMAINS)}")
+
+
+def generate_applications(count, client_ids, seed=1):
+    """Кортежи (ID клиента, кол-во вещей, загрязнение, статус) для count заявок"""
+    rng = random.Random(seed * 7919)
+    pollution_values, pollution_weights = _weighted(POLLUTION_WEIGHTS)
+    status_values, status_weights = _weighted(STATUS_WEIGHTS)
+    chunk = 10000
+    for offset in range(0, count, chunk):
+        size = min(chunk, count - offset)
+        # random.choices выбирает сразу пачку значений - быстрее, чем по одному
+        clients = rng.choices(client_ids, k=size)
+        items = rng.choices(range(1, 21), k=size)
+        pollution = rng.choices(pollution_values, pollution_weights, k=size)
+        statuses = rng.choices(status_values, status_weights, k=size)
+        yield from zip(clients, items, pollution, statuses)
+
+
+def _insert_chunked(db, sql, rows, chunk_size, progress, label, total):
+    done = 0
+    batch = []
+    with db.connection() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                conn.executemany(sql, batch)
+                conn.commit()
+                done += len(batch)
+                batch = []
+                if progress:
+                    progress(label, done, total)
+        if batch:
+            conn.executemany(sql, batch)
+            conn.commit()
+            done += len(batch)
+            if progress:
+                progress(label, done, total)
+    return done
+
+
+def suspend_triggers(conn, tables=("Client", "Application")):
+    """Удаляет триггеры таблиц tables, возвращает их SQL для восстановления"""
+    triggers = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({', '.join('?' * len(tables))})",
+        tables).fetchall()
+    for name, _ in triggers:
+        conn.execute(f'DROP TRIGGER {name}')
+    return [sql for _, sql in triggers]
+
+
+def rebuild_derived(conn):
+    """Перестраивает поисковые индексы клиентов и сводки по заявкам"""
+    conn.execute("INSERT INTO ClientSearch (ClientSearch) VALUES ('rebuild')")
+    conn.execute("INSERT INTO ClientTrigram (ClientTrigram) VALUES ('rebuild')")
+    rebuild_summaries(conn.cursor())
+
+
+def populate(db, clients=0, applications=0, seed=1, chunk_size=CHUNK_SIZE, progress=None, fast=False):
+    """
+    Добавляет в базу clients клиентов и applications заявок
+    Заявки распределяются по всем клиентам базы, включая существующих.
+    Номера новых клиентов продолжают уже имеющиеся, поэтому повторный вызов
+    не дает конфликтов телефонов; клиент, чей телефон совпал с введенным
+    вручную, пропускается. fast=True - загрузка без триггеров с последующей
+    перестройкой (см. описание модуля). Возвращает (клиентов, заявок) в базе
+    """
+    if not fast:
+        return _populate(db, clients, applications, seed, chunk_size, progress)
+    with db.connection() as conn:
+        triggers = suspend_triggers(conn)
+    try:
+        return _populate(db, clients, applications, seed, chunk_size, progress)
+    finally:
+        with db.connection() as conn:
+            rebuild_derived(conn)
+            for sql in triggers:
+                conn.execute(sql)
+
+
+def _populate(db, clients, applications, seed, chunk_size, progress):
+    with db.connection() as conn:
+        existing = conn.execute('SELECT COUNT(*) FROM Client').fetchone()[0]
+    _insert_chunked(
+        db, 'INSERT OR IGNORE INTO Client (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?)',
+        generate_clients(clients, seed, start=existing), chunk_size, progress, "Client", clients)
+    with db.connection() as conn:
+        client_ids = [row[0] for row in conn.execute('SELECT Client_ID FROM Client')]
+    if applications and not client_ids:
+        raise ValueError("Для заявок нужны клиенты")
+    _insert_chunked(
+        db, 'INSERT INTO Application (Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID) '
+            'VALUES (?, ?, ?, ?)',
+        generate_applications(applications, client_ids, seed), chunk_size, progress, "Application", applications)
+    with db.connection() as conn:
+        return (conn.execute('SELECT COUNT(*) FROM Client').fetchone()[0],
+                conn.execute('SELECT COUNT(*) FROM Application').fetchone()[0])
+
+
+def print_progress(label, done, total):
+    print(f"\r{label}: {done} из {total}", end="" if done < total else "\n", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Заполнение базы синтетическими клиентами и заявками")
+    parser.add_argument("--db", default="bench.db", help="путь к файлу базы данных")
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--applications", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="строк в одной транзакции")
+    parser.add_argument("--with-triggers", action="store_true",
+                        help="вставлять с триггерами (медленнее, зато пополняется журнал изменений)")
+    args = parser.parse_args(argv)
+
+    # Массовая загрузка: без ожидания fsync на каждой транзакции
+    db = Database(args.db, pool_size=1, pragmas={'synchronous': 'OFF'})
+    start = time.perf_counter()
+    clients, applications = populate(db, args.clients, args.applications, args.seed, args.chunk_size,
+                                     print_progress, fast=not args.with_triggers)
+    elapsed = time.perf_counter() - start
+    db.close()
+    print(f"В базе клиентов: {clients}, заявок: {applications} ({elapsed:.1f} с)")
+
+
+if __name__ == "__main__":
+    main()
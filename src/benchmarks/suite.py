@@ -0,0 +1,450 @@
+"""
+Воспроизводимый набор бенчмарков всех операций LaundrySystem и форматов экспорта
+
+База заполняется генератором datagen (или копируется из готового файла
+--db), затем каждый сценарий выполняется на ней заданное число раз. Время
+каждого вызова замеряется отдельно, результаты пишутся в JSON вместе с
+коммитом, версиями Python и SQLite и параметрами данных. Два файла
+результатов сравниваются режимом --compare: рост медианы больше порога -
+регрессия, код возврата 1.
+
+Запуск из корня проекта:
+    python -m src.benchmarks.suite --clients 20000 --applications 200000 --output before.json
+    python -m src.benchmarks.suite --clients 20000 --applications 200000 --output after.json
+    python -m src.benchmarks.suite --compare before.json after.json --threshold 10
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from src.benchmarks.datagen import populate, generate_clients
+from src.database.db import Database
+from src.export_db import DataExporter, FORMATS
+from src.main import LaundrySystem
+
+# Сценарий -> (функция подготовки, число вызовов). Подготовка получает
+# BenchContext и возвращает операцию op(i); подготовка в замер не входит
+SCENARIOS = {}
+
+
+def scenario(name, iterations):
+    def register(setup):
+        SCENARIOS[name] = (setup, iterations)
+        return setup
+    return register
+
+
+class BenchContext:
+    """Общие данные сценариев: система, выборки ID, источник новых клиентов"""
+    def __init__(self, system, output_dir, seed):
+        self.system = system
+        self.db = system.db
+        self.output_dir = output_dir
+        self.seed = seed
+        self.rng = random.Random(seed)
+        with self.db.connection() as conn:
+            self.client_ids = [row[0] for row in conn.execute('SELECT Client_ID FROM Client')]
+            self.application_ids = [row[0] for row in conn.execute('SELECT Application_ID FROM Application')]
+            self.clients = conn.execute(
+                'SELECT name, phone_number, last_name FROM Client ORDER BY Client_ID LIMIT 10000').fetchall()
+        # Новые клиенты продолжают нумерацию datagen далеко за пределами базы
+        self._next_client = len(self.client_ids) + 10 ** 7
+
+    def sample_clients(self, count):
+        return [self.rng.choice(self.client_ids) for _ in range(count)]
+
+    def sample_applications(self, count):
+        return [self.rng.choice(self.application_ids) for _ in range(count)]
+
+    def new_clients(self, count):
+        """Данные count клиентов с телефонами, которых еще нет в базе"""
+        rows = list(generate_clients(count, self.seed, start=self._next_client))
+        self._next_client += count
+        return rows
+
+    def create_clients(self, count):
+        return [client.Client_ID for client in self.system.create_clients(self.new_clients(count))]
+
+    def create_applications(self, count):
+        rows = [(client_id, 'LOW', 'IN_PROGRESS', 1) for client_id in self.sample_clients(count)]
+        return [application.Application_ID for application in self.system.create_applications(rows)]
+
+
+# Клиенты
+
+@scenario("client.get_by_id", 5000)
+def bench_client_get_by_id(ctx):
+    ids = ctx.sample_clients(5000)
+    return lambda i: ctx.system.get_client_by_id(ids[i % len(ids)])
+
+
+@scenario("client.authenticate", 5000)
+def bench_client_authenticate(ctx):
+    return lambda i: ctx.system.authenticate_client(*ctx.clients[i % len(ctx.clients)][:2])
+
+
+@scenario("client.search_prefix", 2000)
+def bench_client_search_prefix(ctx):
+    queries = [f"{last_name[:5]} {name[:3]}" for name, _, last_name in ctx.clients[:500]]
+    return lambda i: ctx.system.search_clients(queries[i % len(queries)])
+
+
+@scenario("client.search_typo", 200)
+def bench_client_search_typo(ctx):
+    # Одна замена буквы в середине фамилии: точный и префиксный поиск пусты
+    queries = [last_name[:3] + 'ъ' + last_name[4:] for _, _, last_name in ctx.clients[:200]]
+    return lambda i: ctx.system.search_clients(queries[i % len(queries)])
+
+
+@scenario("client.list_page", 1000)
+def bench_client_list_page(ctx):
+    return lambda i: ctx.system.client_repo.find_page(None, ctx.system.page_size)
+
+
+@scenario("client.create", 1000)
+def bench_client_create(ctx):
+    rows = ctx.new_clients(1000)
+    return lambda i: ctx.system.create_client(*rows[i])
+
+
+@scenario("client.create_batch_1000", 10)
+def bench_client_create_batch(ctx):
+    batches = [ctx.new_clients(1000) for _ in range(10)]
+    return lambda i: ctx.system.create_clients(batches[i])
+
+
+@scenario("client.delete", 500)
+def bench_client_delete(ctx):
+    ids = ctx.create_clients(500)
+    for client_id in ids:
+        ctx.system.create_application(client_id, 'LOW', 'IN_PROGRESS', 1)
+    return lambda i: ctx.system.delete_client(ids[i])
+
+
+# Администраторы
+
+@scenario("admin.create", 200)
+def bench_admin_create(ctx):
+    rows = ctx.new_clients(200)
+    return lambda i: ctx.system.create_admin(*rows[i])
+
+
+@scenario("admin.authenticate", 2000)
+def bench_admin_authenticate(ctx):
+    admins = [(admin.name, admin.phone_number) for admin in ctx.system.get_all_admins()]
+    return lambda i: ctx.system.authenticate_admin(*admins[i % len(admins)])
+
+
+# Заявки
+
+@scenario("application.create", 2000)
+def bench_application_create(ctx):
+    ids = ctx.sample_clients(2000)
+    return lambda i: ctx.system.create_application(ids[i], 'MEDIUM', 'IN_PROGRESS', i % 20 + 1)
+
+
+@scenario("application.create_with_slot", 500)
+def bench_application_create_with_slot(ctx):
+    ctx.system.generate_slots('2031-01-01', 30, capacity=5)
+    slots = ctx.system.find_alternative_slots('2031-01-01 09:00', limit=100)
+    ids = ctx.sample_clients(500)
+    return lambda i: ctx.system.create_application(ids[i], 'LOW', 'IN_PROGRESS', 1, slots[i % len(slots)].Slot_ID)
+
+
+@scenario("application.create_batch_1000", 10)
+def bench_application_create_batch(ctx):
+    batches = [[(client_id, 'LOW', 'IN_PROGRESS', 2) for client_id in ctx.sample_clients(1000)] for _ in range(10)]
+    return lambda i: ctx.system.create_applications(batches[i])
+
+
+@scenario("application.update_status", 2000)
+def bench_application_update_status(ctx):
+    # Переходы должны быть разрешены: заявки качаются между IN_PROGRESS и COMPLETED
+    toggle = {'IN_PROGRESS': 'COMPLETED', 'COMPLETED': 'IN_PROGRESS'}
+    status = {}
+    for application_id in ctx.sample_applications(4000):
+        current = ctx.system.application_repo.find_status_version(application_id)[0]
+        if current in toggle:
+            status[application_id] = current
+    ids = list(status)
+
+    def update(i):
+        application_id = ids[i % len(ids)]
+        status[application_id] = toggle[status[application_id]]
+        ctx.system.update_application_status(application_id, status[application_id])
+    return update
+
+
+@scenario("application.update_status_batch_1000", 10)
+def bench_application_update_status_batch(ctx):
+    batches = [ctx.sample_applications(1000) for _ in range(10)]
+    return lambda i: ctx.system.update_applications_status(batches[i], 'COMPLETED')
+
+
+@scenario("application.by_client", 2000)
+def bench_application_by_client(ctx):
+    ids = ctx.sample_clients(2000)
+    return lambda i: ctx.system.get_applications_by_client(ids[i])
+
+
+@scenario("application.by_client_with_relations", 2000)
+def bench_application_by_client_with_relations(ctx):
+    ids = ctx.sample_clients(2000)
+    return lambda i: ctx.system.get_client_applications_with_relations(ids[i])
+
+
+@scenario("application.page_with_relations", 500)
+def bench_application_page_with_relations(ctx):
+    return lambda i: ctx.system.application_repo.find_page_with_relations(None, ctx.system.page_size)
+
+
+@scenario("application.delete", 500)
+def bench_application_delete(ctx):
+    ids = ctx.create_applications(500)
+    return lambda i: ctx.system.delete_application(ids[i])
+
+
+# Оплата
+
+@scenario("payment.pay", 2000)
+def bench_payment_pay(ctx):
+    ids = ctx.create_applications(2000)
+    ctx.system.update_applications_status(ids, 'COMPLETED')
+    return lambda i: ctx.system.pay_application(ids[i], f"suite-{ids[i]}")
+
+
+# Слоты
+
+@scenario("slot.generate_day", 20)
+def bench_slot_generate(ctx):
+    first_day = datetime(2032, 1, 1)
+    return lambda i: ctx.system.generate_slots((first_day + timedelta(days=i)).strftime('%Y-%m-%d'), 1)
+
+
+@scenario("slot.find_alternative", 2000)
+def bench_slot_find_alternative(ctx):
+    ctx.system.generate_slots('2033-01-01', 60)
+    times = [f"2033-{month:02d}-{day:02d} {hour:02d}:30" for month in (1, 2) for day in range(1, 28)
+             for hour in range(9, 21)]
+    return lambda i: ctx.system.find_alternative_slots(times[i % len(times)])
+
+
+# Отчеты
+
+@scenario("report.status", 2000)
+def bench_report_status(ctx):
+    return lambda i: ctx.system.get_status_report()
+
+
+@scenario("report.pollution", 2000)
+def bench_report_pollution(ctx):
+    return lambda i: ctx.system.get_pollution_report()
+
+
+@scenario("report.top_clients", 2000)
+def bench_report_top_clients(ctx):
+    return lambda i: ctx.system.get_top_clients_report()
+
+
+@scenario("report.daily_throughput", 2000)
+def bench_report_daily(ctx):
+    return lambda i: ctx.system.get_daily_throughput_report()
+
+
+# Экспорт: каждый формат отдельно, параллельный экспорт и дельта
+
+def export_setup(fmt):
+    def setup(ctx):
+        exporter = DataExporter(db=ctx.db, output_dir=ctx.output_dir)
+        file_name, writer = FORMATS[fmt]
+        return lambda i: writer(exporter.iter_application_data_with_relations(),
+                                os.path.join(ctx.output_dir, file_name))
+    return setup
+
+
+for _fmt in FORMATS:
+    scenario(f"export.{_fmt}", 1)(export_setup(_fmt))
+
+
+@scenario("export.parallel_all", 1)
+def bench_export_parallel(ctx):
+    exporter = DataExporter(db=ctx.db, output_dir=ctx.output_dir)
+    return lambda i: exporter.run_parallel()
+
+
+@scenario("export.delta_1000", 1)
+def bench_export_delta(ctx):
+    exporter = DataExporter(db=ctx.db, output_dir=ctx.output_dir)
+    exporter.run_delta(name="bench")
+    ctx.system.update_applications_status(ctx.sample_applications(1000), 'CANCELLED')
+    return lambda i: exporter.run_delta(name="bench")
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_scenario(ctx, name, scale=1.0):
+    """Выполняет сценарий, возвращает статистику времени вызова в мкс"""
+    setup, iterations = SCENARIOS[name]
+    iterations = max(1, int(iterations * scale))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        operation = setup(ctx)
+        samples = []
+        started = time.perf_counter()
+        for i in range(iterations):
+            start = time.perf_counter()
+            operation(i)
+            samples.append((time.perf_counter() - start) * 1e6)
+        total = time.perf_counter() - started
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "total_s": total,
+        "mean_us": sum(samples) / iterations,
+        "p50_us": percentile(samples, 0.5),
+        "p95_us": percentile(samples, 0.95),
+        "p99_us": percentile(samples, 0.99),
+        "ops_per_s": iterations / total if total else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare_database(path, template, clients, applications, seed):
+    """Рабочая база бенчмарка: копия готового файла или свежая генерация"""
+    if template:
+        source = Database(template, pool_size=1)
+        with source.connection() as conn:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        source.close()
+        shutil.copyfile(template, path)
+    else:
+        db = Database(path, pool_size=1, pragmas={'synchronous': 'OFF'})
+        populate(db, clients, applications, seed, fast=True)
+        db.close()
+
+
+def select_scenarios(patterns):
+    """Сценарии, имя которых начинается с одного из шаблонов (все - если шаблонов нет)"""
+    if not patterns:
+        return list(SCENARIOS)
+    selected = [name for name in SCENARIOS if any(name.startswith(pattern) for pattern in patterns)]
+    if not selected:
+        raise ValueError(f"Нет сценариев для: {', '.join(patterns)}")
+    return selected
+
+
+def run_suite(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        prepare_database(db_path, args.db, args.clients, args.applications, args.seed)
+        print(f"Подготовка базы: {time.perf_counter() - start:.1f} с")
+
+        system = LaundrySystem(db=Database(db_path))
+        ctx = BenchContext(system, os.path.join(tmp, "out"), args.seed)
+        os.makedirs(ctx.output_dir)
+        dataset = {"clients": len(ctx.client_ids), "applications": len(ctx.application_ids), "seed": args.seed,
+                   "template": os.path.basename(args.db) if args.db else None}
+
+        results = {}
+        print(f"{'сценарий':<40} {'вызовов':>8} {'p50, мкс':>11} {'p95, мкс':>11} {'оп/с':>10}")
+        for name in select_scenarios(args.scenarios):
+            result = results[name] = run_scenario(ctx, name, args.scale)
+            print(f"{name:<40} {result['iterations']:>8} {result['p50_us']:>11.1f} {result['p95_us']:>11.1f} "
+                  f"{result['ops_per_s']:>10.1f}")
+        system.close()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "dataset": dataset,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {args.output}")
+
+
+def compare(base_path, new_path, threshold):
+    """
+    Сравнивает медианы двух прогонов, печатает таблицу
+    Возвращает список сценариев, медиана которых выросла больше чем на threshold %
+    """
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    if base["meta"]["dataset"] != new["meta"]["dataset"]:
+        print(f"Внимание: разные данные ({base['meta']['dataset']} и {new['meta']['dataset']})")
+    print(f"{base['meta']['commit']} -> {new['meta']['commit']}, порог {threshold}%")
+    print(f"{'сценарий':<40} {'было, мкс':>12} {'стало, мкс':>12} {'изменение':>10}")
+    regressions = []
+    for name, result in new["results"].items():
+        if name not in base["results"]:
+            print(f"{name:<40} {'-':>12} {result['p50_us']:>12.1f} {'новый':>10}")
+            continue
+        before, after = base["results"][name]["p50_us"], result["p50_us"]
+        change = (after / before - 1) * 100 if before else 0.0
+        mark = ""
+        if change > threshold:
+            regressions.append(name)
+            mark = "  РЕГРЕССИЯ"
+        print(f"{name:<40} {before:>12.1f} {after:>12.1f} {change:>+9.1f}%{mark}")
+    for name in base["results"]:
+        if name not in new["results"]:
+            print(f"{name:<40} {base['results'][name]['p50_us']:>12.1f} {'-':>12} {'удален':>10}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Набор бенчмарков операций LaundrySystem и экспорта")
+    parser.add_argument("--clients", type=int, default=20000, help="клиентов в сгенерированной базе")
+    parser.add_argument("--applications", type=int, default=200000, help="заявок в сгенерированной базе")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="готовая база (например, от datagen); используется ее копия")
+    parser.add_argument("--scenarios", nargs="*", help="префиксы имен сценариев, например client. export.json")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель числа вызовов сценариев")
+    parser.add_argument("--output", default="bench_results.json", help="файл результатов (JSON)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="сравнить два файла результатов")
+    parser.add_argument("--threshold", type=float, default=10.0, help="с --compare: допустимый рост медианы, %%")
+    parser.add_argument("--list", action="store_true", help="показать сценарии и выйти")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, iterations) in SCENARIOS.items():
+            print(f"{name:<40} {iterations}")
+    elif args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)}")
+            sys.exit(1)
+    else:
+        run_suite(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,304 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from src.database.metrics import InstrumentedConnection
+from src.database.migrations import apply_migrations, latest_version
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений с SQLite
+    Соединения создаются лениво (не больше size штук), PRAGMA настраиваются
+    один раз при открытии соединения. Один поток получает соединение в
+    монопольное пользование до его возврата в пул.
+    metrics - необязательный QueryMetrics: соединения открываются с замером
+    запросов, учитываются открытия соединений и ожидание свободного
+    """
+    def __init__(self, db_path, size=5, timeout=30.0, pragmas=None, metrics=None):
+        if size < 1:
+            raise ValueError("Размер пула должен быть положительным числом")
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self.metrics = metrics
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _open(self):
+        """Открывает новое соединение и применяет PRAGMA"""
+        if self.metrics is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                                   factory=InstrumentedConnection)
+            conn.metrics = self.metrics
+            self.metrics.connection_opened()
+        for name, value in self.pragmas.items():
+            self._set_pragma(conn, name, value)
+        return conn
+
+    def _set_pragma(self, conn, name, value):
+        """
+        PRAGMA с повтором при блокировке: смена journal_mode у новой базы,
+        которую в тот же момент открывает другой процесс, может вернуть
+        "database is locked" сразу, минуя ожидание timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                conn.execute(f'PRAGMA {name} = {value}')
+                return
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+
+    def acquire(self):
+        """Берет свободное соединение из пула или открывает новое"""
+        if self.metrics is None:
+            return self._acquire()
+        start = time.perf_counter()
+        conn = self._acquire()
+        self.metrics.pool_acquired(time.perf_counter() - start)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    conn = self._open()
+                except Exception:
+                    self._created -= 1
+                    raise
+                self._all.append(conn)
+                return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("Нет свободных соединений в пуле") from None
+
+    def release(self, conn):
+        """Возвращает соединение в пул"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._created = 0
+            self._idle = queue.LifoQueue(maxsize=self.size)
 
 
 class Database:
-    def __init__(self, db_path = "laundry.db"):
+    DEFAULT_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 268435456,
+        # Ссылки между таблицами проверяет сама SQLite, без отдельных SELECT
+        'foreign_keys': 'ON',
+    }
+
+    def __init__(self, db_path = "laundry.db", pool_size=5, pragmas=None, metrics=None):
+        """metrics - QueryMetrics для замера запросов (None - без замеров и накладных расходов)"""
         self.db_path = db_path
+        self.metrics = metrics
         self._ensure_db_directory()
+        self.pool = ConnectionPool(db_path, size=pool_size, pragmas={**self.DEFAULT_PRAGMAS, **(pragmas or {})},
+                                   metrics=metrics)
+        self._local = threading.local()  # открытая транзакция текущего потока
         self.init_database()
 
     def get_connection(self):
-        """Создает соединение с базой данных"""
+        """Создает отдельное соединение с базой данных (вне пула)"""
         return sqlite3.connect(self.db_path)
 
+    @contextmanager
+    def connection(self):
+        """
+        Выдает соединение из пула на время блока with
+        При успешном выходе изменения фиксируются, при исключении откатываются.
+        Внутри transaction() выдается соединение этой транзакции, а фиксирует
+        изменения сама транзакция
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self.pool.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.pool.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Единица работы: все запросы репозиториев внутри блока with идут через
+        одно соединение и фиксируются одним COMMIT, при исключении откатываются
+        целиком. Вложенный transaction() присоединяется к внешнему, промежуточные
+        commit пакетных методов (commit_chunk) внутри транзакции пропускаются.
+        Функции, отложенные через after_commit, выполняются после завершения
+        """
+        if getattr(self._local, 'conn', None) is not None:
+            yield self._local.conn
+            return
+        conn = self.pool.acquire()
+        self._local.conn = conn
+        self._local.after_commit = []
+        try:
+            # IMMEDIATE: блокировка записи берется сразу, а не на первом изменении
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            callbacks = self._local.after_commit
+            self._local.conn = None
+            self._local.after_commit = None
+            self.pool.release(conn)
+            # И после отката: в кэш могли попасть незафиксированные строки
+            for callback in callbacks:
+                callback()
+
+    def after_commit(self, callback):
+        """
+        Выполняет callback после завершения открытой в этом потоке транзакции
+        (или сразу, если транзакции нет). Нужно для сброса кэшей: сброс до
+        COMMIT позволяет параллельному читателю снова закэшировать старую строку
+        """
+        callbacks = getattr(self._local, 'after_commit', None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    def commit_chunk(self, conn):
+        """Промежуточный COMMIT пакетной записи; внутри transaction() фиксирует сама транзакция"""
+        if getattr(self._local, 'conn', None) is not conn:
+            conn.commit()
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        self.pool.close()
+
     def _ensure_db_directory(self):
         """Создаёт директорию для БД, если ее нет"""
         db_dir = os.path.dirname(self.db_path)
         if db_dir:
             os.makedirs(db_dir, exist_ok=True)
 
+    def schema_is_current(self, conn):
+        """
+        Схема уже создана и мигрирована до последней версии?
+        PRAGMA user_version читается из заголовка файла БД - это самая дешевая
+        проверка, без обращения к таблицам
+        """
+        return conn.execute('PRAGMA user_version').fetchone()[0] == latest_version()
+
     def init_database(self):
-        """Создание таблиц и ввод начальных данных"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Таблица Client
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Client (
-                Client_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                last_name TEXT NOT NULL,
-                name TEXT NOT NULL,
-                patronymic TEXT NOT NULL,
-                phone_number NUMBER NOT NULL UNIQUE,
-                email TEXT NOT NULL UNIQUE
-            )
-        ''')
-
-        # Таблица PollutionStatus
-        cursor.execute('''
-                CREATE TABLE IF NOT EXISTS PollutionStatus (
-                PollutionStatus_ID TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                comment TEXT  
-            )       
-        ''')
-
-        #Таблица ApplicationStatus
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ApplicationStatus (
-                ApplicationStatus_ID TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                comment TEXT
-            )
-        ''')
-
-        # Таблица Application
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Application (
-                Application_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                Client_ID INTEGER NOT NULL,
-                Number_of_items INTEGER NOT NULL,
-                PollutionStatus_ID TEXT NOT NULL,
-                ApplicationStatus_ID TEXT NOT NULL,
-                FOREIGN KEY(Client_ID) REFERENCES Client(Client_ID),
-                FOREIGN KEY(PollutionStatus_ID) REFERENCES PollutionStatus(PollutionStatus_ID),
-                FOREIGN KEY(ApplicationStatus_ID) REFERENCES ApplicationStatus(ApplicationStatus_ID)
-            )
-        ''')
-
-        #Таблица Admin
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Admin (
-                Admin_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-                last_name TEXT NOT NULL,
-                name TEXT NOT NULL,
-                patronymic TEXT NOT NULL,
-                phone_number NUMBER NOT NULL UNIQUE,
-                email TEXT NOT NULL UNIQUE
-            )
-        ''')
-        self._insert_initial_data(cursor) #Заполняет начальными данными
-        conn.commit()
-        conn.close()
+        """
+        Создание таблиц и ввод начальных данных
+        Если схема уже актуальна, DDL и заполнение начальными данными пропускаются.
+        Несколько процессов, стартующих с одной новой базой, не мешают друг
+        другу: DDL и начальные данные пишутся под блокировкой записи (BEGIN
+        IMMEDIATE) после повторной проверки версии, миграции поступают так же
+        """
+        with self.connection() as conn:
+            if self.schema_is_current(conn):
+                return
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            if self.schema_is_current(conn):
+                conn.commit()
+                return
+
+            # Таблица Client
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Client (
+                    Client_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    last_name TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    patronymic TEXT NOT NULL,
+                    phone_number NUMBER NOT NULL UNIQUE,
+                    email TEXT NOT NULL UNIQUE
+                )
+            ''')
+
+            # Таблица PollutionStatus
+            cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS PollutionStatus (
+                    PollutionStatus_ID TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    comment TEXT
+                )
+            ''')
+
+            #Таблица ApplicationStatus
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ApplicationStatus (
+                    ApplicationStatus_ID TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    comment TEXT
+                )
+            ''')
+
+            # Таблица Application
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Application (
+                    Application_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    Client_ID INTEGER NOT NULL,
+                    Number_of_items INTEGER NOT NULL,
+                    PollutionStatus_ID TEXT NOT NULL,
+                    ApplicationStatus_ID TEXT NOT NULL,
+                    FOREIGN KEY(Client_ID) REFERENCES Client(Client_ID),
+                    FOREIGN KEY(PollutionStatus_ID) REFERENCES PollutionStatus(PollutionStatus_ID),
+                    FOREIGN KEY(ApplicationStatus_ID) REFERENCES ApplicationStatus(ApplicationStatus_ID)
+                )
+            ''')
+
+            #Таблица Admin
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Admin (
+                    Admin_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                    last_name TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    patronymic TEXT NOT NULL,
+                    phone_number NUMBER NOT NULL UNIQUE,
+                    email TEXT NOT NULL UNIQUE
+                )
+            ''')
+            self._insert_initial_data(cursor) #Заполняет начальными данными
+            conn.commit()
+            apply_migrations(conn) #Индексы и прочие изменения схемы
+            # Отметка "схема актуальна" ставится последней: если инициализация
+            # прервется, при следующем старте она выполнится заново
+            conn.execute(f'PRAGMA user_version = {latest_version()}')
 
     def _insert_initial_data(self, cursor):
         """Вставляет начальные данные в таблицу"""
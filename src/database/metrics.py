@@ -0,0 +1,279 @@
+"""
+Измерение запросов к SQLite: время, число вызовов, строки, медленные запросы
+
+Включается передачей QueryMetrics в Database (или ConnectionPool). Тогда
+соединения пула открываются с InstrumentedConnection, и каждый execute,
+executemany, fetch* и commit замеряется. Без QueryMetrics соединения
+обычные и накладных расходов нет.
+
+    metrics = QueryMetrics(slow_query_ms=50)
+    db = Database("laundry.db", metrics=metrics)
+    ...
+    print(metrics.to_prometheus())
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Верхние границы корзин гистограммы времени запроса, мс (последняя - +Inf)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+SLOW_LOG_SIZE = 100
+PARAMS_PREVIEW = 200  # сколько символов параметров сохранять в журнале медленных запросов
+
+
+def normalize_sql(sql):
+    """Текст запроса для группировки: пробелы схлопнуты, списки ?, ?, ? свернуты"""
+    sql = ' '.join(sql.split())
+    return re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', sql)
+
+
+class QueryStat:
+    """Счетчики одного запроса (по нормализованному тексту)"""
+    __slots__ = ('sql', 'calls', 'errors', 'seconds', 'fetch_seconds', 'rows', 'buckets')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0  # выполнение execute/executemany
+        self.fetch_seconds = 0.0  # чтение строк результата
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def to_dict(self):
+        return {
+            "sql": self.sql,
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "fetch_seconds": self.fetch_seconds,
+            "rows": self.rows,
+            "histogram_ms": dict(zip([*map(str, BUCKETS_MS), "+Inf"], self.buckets)),
+        }
+
+
+class QueryMetrics:
+    """
+    Потокобезопасный сборщик статистики запросов и соединений
+    slow_query_ms - порог медленного запроса (None - журнал не ведется),
+    slow_log - файл, в который дописываются медленные запросы (необязательно)
+    """
+    def __init__(self, slow_query_ms=100.0, slow_log=None, slow_log_size=SLOW_LOG_SIZE):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log = slow_log
+        self._lock = threading.Lock()
+        self._normalized = {}
+        self._stats = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.pool_acquires = 0
+        self.pool_wait_seconds = 0.0
+
+    def _stat(self, sql):
+        normalized = self._normalized.get(sql)
+        if normalized is None:
+            normalized = self._normalized[sql] = normalize_sql(sql)
+        stat = self._stats.get(normalized)
+        if stat is None:
+            stat = self._stats[normalized] = QueryStat(normalized)
+        return stat
+
+    def observe(self, sql, seconds, parameters=None, error=False):
+        """Учитывает выполнение запроса, возвращает его QueryStat"""
+        milliseconds = seconds * 1000
+        with self._lock:
+            stat = self._stat(sql)
+            stat.calls += 1
+            stat.errors += error
+            stat.seconds += seconds
+            stat.buckets[bisect_left(BUCKETS_MS, milliseconds)] += 1
+        if self.slow_query_ms is not None and milliseconds >= self.slow_query_ms:
+            self._log_slow(stat.sql, milliseconds, parameters)
+        return stat
+
+    def observe_fetch(self, stat, seconds, rows):
+        """Учитывает чтение rows строк результата запроса stat"""
+        with self._lock:
+            stat.fetch_seconds += seconds
+            stat.rows += rows
+
+    def _log_slow(self, sql, milliseconds, parameters):
+        entry = {
+            "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "ms": round(milliseconds, 3),
+            "sql": sql,
+            "parameters": repr(parameters)[:PARAMS_PREVIEW] if parameters else None,
+        }
+        with self._lock:
+            self._slow.append(entry)
+            if self.slow_log:
+                with open(self.slow_log, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def connection_closed(self):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_acquired(self, wait_seconds):
+        with self._lock:
+            self.pool_acquires += 1
+            self.pool_wait_seconds += wait_seconds
+
+    def reset(self):
+        """Обнуляет всю накопленную статистику"""
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self.connections_opened = self.connections_closed = self.pool_acquires = 0
+            self.pool_wait_seconds = 0.0
+
+    def snapshot(self):
+        """Вся статистика словарем; запросы - по убыванию суммарного времени"""
+        with self._lock:
+            queries = sorted((stat.to_dict() for stat in self._stats.values()),
+                             key=lambda stat: stat["seconds"] + stat["fetch_seconds"], reverse=True)
+            return {
+                "connections": {"opened": self.connections_opened, "closed": self.connections_closed},
+                "pool": {"acquires": self.pool_acquires, "wait_seconds": self.pool_wait_seconds},
+                "queries": queries,
+                "slow_query_ms": self.slow_query_ms,
+                "slow_queries": list(self._slow),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Статистика в текстовом формате Prometheus"""
+        data = self.snapshot()
+        lines = [
+            "# TYPE laundry_db_connections_opened_total counter",
+            f"laundry_db_connections_opened_total {data['connections']['opened']}",
+            "# TYPE laundry_db_connections_closed_total counter",
+            f"laundry_db_connections_closed_total {data['connections']['closed']}",
+            "# TYPE laundry_db_pool_acquires_total counter",
+            f"laundry_db_pool_acquires_total {data['pool']['acquires']}",
+            "# TYPE laundry_db_pool_wait_seconds_total counter",
+            f"laundry_db_pool_wait_seconds_total {data['pool']['wait_seconds']}",
+            "# TYPE laundry_db_slow_queries_logged gauge",
+            f"laundry_db_slow_queries_logged {len(data['slow_queries'])}",
+            "# TYPE laundry_db_query_duration_seconds histogram",
+        ]
+        counters = {"laundry_db_query_errors_total": [], "laundry_db_query_rows_total": [],
+                    "laundry_db_query_fetch_seconds_total": []}
+        for query in data["queries"]:
+            label = 'sql="%s"' % query["sql"].replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in query["histogram_ms"].items():
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound) / 1000)
+                lines.append(f'laundry_db_query_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f'laundry_db_query_duration_seconds_sum{{{label}}} {query["seconds"]}')
+            lines.append(f'laundry_db_query_duration_seconds_count{{{label}}} {query["calls"]}')
+            counters["laundry_db_query_errors_total"].append(f'{{{label}}} {query["errors"]}')
+            counters["laundry_db_query_rows_total"].append(f'{{{label}}} {query["rows"]}')
+            counters["laundry_db_query_fetch_seconds_total"].append(f'{{{label}}} {query["fetch_seconds"]}')
+        for name, samples in counters.items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(name + sample for sample in samples)
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """Записывает статистику в файл: .prom/.txt - формат Prometheus, иначе JSON"""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Курсор, замеряющий execute/executemany и чтение строк"""
+    _stat = None
+
+    def execute(self, sql, parameters=()):
+        metrics = self.connection.metrics
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except Exception:
+            metrics.observe(sql, time.perf_counter() - start, parameters, error=True)
+            raise
+        self._stat = metrics.observe(sql, time.perf_counter() - start, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        metrics = self.connection.metrics
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except Exception:
+            metrics.observe(sql, time.perf_counter() - start, error=True)
+            raise
+        self._stat = metrics.observe(sql, time.perf_counter() - start)
+        return self
+
+    def _fetched(self, start, rows):
+        if self._stat is not None:
+            self.connection.metrics.observe_fetch(self._stat, time.perf_counter() - start, rows)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._fetched(start, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Соединение, все запросы которого идут через InstrumentedCursor"""
+    metrics = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute создает обычный курсор в обход cursor(), поэтому
+    # сокращенные формы переопределены явно
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        super().commit()
+        self.metrics.observe('COMMIT', time.perf_counter() - start)
+
+    def rollback(self):
+        start = time.perf_counter()
+        super().rollback()
+        self.metrics.observe('ROLLBACK', time.perf_counter() - start)
+
+    def close(self):
+        super().close()
+        self.metrics.connection_closed()
@@ -0,0 +1,447 @@
+"""
+Версионированные миграции схемы БД
+
+Каждая миграция - (версия, описание, шаги). Шаг - SQL-строка или функция,
+принимающая курсор. Примененные версии хранятся в таблице schema_version,
+при старте применяются только недостающие, строго по возрастанию версии.
+"""
+
+
+def rebuild_summaries(cursor):
+    """
+    Пересчитывает сводки по статусу, загрязнению и клиентам по таблице Application
+    Дневная сводка не пересчитывается: у заявок нет даты создания
+    """
+    cursor.execute('DELETE FROM StatusSummary')
+    cursor.execute('''INSERT INTO StatusSummary (ApplicationStatus_ID, applications, items)
+                      SELECT ApplicationStatus_ID, COUNT(*), COALESCE(SUM(Number_of_items), 0)
+                      FROM Application GROUP BY ApplicationStatus_ID''')
+    cursor.execute('DELETE FROM PollutionSummary')
+    cursor.execute('''INSERT INTO PollutionSummary (PollutionStatus_ID, applications, items)
+                      SELECT PollutionStatus_ID, COUNT(*), COALESCE(SUM(Number_of_items), 0)
+                      FROM Application GROUP BY PollutionStatus_ID''')
+    cursor.execute('DELETE FROM ClientSummary')
+    cursor.execute('''INSERT INTO ClientSummary (Client_ID, applications, items)
+                      SELECT Client_ID, COUNT(*), COALESCE(SUM(Number_of_items), 0)
+                      FROM Application GROUP BY Client_ID''')
+
+
+MIGRATIONS = [
+    (1, "Покрывающий индекс заявок по клиенту", [
+        '''CREATE INDEX IF NOT EXISTS idx_application_client
+           ON Application (Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID)''',
+    ]),
+    (2, "Индексы заявок по статусу и степени загрязнения", [
+        '''CREATE INDEX IF NOT EXISTS idx_application_status
+           ON Application (ApplicationStatus_ID, Client_ID, Number_of_items, PollutionStatus_ID)''',
+        'CREATE INDEX IF NOT EXISTS idx_application_pollution ON Application (PollutionStatus_ID)',
+    ]),
+    (3, "Слоты времени забора вещей и их занятость", [
+        '''CREATE TABLE IF NOT EXISTS Slot (
+               Slot_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+               start_time TEXT NOT NULL UNIQUE,
+               end_time TEXT NOT NULL,
+               capacity INTEGER NOT NULL CHECK (capacity > 0),
+               booked INTEGER NOT NULL DEFAULT 0 CHECK (booked >= 0 AND booked <= capacity),
+               CHECK (end_time > start_time)
+           )''',
+        # Частичный индекс только по свободным слотам: поиск ближайших свободных
+        # интервалов не просматривает заполненные
+        '''CREATE INDEX IF NOT EXISTS idx_slot_free
+           ON Slot (start_time, end_time) WHERE booked < capacity''',
+        'ALTER TABLE Application ADD COLUMN Slot_ID INTEGER REFERENCES Slot(Slot_ID)',
+        'CREATE INDEX IF NOT EXISTS idx_application_slot ON Application (Slot_ID)',
+        # Занятость слота меняется в той же инструкции, что и заявка. Переполнение
+        # слота нарушает CHECK (booked <= capacity) и откатывает всю вставку
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_slot_insert
+           AFTER INSERT ON Application WHEN NEW.Slot_ID IS NOT NULL
+           BEGIN
+               UPDATE Slot SET booked = booked + 1 WHERE Slot_ID = NEW.Slot_ID;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_slot_delete
+           AFTER DELETE ON Application WHEN OLD.Slot_ID IS NOT NULL
+           BEGIN
+               UPDATE Slot SET booked = booked - 1 WHERE Slot_ID = OLD.Slot_ID;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_slot_update
+           AFTER UPDATE OF Slot_ID ON Application WHEN OLD.Slot_ID IS NOT NEW.Slot_ID
+           BEGIN
+               UPDATE Slot SET booked = booked - 1 WHERE Slot_ID = OLD.Slot_ID;
+               UPDATE Slot SET booked = booked + 1 WHERE Slot_ID = NEW.Slot_ID;
+           END''',
+    ]),
+    (4, "Журнал изменений заявок и клиентов для инкрементального экспорта", [
+        '''CREATE TABLE IF NOT EXISTS ChangeLog (
+               Change_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+               table_name TEXT NOT NULL,
+               row_id INTEGER NOT NULL,
+               operation TEXT NOT NULL CHECK (operation IN ('I', 'U', 'D')),
+               changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+           )''',
+        # Отметка экспорта: до какого Change_ID изменения уже выгружены
+        '''CREATE TABLE IF NOT EXISTS ExportWatermark (
+               name TEXT PRIMARY KEY,
+               change_id INTEGER NOT NULL,
+               exported_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_changelog_insert
+           AFTER INSERT ON Application
+           BEGIN
+               INSERT INTO ChangeLog (table_name, row_id, operation) VALUES ('Application', NEW.Application_ID, 'I');
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_changelog_update
+           AFTER UPDATE ON Application
+           BEGIN
+               INSERT INTO ChangeLog (table_name, row_id, operation) VALUES ('Application', NEW.Application_ID, 'U');
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_changelog_delete
+           AFTER DELETE ON Application
+           BEGIN
+               INSERT INTO ChangeLog (table_name, row_id, operation) VALUES ('Application', OLD.Application_ID, 'D');
+           END''',
+        # Данные клиента входят в выгрузку каждой его заявки. Добавление клиента
+        # без заявок выгрузку не меняет, а удаление проходит через удаление заявок
+        '''CREATE TRIGGER IF NOT EXISTS trg_client_changelog_update
+           AFTER UPDATE ON Client
+           BEGIN
+               INSERT INTO ChangeLog (table_name, row_id, operation) VALUES ('Client', NEW.Client_ID, 'U');
+           END''',
+    ]),
+    (5, "Сводные таблицы для отчетов, обновляемые триггерами", [
+        '''CREATE TABLE IF NOT EXISTS StatusSummary (
+               ApplicationStatus_ID TEXT PRIMARY KEY,
+               applications INTEGER NOT NULL DEFAULT 0,
+               items INTEGER NOT NULL DEFAULT 0
+           )''',
+        '''CREATE TABLE IF NOT EXISTS PollutionSummary (
+               PollutionStatus_ID TEXT PRIMARY KEY,
+               applications INTEGER NOT NULL DEFAULT 0,
+               items INTEGER NOT NULL DEFAULT 0
+           )''',
+        '''CREATE TABLE IF NOT EXISTS ClientSummary (
+               Client_ID INTEGER PRIMARY KEY,
+               applications INTEGER NOT NULL DEFAULT 0,
+               items INTEGER NOT NULL DEFAULT 0
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_client_summary_items ON ClientSummary (items DESC, applications DESC)',
+        '''CREATE TABLE IF NOT EXISTS DailySummary (
+               day TEXT PRIMARY KEY,
+               received INTEGER NOT NULL DEFAULT 0,
+               completed INTEGER NOT NULL DEFAULT 0,
+               items INTEGER NOT NULL DEFAULT 0
+           )''',
+        # Новая заявка: +1 заявка и +N вещей в строках своего статуса, степени
+        # загрязнения, клиента и текущего дня
+        '''CREATE TRIGGER IF NOT EXISTS trg_summary_insert
+           AFTER INSERT ON Application
+           BEGIN
+               INSERT INTO StatusSummary (ApplicationStatus_ID, applications, items)
+               VALUES (NEW.ApplicationStatus_ID, 1, NEW.Number_of_items)
+               ON CONFLICT(ApplicationStatus_ID) DO UPDATE
+               SET applications = applications + 1, items = items + excluded.items;
+               INSERT INTO PollutionSummary (PollutionStatus_ID, applications, items)
+               VALUES (NEW.PollutionStatus_ID, 1, NEW.Number_of_items)
+               ON CONFLICT(PollutionStatus_ID) DO UPDATE
+               SET applications = applications + 1, items = items + excluded.items;
+               INSERT INTO ClientSummary (Client_ID, applications, items)
+               VALUES (NEW.Client_ID, 1, NEW.Number_of_items)
+               ON CONFLICT(Client_ID) DO UPDATE
+               SET applications = applications + 1, items = items + excluded.items;
+               INSERT INTO DailySummary (day, received, items)
+               VALUES (date('now', 'localtime'), 1, NEW.Number_of_items)
+               ON CONFLICT(day) DO UPDATE SET received = received + 1, items = items + excluded.items;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_summary_delete
+           AFTER DELETE ON Application
+           BEGIN
+               UPDATE StatusSummary SET applications = applications - 1, items = items - OLD.Number_of_items
+               WHERE ApplicationStatus_ID = OLD.ApplicationStatus_ID;
+               UPDATE PollutionSummary SET applications = applications - 1, items = items - OLD.Number_of_items
+               WHERE PollutionStatus_ID = OLD.PollutionStatus_ID;
+               UPDATE ClientSummary SET applications = applications - 1, items = items - OLD.Number_of_items
+               WHERE Client_ID = OLD.Client_ID;
+               DELETE FROM ClientSummary WHERE Client_ID = OLD.Client_ID AND applications = 0;
+           END''',
+        # При изменении заявки срабатывают только триггеры затронутых сводок
+        '''CREATE TRIGGER IF NOT EXISTS trg_summary_status_update
+           AFTER UPDATE OF ApplicationStatus_ID, Number_of_items ON Application
+           WHEN OLD.ApplicationStatus_ID IS NOT NEW.ApplicationStatus_ID OR OLD.Number_of_items != NEW.Number_of_items
+           BEGIN
+               UPDATE StatusSummary SET applications = applications - 1, items = items - OLD.Number_of_items
+               WHERE ApplicationStatus_ID = OLD.ApplicationStatus_ID;
+               INSERT INTO StatusSummary (ApplicationStatus_ID, applications, items)
+               VALUES (NEW.ApplicationStatus_ID, 1, NEW.Number_of_items)
+               ON CONFLICT(ApplicationStatus_ID) DO UPDATE
+               SET applications = applications + 1, items = items + excluded.items;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_summary_pollution_update
+           AFTER UPDATE OF PollutionStatus_ID, Number_of_items ON Application
+           WHEN OLD.PollutionStatus_ID IS NOT NEW.PollutionStatus_ID OR OLD.Number_of_items != NEW.Number_of_items
+           BEGIN
+               UPDATE PollutionSummary SET applications = applications - 1, items = items - OLD.Number_of_items
+               WHERE PollutionStatus_ID = OLD.PollutionStatus_ID;
+               INSERT INTO PollutionSummary (PollutionStatus_ID, applications, items)
+               VALUES (NEW.PollutionStatus_ID, 1, NEW.Number_of_items)
+               ON CONFLICT(PollutionStatus_ID) DO UPDATE
+               SET applications = applications + 1, items = items + excluded.items;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_summary_client_update
+           AFTER UPDATE OF Client_ID, Number_of_items ON Application
+           WHEN OLD.Client_ID IS NOT NEW.Client_ID OR OLD.Number_of_items != NEW.Number_of_items
+           BEGIN
+               UPDATE ClientSummary SET applications = applications - 1, items = items - OLD.Number_of_items
+               WHERE Client_ID = OLD.Client_ID;
+               DELETE FROM ClientSummary WHERE Client_ID = OLD.Client_ID AND applications = 0;
+               INSERT INTO ClientSummary (Client_ID, applications, items)
+               VALUES (NEW.Client_ID, 1, NEW.Number_of_items)
+               ON CONFLICT(Client_ID) DO UPDATE
+               SET applications = applications + 1, items = items + excluded.items;
+           END''',
+        # Пропускная способность: сколько заявок выполнено за день
+        '''CREATE TRIGGER IF NOT EXISTS trg_summary_completed
+           AFTER UPDATE OF ApplicationStatus_ID ON Application
+           WHEN NEW.ApplicationStatus_ID = 'COMPLETED' AND OLD.ApplicationStatus_ID IS NOT 'COMPLETED'
+           BEGIN
+               INSERT INTO DailySummary (day, completed) VALUES (date('now', 'localtime'), 1)
+               ON CONFLICT(day) DO UPDATE SET completed = completed + 1;
+           END''',
+        rebuild_summaries,
+    ]),
+    (6, "Полнотекстовый поиск клиентов (FTS5)", [
+        # Индексы без копии данных (content='Client'): текст берется из Client
+        # по rowid = Client_ID. ClientSearch - слова с префиксными индексами на
+        # 2-8 символов: запрос по началу слова такой длины читает готовый список
+        # строк, а не собирает его из всех подходящих слов. ClientTrigram -
+        # триграммы для поиска с опечатками и по части телефона
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS ClientSearch USING fts5(
+               last_name, name, patronymic, email, phone_number,
+               content='Client', content_rowid='Client_ID',
+               tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6 7 8'
+           )''',
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS ClientTrigram USING fts5(
+               last_name, name, patronymic, phone_number,
+               content='Client', content_rowid='Client_ID', tokenize='trigram'
+           )''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_client_search_insert
+           AFTER INSERT ON Client
+           BEGIN
+               INSERT INTO ClientSearch (rowid, last_name, name, patronymic, email, phone_number)
+               VALUES (NEW.Client_ID, NEW.last_name, NEW.name, NEW.patronymic, NEW.email, NEW.phone_number);
+               INSERT INTO ClientTrigram (rowid, last_name, name, patronymic, phone_number)
+               VALUES (NEW.Client_ID, NEW.last_name, NEW.name, NEW.patronymic, NEW.phone_number);
+           END''',
+        # Из индекса без копии данных удаляют, передавая старые значения строки
+        '''CREATE TRIGGER IF NOT EXISTS trg_client_search_delete
+           AFTER DELETE ON Client
+           BEGIN
+               INSERT INTO ClientSearch (ClientSearch, rowid, last_name, name, patronymic, email, phone_number)
+               VALUES ('delete', OLD.Client_ID, OLD.last_name, OLD.name, OLD.patronymic, OLD.email, OLD.phone_number);
+               INSERT INTO ClientTrigram (ClientTrigram, rowid, last_name, name, patronymic, phone_number)
+               VALUES ('delete', OLD.Client_ID, OLD.last_name, OLD.name, OLD.patronymic, OLD.phone_number);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_client_search_update
+           AFTER UPDATE OF last_name, name, patronymic, email, phone_number ON Client
+           BEGIN
+               INSERT INTO ClientSearch (ClientSearch, rowid, last_name, name, patronymic, email, phone_number)
+               VALUES ('delete', OLD.Client_ID, OLD.last_name, OLD.name, OLD.patronymic, OLD.email, OLD.phone_number);
+               INSERT INTO ClientSearch (rowid, last_name, name, patronymic, email, phone_number)
+               VALUES (NEW.Client_ID, NEW.last_name, NEW.name, NEW.patronymic, NEW.email, NEW.phone_number);
+               INSERT INTO ClientTrigram (ClientTrigram, rowid, last_name, name, patronymic, phone_number)
+               VALUES ('delete', OLD.Client_ID, OLD.last_name, OLD.name, OLD.patronymic, OLD.phone_number);
+               INSERT INTO ClientTrigram (rowid, last_name, name, patronymic, phone_number)
+               VALUES (NEW.Client_ID, NEW.last_name, NEW.name, NEW.patronymic, NEW.phone_number);
+           END''',
+        # Индексация уже существующих клиентов
+        "INSERT INTO ClientSearch (ClientSearch) VALUES ('rebuild')",
+        "INSERT INTO ClientTrigram (ClientTrigram) VALUES ('rebuild')",
+    ]),
+    (7, "Жизненный цикл заявки: оплата, версии, разрешенные переходы и их история", [
+        "INSERT OR IGNORE INTO ApplicationStatus (ApplicationStatus_ID, name, comment) "
+        "VALUES ('PAID', 'Оплачена', 'Заявка оплачена')",
+        # Версия увеличивается при каждом изменении заявки: смена статуса с
+        # ожидаемой версией не затрет чужое изменение (оптимистичная блокировка)
+        'ALTER TABLE Application ADD COLUMN version INTEGER NOT NULL DEFAULT 0',
+        '''CREATE TABLE IF NOT EXISTS StatusTransition (
+               from_status TEXT NOT NULL REFERENCES ApplicationStatus(ApplicationStatus_ID),
+               to_status TEXT NOT NULL REFERENCES ApplicationStatus(ApplicationStatus_ID),
+               PRIMARY KEY (from_status, to_status)
+           ) WITHOUT ROWID''',
+        # Оплаченная и отмененная заявки - конечные состояния
+        '''INSERT OR IGNORE INTO StatusTransition (from_status, to_status) VALUES
+               ('IN_PROGRESS', 'COMPLETED'),
+               ('IN_PROGRESS', 'CANCELLED'),
+               ('COMPLETED', 'PAID'),
+               ('COMPLETED', 'IN_PROGRESS'),
+               ('COMPLETED', 'CANCELLED')''',
+        # Без внешнего ключа на Application: история остается после удаления заявки
+        '''CREATE TABLE IF NOT EXISTS ApplicationStatusHistory (
+               History_ID INTEGER PRIMARY KEY,
+               Application_ID INTEGER NOT NULL,
+               from_status TEXT,
+               to_status TEXT NOT NULL,
+               version INTEGER NOT NULL,
+               changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_status_history_application
+           ON ApplicationStatusHistory (Application_ID, History_ID)''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_status_history
+           AFTER UPDATE OF ApplicationStatus_ID ON Application
+           WHEN OLD.ApplicationStatus_ID IS NOT NEW.ApplicationStatus_ID
+           BEGIN
+               INSERT INTO ApplicationStatusHistory (Application_ID, from_status, to_status, version)
+               VALUES (NEW.Application_ID, OLD.ApplicationStatus_ID, NEW.ApplicationStatus_ID, NEW.version);
+           END''',
+    ]),
+    (8, "Оплата: тарифы, платежи с ключами идемпотентности и журнал проводок", [
+        # Суммы хранятся в копейках
+        '''CREATE TABLE IF NOT EXISTS Tariff (
+               PollutionStatus_ID TEXT PRIMARY KEY REFERENCES PollutionStatus(PollutionStatus_ID),
+               base_price INTEGER NOT NULL,
+               item_price INTEGER NOT NULL
+           ) WITHOUT ROWID''',
+        '''INSERT OR IGNORE INTO Tariff (PollutionStatus_ID, base_price, item_price) VALUES
+               ('LOW', 20000, 15000),
+               ('MEDIUM', 20000, 20000),
+               ('HIGH', 20000, 30000)''',
+        # Без внешнего ключа на Application: платеж остается после удаления заявки
+        '''CREATE TABLE IF NOT EXISTS Payment (
+               Payment_ID INTEGER PRIMARY KEY,
+               idempotency_key TEXT NOT NULL UNIQUE,
+               Application_ID INTEGER NOT NULL,
+               amount INTEGER NOT NULL CHECK (amount > 0),
+               status TEXT NOT NULL CHECK (status IN ('SUCCEEDED', 'DECLINED')),
+               gateway_ref TEXT,
+               created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+           )''',
+        # Успешный платеж у заявки может быть только один
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_application_succeeded "
+        "ON Payment (Application_ID) WHERE status = 'SUCCEEDED'",
+        'CREATE INDEX IF NOT EXISTS idx_payment_application ON Payment (Application_ID)',
+        # Двойная запись: по каждому успешному платежу списание со счета клиента
+        # и зачисление на выручку, сумма проводок платежа равна нулю
+        '''CREATE TABLE IF NOT EXISTS Ledger (
+               Entry_ID INTEGER PRIMARY KEY,
+               Payment_ID INTEGER NOT NULL REFERENCES Payment(Payment_ID),
+               account TEXT NOT NULL,
+               amount INTEGER NOT NULL,
+               created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+           )''',
+        'CREATE INDEX IF NOT EXISTS idx_ledger_payment ON Ledger (Payment_ID)',
+        'CREATE INDEX IF NOT EXISTS idx_ledger_account ON Ledger (account, amount)',
+        # Платежи и проводки только добавляются: исправление - новая проводка
+        '''CREATE TRIGGER IF NOT EXISTS trg_payment_no_update BEFORE UPDATE ON Payment
+           BEGIN SELECT RAISE(ABORT, 'Платежи нельзя изменять'); END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_payment_no_delete BEFORE DELETE ON Payment
+           BEGIN SELECT RAISE(ABORT, 'Платежи нельзя удалять'); END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_ledger_no_update BEFORE UPDATE ON Ledger
+           BEGIN SELECT RAISE(ABORT, 'Проводки нельзя изменять'); END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_ledger_no_delete BEFORE DELETE ON Ledger
+           BEGIN SELECT RAISE(ABORT, 'Проводки нельзя удалять'); END''',
+    ]),
+    (9, "Статус PAID ставится только оплатой", [
+        # Переход в PAID выполняет только запись платежа (PaymentRepository.insert_batch),
+        # в графе ручных переходов его нет
+        "DELETE FROM StatusTransition WHERE to_status = 'PAID'",
+        # Оплаченная заявка без успешного платежа разошлась бы с журналом проводок
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_paid_update
+           BEFORE UPDATE OF ApplicationStatus_ID ON Application
+           WHEN NEW.ApplicationStatus_ID = 'PAID' AND NOT EXISTS (
+               SELECT 1 FROM Payment WHERE Application_ID = NEW.Application_ID AND status = 'SUCCEEDED')
+           BEGIN SELECT RAISE(ABORT, 'Статус PAID ставится только оплатой заявки'); END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_application_paid_insert
+           BEFORE INSERT ON Application
+           WHEN NEW.ApplicationStatus_ID = 'PAID'
+           BEGIN SELECT RAISE(ABORT, 'Статус PAID ставится только оплатой заявки'); END''',
+    ]),
+    (10, "Отмененная заявка освобождает место в слоте", [
+        # Отмененная заявка не занимает место: вставка и удаление ее не учитывают,
+        # а смена слота или статуса снимает место со старого слота, если заявка
+        # не была отменена, и занимает в новом, если не отменена теперь.
+        # Возврат из CANCELLED в заполненный слот нарушит CHECK (booked <= capacity)
+        'DROP TRIGGER IF EXISTS trg_application_slot_insert',
+        'DROP TRIGGER IF EXISTS trg_application_slot_delete',
+        'DROP TRIGGER IF EXISTS trg_application_slot_update',
+        '''CREATE TRIGGER trg_application_slot_insert
+           AFTER INSERT ON Application
+           WHEN NEW.Slot_ID IS NOT NULL AND NEW.ApplicationStatus_ID IS NOT 'CANCELLED'
+           BEGIN
+               UPDATE Slot SET booked = booked + 1 WHERE Slot_ID = NEW.Slot_ID;
+           END''',
+        '''CREATE TRIGGER trg_application_slot_delete
+           AFTER DELETE ON Application
+           WHEN OLD.Slot_ID IS NOT NULL AND OLD.ApplicationStatus_ID IS NOT 'CANCELLED'
+           BEGIN
+               UPDATE Slot SET booked = booked - 1 WHERE Slot_ID = OLD.Slot_ID;
+           END''',
+        '''CREATE TRIGGER trg_application_slot_update
+           AFTER UPDATE OF Slot_ID, ApplicationStatus_ID ON Application
+           WHEN OLD.Slot_ID IS NOT NEW.Slot_ID
+               OR (OLD.ApplicationStatus_ID = 'CANCELLED') IS NOT (NEW.ApplicationStatus_ID = 'CANCELLED')
+           BEGIN
+               UPDATE Slot SET booked = booked - 1
+               WHERE Slot_ID = OLD.Slot_ID AND OLD.ApplicationStatus_ID IS NOT 'CANCELLED';
+               UPDATE Slot SET booked = booked + 1
+               WHERE Slot_ID = NEW.Slot_ID AND NEW.ApplicationStatus_ID IS NOT 'CANCELLED';
+           END''',
+        # Места, которые до этой миграции держали уже отмененные заявки
+        '''UPDATE Slot SET booked = (
+               SELECT COUNT(*) FROM Application
+               WHERE Application.Slot_ID = Slot.Slot_ID AND ApplicationStatus_ID != 'CANCELLED')
+           WHERE booked != (
+               SELECT COUNT(*) FROM Application
+               WHERE Application.Slot_ID = Slot.Slot_ID AND ApplicationStatus_ID != 'CANCELLED')''',
+    ]),
+]
+
+
+def get_schema_version(conn):
+    """Текущая версия схемы (0, если миграции еще не применялись)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def latest_version():
+    """Версия последней известной миграции"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def apply_migrations(conn):
+    """
+    Применяет недостающие миграции, каждую в отдельной транзакции
+    Транзакция берет блокировку записи сразу (BEGIN IMMEDIATE), и версия
+    схемы перечитывается уже под ней: если миграцию успел применить другой
+    процесс, она пропускается. Возвращает список примененных версий
+    """
+    if conn.in_transaction:
+        conn.commit()
+    current = get_schema_version(conn)
+    applied = []
+    for version, description, steps in sorted(MIGRATIONS, key=lambda migration: migration[0]):
+        if version <= current:
+            continue
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            current = get_schema_version(conn)
+            if version <= current:
+                conn.commit()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                           (version, description))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
@@ -0,0 +1,85 @@
+"""
+Офлайн-очистка дубликатов клиентов и администраторов по номеру телефона
+
+Новые дубликаты не появляются: таблицы имеют UNIQUE-индекс телефона,
+регистрация с занятым телефоном отклоняется, а пакетная загрузка работает
+как UPSERT. Задача нужна только для старых баз, созданных
+до этого. Запуск из корня проекта:
+    python -m src.dedup --db laundry.db
+"""
+import argparse
+
+from src.database.db import Database
+
+# Таблица -> (ключ, таблица ссылок и колонка ссылки на эту запись)
+TABLES = {
+    "Client": ("Client_ID", ("Application", "Client_ID")),
+    "Admin": ("Admin_ID", None),
+}
+
+
+def find_duplicate_groups(db, table):
+    """Телефоны с несколькими записями: [(телефон, оставляемый ID, [ID дубликатов])]"""
+    id_column, _ = TABLES[table]
+    with db.connection() as conn:
+        cursor = conn.execute(
+            f'SELECT phone_number, GROUP_CONCAT({id_column}) FROM {table} '
+            f'GROUP BY phone_number HAVING COUNT(*) > 1')
+        groups = []
+        for phone_number, ids in cursor.fetchall():
+            ids = sorted(int(value) for value in ids.split(','))
+            groups.append((phone_number, ids[0], ids[1:]))
+        return groups
+
+
+def deduplicate(db, table, batch_size=100, progress=None):
+    """
+    Удаляет дубликаты в table, оставляя запись с минимальным ID
+    Заявки дубликатов клиента переносятся на оставляемую запись. Каждая порция
+    из batch_size телефонов - одна транзакция; после нее вызывается
+    progress(обработано, всего). Возвращает число удаленных записей
+    """
+    if table not in TABLES:
+        raise ValueError(f"Неизвестная таблица: {table}")
+    id_column, reference = TABLES[table]
+    groups = find_duplicate_groups(db, table)
+    removed = 0
+    for start in range(0, len(groups), batch_size):
+        batch = groups[start:start + batch_size]
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            for _, keep_id, duplicate_ids in batch:
+                placeholders = ', '.join('?' * len(duplicate_ids))
+                if reference:
+                    ref_table, ref_column = reference
+                    cursor.execute(
+                        f'UPDATE {ref_table} SET {ref_column} = ? WHERE {ref_column} IN ({placeholders})',
+                        [keep_id, *duplicate_ids])
+                cursor.execute(f'DELETE FROM {table} WHERE {id_column} IN ({placeholders})', duplicate_ids)
+                removed += cursor.rowcount
+        if progress:
+            progress(min(start + batch_size, len(groups)), len(groups))
+    return removed
+
+
+def print_progress(table):
+    def progress(done, total):
+        print(f"\r{table}: обработано телефонов {done} из {total}", end="" if done < total else "\n", flush=True)
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Очистка дубликатов клиентов и администраторов по телефону")
+    parser.add_argument("--db", default="laundry.db", help="путь к файлу базы данных")
+    parser.add_argument("--batch-size", type=int, default=100, help="телефонов в одной транзакции")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    for table in TABLES:
+        removed = deduplicate(db, table, args.batch_size, print_progress(table))
+        print(f"{table}: удалено дубликатов {removed}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
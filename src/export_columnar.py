@@ -0,0 +1,260 @@
+"""
+Колоночный двоичный экспорт заявок
+
+Если установлен pyarrow, пишется Parquet (data.parquet). Иначе используется
+собственный формат по колонкам (data.lcol) на стандартной библиотеке:
+
+    LCOL1 | группа строк ... | футер (JSON) | длина футера (uint32 LE) | LCOL1
+
+Строки пишутся группами по ROW_GROUP_SIZE, внутри группы каждая колонка
+кодируется отдельно и сжимается zlib. Повторяющиеся колонки (статусы,
+степень загрязнения, время) хранятся со словарным кодированием: список
+различных значений и номера значений в нем. Числа хранятся массивом int64,
+строки - длинами и склеенным текстом в UTF-8. Пропуски (NULL) отмечаются
+маской. Для чтения одной колонки достаточно прочитать ее блоки по
+смещениям из футера.
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+MAGIC = b"LCOL1"
+ROW_GROUP_SIZE = 65536
+COMPRESSION_LEVEL = 6
+
+# Колонка -> тип: int - целое, str - строка, dict - строка со словарным кодированием
+COLUMNS = [
+    ("application_id", "int"),
+    ("number_of_items", "int"),
+    ("client_id", "int"),
+    ("client_last_name", "str"),
+    ("client_name", "str"),
+    ("client_patronymic", "str"),
+    ("client_phone", "int"),
+    ("client_email", "str"),
+    ("pollution_status_id", "dict"),
+    ("pollution_status_name", "dict"),
+    ("pollution_status_comment", "dict"),
+    ("application_status_id", "dict"),
+    ("application_status_name", "dict"),
+    ("application_status_comment", "dict"),
+    ("time_of_receipt", "dict"),
+]
+COLUMN_TYPES = dict(COLUMNS)
+DICTIONARY_COLUMNS = [name for name, kind in COLUMNS if kind == "dict"]
+
+
+def flatten_row(item):
+    """Заявка со связанными данными -> кортеж значений в порядке COLUMNS"""
+    client = item["client"]
+    pollution = item["pollution_status"]
+    status = item["application_status"]
+    return (
+        item["application_id"], item["number_of_items"],
+        client["client_id"], client["last_name"], client["name"], client["patronymic"],
+        client["phone_number"], client["email"],
+        pollution["pollution_status_id"], pollution["name"], pollution["comment"],
+        status["application_status_id"], status["name"], status["comment"],
+        item.get("time_of_receipt"),
+    )
+
+
+def columnar_file_name():
+    """Имя файла колоночной выгрузки в зависимости от доступности pyarrow"""
+    return "data.parquet" if pyarrow is not None else "data.lcol"
+
+
+def _row_groups(rows, size):
+    """Разбивает поток заявок на группы по size строк: (число строк, список колонок)"""
+    group = []
+    for item in rows:
+        group.append(flatten_row(item))
+        if len(group) == size:
+            yield len(group), [list(column) for column in zip(*group)]
+            group = []
+    if group:
+        yield len(group), [list(column) for column in zip(*group)]
+
+
+def _int_array(values, typecode):
+    """Массив чисел в порядке байт little-endian"""
+    data = array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _read_int_array(payload, typecode, offset, count):
+    data = array(typecode)
+    data.frombytes(payload[offset:offset + count * data.itemsize])
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+def encode_column(values, kind):
+    """Кодирует значения одной колонки группы в байты (до сжатия)"""
+    if kind == "dict":
+        # None попадает в словарь как обычное значение, маска не нужна
+        positions = {value: index for index, value in enumerate(dict.fromkeys(values))}
+        dictionary_bytes = json.dumps(list(positions), ensure_ascii=False).encode("utf-8")
+        typecode = "B" if len(positions) <= 0xFF else "H" if len(positions) <= 0xFFFF else "I"
+        return (struct.pack("<I", 0) + struct.pack("<I", len(dictionary_bytes)) + dictionary_bytes
+                + typecode.encode() + _int_array(map(positions.__getitem__, values), typecode))
+    nulls = b""
+    if None in values:
+        nulls = bytes(value is None for value in values)
+        values = [(0 if kind == "int" else "") if value is None else value for value in values]
+    header = struct.pack("<I", len(nulls)) + nulls
+    if kind == "int":
+        return header + _int_array(values, "q")
+    # Длины в символах и весь текст колонки одной строкой: кодирование и
+    # декодирование UTF-8 выполняются один раз на колонку, а не на значение
+    values = list(map(str, values))
+    return header + _int_array(map(len, values), "I") + "".join(values).encode("utf-8")
+
+
+def decode_column(payload, kind, count):
+    """Обратное к encode_column: список значений колонки группы"""
+    nulls_length, = struct.unpack_from("<I", payload, 0)
+    nulls = payload[4:4 + nulls_length]
+    offset = 4 + nulls_length
+    if kind == "int":
+        values = _read_int_array(payload, "q", offset, count).tolist()
+    elif kind == "dict":
+        dictionary_length, = struct.unpack_from("<I", payload, offset)
+        offset += 4
+        dictionary = json.loads(payload[offset:offset + dictionary_length].decode("utf-8"))
+        offset += dictionary_length
+        typecode = chr(payload[offset])
+        indices = _read_int_array(payload, typecode, offset + 1, count)
+        values = list(map(dictionary.__getitem__, indices))
+    else:
+        lengths = _read_int_array(payload, "I", offset, count)
+        text = payload[offset + 4 * count:].decode("utf-8")
+        ends = list(accumulate(lengths))
+        values = [text[end - length:end] for end, length in zip(ends, lengths)]
+    if nulls:
+        values = [None if is_null else value for value, is_null in zip(values, nulls)]
+    return values
+
+
+def _write_lcol(rows, path, row_group_size):
+    row_groups = []
+    count = 0
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for rows_in_group, group in _row_groups(rows, row_group_size):
+            chunks = []
+            for (name, kind), values in zip(COLUMNS, group):
+                data = zlib.compress(encode_column(values, kind), COMPRESSION_LEVEL)
+                chunks.append({"offset": f.tell(), "length": len(data)})
+                f.write(data)
+            row_groups.append({"rows": rows_in_group, "columns": chunks})
+            count += rows_in_group
+        footer = json.dumps({
+            "columns": [{"name": name, "type": kind} for name, kind in COLUMNS],
+            "compression": "zlib",
+            "rows": count,
+            "row_groups": row_groups,
+        }).encode("utf-8")
+        f.write(footer)
+        f.write(struct.pack("<I", len(footer)))
+        f.write(MAGIC)
+    return count
+
+
+def _write_parquet(rows, path, row_group_size):
+    schema = pyarrow.schema([
+        (name, pyarrow.int64() if kind == "int" else pyarrow.string()) for name, kind in COLUMNS])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd", use_dictionary=DICTIONARY_COLUMNS) as writer:
+        for rows_in_group, group in _row_groups(rows, row_group_size):
+            table = pyarrow.Table.from_arrays(group, schema=schema)
+            writer.write_table(table, row_group_size=row_group_size)
+            count += rows_in_group
+    return count
+
+
+def write_columnar(rows, path, row_group_size=ROW_GROUP_SIZE):
+    """Потоковая запись заявок в колоночный файл (Parquet или LCOL), возвращает число строк"""
+    if pyarrow is not None and path.endswith(".parquet"):
+        return _write_parquet(rows, path, row_group_size)
+    return _write_lcol(rows, path, row_group_size)
+
+
+def _read_lcol_footer(f):
+    f.seek(0)
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Файл не является колоночной выгрузкой LCOL")
+    f.seek(-(len(MAGIC) + 4), 2)
+    footer_length, = struct.unpack("<I", f.read(4))
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Колоночная выгрузка LCOL повреждена")
+    f.seek(-(len(MAGIC) + 4 + footer_length), 2)
+    return json.loads(f.read(footer_length).decode("utf-8"))
+
+
+def read_columnar(path, columns=None):
+    """
+    Читает колоночный файл в словарь {колонка: список значений}
+    columns - список нужных колонок (по умолчанию все); остальные не читаются
+    """
+    if path.endswith(".parquet"):
+        if pyarrow is None:
+            raise ValueError("Для чтения Parquet нужен pyarrow")
+        return pyarrow.parquet.read_table(path, columns=columns).to_pydict()
+    with open(path, "rb") as f:
+        footer = _read_lcol_footer(f)
+        names = [column["name"] for column in footer["columns"]]
+        wanted = columns or names
+        unknown = [name for name in wanted if name not in names]
+        if unknown:
+            raise ValueError(f"Нет колонок: {', '.join(unknown)}")
+        result = {name: [] for name in wanted}
+        for group in footer["row_groups"]:
+            for name in wanted:
+                chunk = group["columns"][names.index(name)]
+                f.seek(chunk["offset"])
+                payload = zlib.decompress(f.read(chunk["length"]))
+                result[name].extend(decode_column(payload, COLUMN_TYPES[name], group["rows"]))
+    return result
+
+
+def iter_columnar_rows(path):
+    """Заявки из колоночного файла в том же виде, что и для JSON-экспорта"""
+    data = read_columnar(path)
+    for values in zip(*(data[name] for name, _ in COLUMNS)):
+        row = dict(zip(COLUMN_TYPES, values))
+        yield {
+            "application_id": row["application_id"],
+            "number_of_items": row["number_of_items"],
+            "client": {
+                "client_id": row["client_id"],
+                "last_name": row["client_last_name"],
+                "name": row["client_name"],
+                "patronymic": row["client_patronymic"],
+                "phone_number": row["client_phone"],
+                "email": row["client_email"],
+            },
+            "pollution_status": {
+                "pollution_status_id": row["pollution_status_id"],
+                "name": row["pollution_status_name"],
+                "comment": row["pollution_status_comment"],
+            },
+            "application_status": {
+                "application_status_id": row["application_status_id"],
+                "name": row["application_status_name"],
+                "comment": row["application_status_comment"],
+            },
+            "time_of_receipt": row["time_of_receipt"],
+        }
@@ -1,21 +1,324 @@
+import argparse
+import importlib.util
 import json
-import csv
-import xml.etree.ElementTree as ET
-import yaml
+import pickle
+import time
 import os
 from src.database.db import Database
+from src.database.metrics import QueryMetrics
 from src.repository.repository import ClientRepository, ApplicationRepository, PollutionStatusRepository, \
-    ApplicationStatusRepository
+    ApplicationStatusRepository, ChangeLogRepository, chunked
+
+# Зависимости форматов (csv, xml, yaml, pyarrow) импортируются внутри функций
+# записи: запуск с одним форматом не платит за импорт остальных
+
+
+def yaml_module():
+    """PyYAML и самый быстрый доступный Dumper: на libyaml (если собран) в разы быстрее питоновского"""
+    import yaml
+    return yaml, getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+CSV_HEADER = [
+    "application_id", "number_of_items",
+    "client_id", "client_name", "client_phone",
+    "pollution_status", "application_status", "time_of_receipt"
+]
+
+
+def write_json(rows, path, ndjson=False):
+    """
+    Потоковая запись в JSON: массив выводится по одному элементу
+    При ndjson=True каждая заявка пишется отдельной строкой (NDJSON)
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        if ndjson:
+            for item in rows:
+                f.write(json.dumps(item, ensure_ascii=False, default=str))
+                f.write("\n")
+                count += 1
+            return count
+
+        for item in rows:
+            f.write(",\n  " if count else "[\n  ")
+            f.write(json.dumps(item, ensure_ascii=False, indent=2, default=str).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "[]")
+    return count
+
+
+def write_csv(rows, path):
+    """Потоковая запись в CSV построчно"""
+    import csv
+
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        # Заголовки
+        writer.writerow(CSV_HEADER)
+
+        # Данные
+        for item in rows:
+            writer.writerow([
+                item["application_id"],
+                item["number_of_items"],
+                item["client"]["client_id"],
+                f"{item['client']['last_name']} {item['client']['name']}",
+                item["client"]["phone_number"],
+                item["pollution_status"]["name"],
+                item["application_status"]["name"],
+                item.get("time_of_receipt")
+            ])
+            count += 1
+    return count
+
+
+def _xml_element(xml, tag, text):
+    """Пишет элемент с текстом, пустой элемент для None"""
+    xml.startElement(tag, {})
+    if text is not None:
+        xml.characters(str(text))
+    xml.endElement(tag)
+
+
+def write_xml(rows, path):
+    """Потоковая запись в XML через XMLGenerator, без построения дерева в памяти"""
+    from xml.sax.saxutils import XMLGenerator
+
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        xml = XMLGenerator(f, encoding="utf-8", short_empty_elements=True)
+        xml.startDocument()
+        xml.startElement("applications", {})
+
+        for item in rows:
+            xml.startElement("application", {})
+            _xml_element(xml, "id", item["application_id"])
+            _xml_element(xml, "number_of_items", item["number_of_items"])
+
+            # Клиент
+            client = item["client"]
+            xml.startElement("client", {})
+            _xml_element(xml, "id", client["client_id"])
+            _xml_element(xml, "last_name", client["last_name"])
+            _xml_element(xml, "name", client["name"])
+            _xml_element(xml, "patronymic", client["patronymic"])
+            _xml_element(xml, "phone", client["phone_number"])
+            _xml_element(xml, "email", client["email"])
+            xml.endElement("client")
+
+            # Статус загрязнения
+            pollution = item["pollution_status"]
+            xml.startElement("pollution_status", {})
+            _xml_element(xml, "id", pollution["pollution_status_id"])
+            _xml_element(xml, "name", pollution["name"])
+            _xml_element(xml, "comment", pollution["comment"])
+            xml.endElement("pollution_status")
+
+            # Статус заявки
+            status = item["application_status"]
+            xml.startElement("application_status", {})
+            _xml_element(xml, "id", status["application_status_id"])
+            _xml_element(xml, "name", status["name"])
+            _xml_element(xml, "comment", status["comment"])
+            xml.endElement("application_status")
+
+            _xml_element(xml, "time_of_receipt", item.get("time_of_receipt"))
+
+            xml.endElement("application")
+            count += 1
+
+        xml.endElement("applications")
+        xml.endDocument()
+    return count
+
+
+def write_yaml(rows, path, chunk_size=1000):
+    """
+    Потоковая запись в YAML: один список, как у yaml.dump(list)
+    Заявки выводятся порциями по chunk_size: блочный список из нескольких
+    порций - тот же список, поэтому файл одинаков во всех режимах экспорта
+    и читается yaml.safe_load
+    """
+    yaml, dumper = yaml_module()
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in chunked(rows, chunk_size):
+            yaml.dump(chunk, f, Dumper=dumper, allow_unicode=True, default_flow_style=False)
+            count += len(chunk)
+        if not count:
+            f.write("[]\n")
+    return count
+
+
+def write_columnar(rows, path):
+    """Колоночный экспорт (src/export_columnar.py)"""
+    from src.export_columnar import write_columnar as write
+
+    return write(rows, path)
+
+
+# Без импорта pyarrow: достаточно знать, установлен ли он
+COLUMNAR_FILE = "data.parquet" if importlib.util.find_spec("pyarrow") else "data.lcol"
+
+# Формат -> (имя файла, функция записи)
+FORMATS = {
+    "json": ("data.json", write_json),
+    "csv": ("data.csv", write_csv),
+    "xml": ("data.xml", write_xml),
+    "yaml": ("data.yaml", write_yaml),
+    "columnar": (COLUMNAR_FILE, write_columnar),
+}
+
+# Форматы, сериализация которых упирается в CPU: выполняются в отдельных процессах
+PROCESS_FORMATS = {"xml", "yaml"}
+
+
+def spool_rows(rows, path, chunk_size=1000):
+    """Однократно сохраняет строки во временный файл порциями pickle"""
+    count = 0
+    chunk = []
+    with open(path, "wb") as f:
+        for item in rows:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+            count += len(chunk)
+    return count
+
+
+def iter_spool(path):
+    """Читает строки из временного файла, созданного spool_rows"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            yield from chunk
+
+
+def export_format_from_spool(fmt, spool_path, output_dir, ndjson=False):
+    """Пишет один формат из временного файла, возвращает (формат, строк, секунд)"""
+    file_name, writer = FORMATS[fmt]
+    start = time.perf_counter()
+    if fmt == "json" and ndjson:
+        count = writer(iter_spool(spool_path), os.path.join(output_dir, "data.ndjson"), ndjson=True)
+    else:
+        count = writer(iter_spool(spool_path), os.path.join(output_dir, file_name))
+    return fmt, count, time.perf_counter() - start
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """
+    Потоковое чтение JSON-массива (в том числе с отступами, как у write_json)
+    Файл читается порциями по chunk_size символов, элементы разбираются по
+    одному через JSONDecoder.raw_decode: в памяти порция и текущий элемент,
+    а не весь массив
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def skip(chars):
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = chunk, 0
+
+    skip(" \t\r\n")
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("Снимок JSON должен быть массивом")
+    pos += 1
+    first = True
+    while True:
+        skip(" \t\r\n")
+        if pos >= len(buffer):
+            raise ValueError("Снимок JSON поврежден: массив оборван")
+        if buffer[pos] == "]":
+            return
+        if not first:
+            if buffer[pos] != ",":
+                raise ValueError("Снимок JSON поврежден: ожидалась запятая между элементами")
+            pos += 1
+            skip(" \t\r\n")
+        first = False
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                item = end = None
+            # Элемент, упершийся в конец порции, мог быть обрезан (число, строка)
+            if end is not None and (end < len(buffer) or eof):
+                break
+            if eof:
+                raise ValueError("Снимок JSON поврежден: массив оборван")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+        pos = end
+        yield item
+
+
+def iter_json_snapshot(path):
+    """Заявки из ранее выгруженного снимка data.json или data.ndjson, по одной"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def merge_delta(snapshot, upserted, deleted_ids):
+    """
+    Слияние снимка с изменениями: оба упорядочены по application_id,
+    поэтому снимок читается и пишется за один проход
+    """
+    upserted = iter(upserted)
+    pending = next(upserted, None)
+    for item in snapshot:
+        while pending is not None and pending["application_id"] < item["application_id"]:
+            yield pending
+            pending = next(upserted, None)
+        if pending is not None and pending["application_id"] == item["application_id"]:
+            yield pending
+            pending = next(upserted, None)
+        elif item["application_id"] not in deleted_ids:
+            yield item
+    while pending is not None:
+        yield pending
+        pending = next(upserted, None)
+
+
+def delta_records(upserted, deleted_ids):
+    """Строки файла изменений: добавленные/измененные заявки и ID удаленных"""
+    for item in upserted:
+        yield {"op": "upsert", "application": item}
+    for application_id in sorted(deleted_ids):
+        yield {"op": "delete", "application_id": application_id}
 
 
 class DataExporter:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None, output_dir="out"):
+        self.db = db or Database()
         self.client_repo = ClientRepository(self.db)
         self.application_repo = ApplicationRepository(self.db)
         self.pollution_repo = PollutionStatusRepository(self.db)
         self.status_repo = ApplicationStatusRepository(self.db)
-        self.output_dir = "out"
+        self.changelog_repo = ChangeLogRepository(self.db)
+        self.output_dir = output_dir
         self._ensure_output_directory()
 
     def _ensure_output_directory(self):
@@ -24,107 +327,148 @@ class DataExporter:
             os.makedirs(self.output_dir)
 
     def get_application_data_with_relations(self):
-        """Получает данные заявок с связанными данными"""
-        applications = self.application_repo.find_all()
-        result = []
-
-        for app in applications:
-            client = self.client_repo.find_by_id(app.Client_ID)
-            pollution = self.pollution_repo.find_by_id(app.PollutionStatus_ID)
-            status = self.status_repo.find_by_id(app.ApplicationStatus_ID)
-
-            application_data = {
-                "application_id": app.Application_ID,
-                "number_of_items": app.Number_of_items,
-                "client": {
-                    "client_id": client.Client_ID if client else None,
-                    "last_name": client.last_name if client else None,
-                    "name": client.name if client else None,
-                    "patronymic": client.patronymic if client else None,
-                    "phone_number": client.phone_number if client else None,
-                    "email": client.email if client else None
-                },
-                "pollution_status": {
-                    "pollution_status_id": pollution.PollutionStatus_ID if pollution else None,
-                    "name": pollution.name if pollution else None,
-                    "comment": pollution.comment if pollution else None
-                },
-                "application_status": {
-                    "application_status_id": status.ApplicationStatus_ID if status else None,
-                    "name": status.name if status else None,
-                    "comment": status.comment if status else None
-                }
-            }
-            result.append(application_data)
-
-        return result
+        """Получает данные заявок с связанными данными (один JOIN-запрос)"""
+        return self.application_repo.find_all_with_relations()
+
+    def iter_application_data_with_relations(self):
+        """Генератор заявок с связанными данными для потокового экспорта"""
+        return self.application_repo.iter_all_with_relations()
 
     def export_to_json(self, data):
         """Экспорт в JSON"""
-        with open(f"{self.output_dir}/data.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        write_json(data, f"{self.output_dir}/data.json")
 
     def export_to_csv(self, data):
         """Экспорт в CSV"""
-        with open(f"{self.output_dir}/data.csv", "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            # Заголовки
-            writer.writerow([
-                "application_id", "number_of_items",
-                "client_id", "client_name", "client_phone",
-                "pollution_status", "application_status"
-            ])
-
-            # Данные
-            for item in data:
-                writer.writerow([
-                    item["application_id"],
-                    item["number_of_items"],
-                    item["client"]["client_id"],
-                    f"{item['client']['last_name']} {item['client']['name']}",
-                    item["client"]["phone_number"],
-                    item["pollution_status"]["name"],
-                    item["application_status"]["name"]
-                ])
+        write_csv(data, f"{self.output_dir}/data.csv")
 
     def export_to_xml(self, data):
         """Экспорт в XML"""
-        root = ET.Element("applications")
+        write_xml(data, f"{self.output_dir}/data.xml")
 
-        for item in data:
-            app_elem = ET.SubElement(root, "application")
+    def export_to_yaml(self, data):
+        """Экспорт в YAML"""
+        write_yaml(data, f"{self.output_dir}/data.yaml")
 
-            ET.SubElement(app_elem, "id").text = str(item["application_id"])
-            ET.SubElement(app_elem, "number_of_items").text = str(item["number_of_items"])
+    def run_streaming(self, formats=None, ndjson=False):
+        """
+        Потоковый экспорт: строки читаются из курсора и сразу пишутся в файл,
+        пиковая память не зависит от размера таблицы Application. Каждый
+        формат перечитывает курсор: без временного файла и без процессов -
+        для машин с малым объемом памяти или диска
+        """
+        formats = list(formats or FORMATS)
+        unknown = [fmt for fmt in formats if fmt not in FORMATS]
+        if unknown:
+            raise ValueError(f"Неизвестные форматы экспорта: {', '.join(unknown)}")
 
-            # Клиент
-            client_elem = ET.SubElement(app_elem, "client")
-            ET.SubElement(client_elem, "id").text = str(item["client"]["client_id"])
-            ET.SubElement(client_elem, "last_name").text = item["client"]["last_name"]
-            ET.SubElement(client_elem, "name").text = item["client"]["name"]
-            ET.SubElement(client_elem, "patronymic").text = item["client"]["patronymic"]
-            ET.SubElement(client_elem, "phone").text = str(item["client"]["phone_number"])
-            ET.SubElement(client_elem, "email").text = item["client"]["email"]
+        print("Потоковый экспорт из базы...")
+        count = 0
+        for fmt in formats:
+            file_name, writer = FORMATS[fmt]
+            print(f"Экспорт в {fmt.upper()}: ")
+            if fmt == "json" and ndjson:
+                count = writer(self.iter_application_data_with_relations(),
+                               os.path.join(self.output_dir, "data.ndjson"), ndjson=True)
+            else:
+                count = writer(self.iter_application_data_with_relations(), os.path.join(self.output_dir, file_name))
+            if not count:
+                print("Нет данных для экспорта!")
+                return
 
-            # Статус загрязнения
-            pollution_elem = ET.SubElement(app_elem, "pollution_status")
-            ET.SubElement(pollution_elem, "id").text = item["pollution_status"]["pollution_status_id"]
-            ET.SubElement(pollution_elem, "name").text = item["pollution_status"]["name"]
-            ET.SubElement(pollution_elem, "comment").text = item["pollution_status"]["comment"]
+        print(f"Экспортировано {count} заявок. Файлы сохранены в папке '{self.output_dir}/'")
 
-            # Статус заявки
-            status_elem = ET.SubElement(app_elem, "application_status")
-            ET.SubElement(status_elem, "id").text = item["application_status"]["application_status_id"]
-            ET.SubElement(status_elem, "name").text = item["application_status"]["name"]
-            ET.SubElement(status_elem, "comment").text = item["application_status"]["comment"]
+    def run_parallel(self, formats=None, ndjson=False):
+        """
+        Параллельный экспорт с однократным чтением данных
+        Строки один раз читаются из базы во временный файл, затем форматы
+        пишутся независимо: JSON и CSV в потоках, XML и YAML в пуле процессов.
+        Возвращает словарь {формат: секунд}
+        """
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
-        tree = ET.ElementTree(root)
-        tree.write(f"{self.output_dir}/data.xml", encoding="utf-8", xml_declaration=True)
+        formats = list(formats or FORMATS)
+        unknown = [fmt for fmt in formats if fmt not in FORMATS]
+        if unknown:
+            raise ValueError(f"Неизвестные форматы экспорта: {', '.join(unknown)}")
 
-    def export_to_yaml(self, data):
-        """Экспорт в YAML"""
-        with open(f"{self.output_dir}/data.yaml", "w", encoding="utf-8") as f:
-            yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+        timings = {}
+        spool = tempfile.NamedTemporaryFile(dir=self.output_dir, suffix=".spool", delete=False)
+        spool.close()
+        try:
+            print("Сбор данных из базы...")
+            start = time.perf_counter()
+            count = spool_rows(self.iter_application_data_with_relations(), spool.name)
+            timings["fetch"] = time.perf_counter() - start
+            if not count:
+                print("Нет данных для экспорта!")
+                return timings
+            print(f"Найдено {count} заявок ({timings['fetch']:.2f} с)")
+
+            thread_formats = [fmt for fmt in formats if fmt not in PROCESS_FORMATS]
+            process_formats = [fmt for fmt in formats if fmt in PROCESS_FORMATS]
+            with ThreadPoolExecutor(max_workers=max(len(thread_formats), 1)) as threads, \
+                    ProcessPoolExecutor(max_workers=max(len(process_formats), 1)) as processes:
+                futures = [threads.submit(export_format_from_spool, fmt, spool.name, self.output_dir, ndjson)
+                           for fmt in thread_formats]
+                futures += [processes.submit(export_format_from_spool, fmt, spool.name, self.output_dir, ndjson)
+                            for fmt in process_formats]
+                for future in as_completed(futures):
+                    fmt, _, elapsed = future.result()
+                    timings[fmt] = elapsed
+                    print(f"Экспорт в {fmt.upper()}: {elapsed:.2f} с")
+        finally:
+            os.remove(spool.name)
+
+        print(f"Экспорт завершен! Файлы сохранены в папке '{self.output_dir}/'")
+        return timings
+
+    def run_delta(self, name="default", ndjson=False, merge=True):
+        """
+        Инкрементальный экспорт по журналу изменений
+        Из базы читаются только заявки, измененные после отметки name; они
+        пишутся в файл delta_<от>_<до>.ndjson и (при merge=True) вливаются в
+        снимок data.json (data.ndjson). Без отметки или снимка выгружается
+        полный снимок. Возвращает (добавлено/изменено, удалено)
+        """
+        snapshot_path = os.path.join(self.output_dir, "data.ndjson" if ndjson else "data.json")
+        watermark = self.changelog_repo.get_watermark(name)
+        # Изменения, сделанные во время выгрузки, могут попасть и в нее, и в
+        # следующую дельту - повторное применение upsert/delete безвредно
+        last_change = self.changelog_repo.last_change_id()
+
+        if watermark is None or (merge and not os.path.exists(snapshot_path)):
+            print("Отметки экспорта нет, полная выгрузка снимка...")
+            count = write_json(self.iter_application_data_with_relations(), snapshot_path, ndjson=ndjson)
+            self.changelog_repo.save_watermark(name, last_change)
+            self.changelog_repo.prune()
+            print(f"Экспортировано {count} заявок в '{snapshot_path}'")
+            return count, 0
+
+        changed = self.changelog_repo.changed_application_ids(watermark, last_change)
+        if not changed:
+            # Записи журнала, не затрагивающие заявки (например, изменение
+            # клиента без заявок): файлов нет, отметку можно сдвинуть сразу
+            self.changelog_repo.save_watermark(name, last_change)
+            self.changelog_repo.prune()
+            print("Изменений с прошлого экспорта нет")
+            return 0, 0
+        upserted = self.application_repo.find_with_relations_by_ids(changed)
+        deleted = changed - {item["application_id"] for item in upserted}
+
+        delta_path = os.path.join(self.output_dir, f"delta_{watermark}_{last_change}.ndjson")
+        write_json(delta_records(upserted, deleted), delta_path, ndjson=True)
+        if merge:
+            merged_path = snapshot_path + ".tmp"
+            write_json(merge_delta(iter_json_snapshot(snapshot_path), upserted, deleted), merged_path, ndjson=ndjson)
+            os.replace(merged_path, snapshot_path)
+
+        # Отметка сдвигается только после записи файлов: при сбое дельта повторится
+        self.changelog_repo.save_watermark(name, last_change)
+        self.changelog_repo.prune()
+        print(f"Изменено {len(upserted)}, удалено {len(deleted)} заявок. Файл изменений: '{delta_path}'")
+        return len(upserted), len(deleted)
 
     def run(self):
         """Запуск экспорта"""
@@ -149,9 +493,42 @@ class DataExporter:
         print("Экспорт в YAML: ")
         self.export_to_yaml(data)
 
-        print("Экспорт завершен! Файлы сохранены в папке 'out/'")
+        print(f"Экспорт завершен! Файлы сохранены в папке '{self.output_dir}/'")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Экспорт заявок в JSON, CSV, XML, YAML и колоночный формат")
+    parser.add_argument("--formats", nargs="+", choices=sorted(FORMATS), default=list(FORMATS),
+                        help="форматы экспорта (по умолчанию все)")
+    parser.add_argument("--output-dir", default="out", help="папка для файлов экспорта")
+    parser.add_argument("--ndjson", action="store_true", help="писать JSON построчно (data.ndjson)")
+    parser.add_argument("--sequential", action="store_true",
+                        help="последовательный экспорт всех форматов со списком в памяти")
+    parser.add_argument("--streaming", action="store_true",
+                        help="писать форматы по очереди прямо из курсора, без временного файла и процессов")
+    parser.add_argument("--delta", action="store_true",
+                        help="выгрузить только изменения с прошлого запуска и влить их в снимок JSON")
+    parser.add_argument("--no-merge", action="store_true", help="с --delta: только файл изменений, без снимка")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="сохранить статистику запросов к БД (.prom/.txt - Prometheus, иначе JSON)")
+    parser.add_argument("--slow-query-ms", type=float, default=100.0, help="с --metrics: порог медленного запроса, мс")
+    args = parser.parse_args(argv)
+
+    metrics = QueryMetrics(args.slow_query_ms) if args.metrics else None
+    exporter = DataExporter(db=Database(metrics=metrics), output_dir=args.output_dir)
+    if args.delta:
+        exporter.run_delta(ndjson=args.ndjson, merge=not args.no_merge)
+    elif args.sequential:
+        exporter.run()
+    elif args.streaming:
+        exporter.run_streaming(formats=args.formats, ndjson=args.ndjson)
+    else:
+        exporter.run_parallel(formats=args.formats, ndjson=args.ndjson)
+    if metrics is not None:
+        exporter.db.close()
+        metrics.dump(args.metrics)
+        print(f"Статистика запросов: {args.metrics}")
 
 
 if __name__ == "__main__":
-    exporter = DataExporter()
-    exporter.run()
\ No newline at end of file
+    main()
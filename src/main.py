@@ -1,21 +1,47 @@
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
 from src.database.db import Database
 from src.repository.repository import ClientRepository, AdminRepository, ApplicationStatusRepository, \
-    PollutionStatusRepository, ApplicationRepository
-from src.models.models import Client, Admin, Application
+    PollutionStatusRepository, ApplicationRepository, SlotRepository, SLOT_TIME_FORMAT, parse_slot_time, \
+    StatusConflictError, INITIAL_STATUSES
+from src.repository.cache import LRUCache
+from src.repository.reports import ReportRepository
+from src.models.models import Client, Admin, Application, Slot
+from src.payments import PaymentProcessor, format_amount
 
 
 class LaundrySystem:
-    def __init__(self):
-        self.db = Database()
-        self.client_repo = ClientRepository(self.db)
+    def __init__(self, db=None, cache_size=None, cache_ttl=None, page_size=20, payment_gateway=None):
+        """
+        db - база данных (по умолчанию laundry.db в текущей папке),
+        cache_size - размер LRU-кэша клиентов и заявок (None - без кэша),
+        cache_ttl - время жизни записи кэша в секундах,
+        page_size - сколько записей выводить на одной странице списков,
+        payment_gateway - платежный шлюз (по умолчанию локальный FakePaymentGateway)
+        """
+        self.db = db or Database()
+        client_cache = LRUCache(cache_size, cache_ttl) if cache_size else None
+        application_cache = LRUCache(cache_size, cache_ttl) if cache_size else None
+        self.client_repo = ClientRepository(self.db, cache=client_cache)
         self.admin_repo = AdminRepository(self.db)
-        self.application_repo = ApplicationRepository(self.db)
+        self.application_repo = ApplicationRepository(self.db, cache=application_cache)
         self.pollution_status_repo = PollutionStatusRepository(self.db)
         self.application_status_repo = ApplicationStatusRepository(self.db)
+        self.slot_repo = SlotRepository(self.db)
+        self.report_repo = ReportRepository(self.db)
+        self.payments = PaymentProcessor(self.db, self.application_repo, payment_gateway)
+        self.pollution_status_repo.warm_up()
+        self.application_status_repo.warm_up()
         self.current_user = None
         self.user_type = None
+        self.page_size = page_size
 
-        self.cleanup_duplicates()
+    def close(self):
+        """Дописывает очередь платежей, останавливает поток записи и закрывает базу"""
+        self.payments.close()
+        self.db.close()
 
     def get_all_clients(self):
         return self.client_repo.find_all()
@@ -33,17 +59,39 @@ class LaundrySystem:
         client = Client(None, last_name, name, patronymic, phone_number, email)
         return self.client_repo.save(client)
 
+    def create_clients(self, rows):
+        """
+        Пакетная регистрация клиентов: rows - кортежи (фамилия, имя, отчество, телефон, email)
+        Все или ничего: уже зарегистрированный телефон - DuplicatePhoneError,
+        и ни один клиент пачки не записывается
+        """
+        clients = []
+        for last_name, name, patronymic, phone_number, email in rows:
+            if not last_name or not last_name.strip():
+                raise ValueError("Фамилия не может быть пустой")
+            if not name or not name.strip():
+                raise ValueError("Имя не может быть пустым")
+            if not patronymic or not patronymic.strip():
+                raise ValueError("Отчество не может быть пустым")
+            clients.append(Client(None, last_name, name, patronymic, phone_number, email))
+        with self.db.transaction():
+            self.client_repo.insert_many(clients)
+        return clients
+
     def delete_client(self, client_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        # Сначала удаляем связанные заявки
-        cursor.execute('DELETE FROM Application WHERE Client_ID = ?', (client_id,))
-        # Затем удаляем клиента
-        cursor.execute('DELETE FROM Client WHERE Client_ID = ?', (client_id,))
-        affected_rows = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return affected_rows > 0
+        # Заявки и клиент удаляются одной транзакцией: при ошибке не останется
+        # клиента без части заявок
+        with self.db.transaction():
+            self.application_repo.delete_by_client(client_id)
+            return self.client_repo.delete(client_id)
+
+    def search_clients(self, query, limit=10, fuzzy=True):
+        """Поиск клиентов по ФИО, email или телефону (начала слов, с учетом опечаток)"""
+        if not query or not query.strip():
+            raise ValueError("Поисковый запрос не может быть пустым")
+        if limit <= 0:
+            raise ValueError("Количество результатов должно быть положительным числом")
+        return self.client_repo.search(query, limit, fuzzy)
 
     def get_all_admins(self):
         return self.admin_repo.find_all()
@@ -59,12 +107,10 @@ class LaundrySystem:
         return self.admin_repo.save(admin)
 
     def delete_admin(self, admin_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM Admin WHERE Admin_ID = ?', (admin_id,))
-        affected_rows = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM Admin WHERE Admin_ID = ?', (admin_id,))
+            affected_rows = cursor.rowcount
         return affected_rows > 0
 
     def get_all_applications(self):
@@ -75,59 +121,180 @@ class LaundrySystem:
             raise ValueError(f"Клиент с ID {client_id} не существует")
         return self.application_repo.find_by_client_id(client_id)
 
-    def create_application(self, client_id, pollution_status_id, application_status_id, number_of_items):
+    def get_all_applications_with_relations(self):
+        return self.application_repo.find_all_with_relations()
+
+    def get_client_applications_with_relations(self, client_id):
         if not self.get_client_by_id(client_id):
             raise ValueError(f"Клиент с ID {client_id} не существует")
-        if not self.pollution_status_repo.find_by_id(pollution_status_id):
-            raise ValueError(f"Статус загрязнения {pollution_status_id} не существует")
-        if not self.application_status_repo.find_by_id(application_status_id):
-            raise ValueError(f"Статус заявки {application_status_id} не существует")
+        return self.application_repo.find_by_client_id_with_relations(client_id)
+
+    def create_application(self, client_id, pollution_status_id, application_status_id, number_of_items,
+                           slot_id=None):
         if number_of_items <= 0:
             raise ValueError("Количество вещей должно быть положительным числом")
-        application = Application(None, client_id, number_of_items, pollution_status_id, application_status_id)
-        return self.application_repo.save(application)
-
-    def update_application_status(self, application_id, status_id):
-        if not self.application_repo.find_by_id(application_id):
-            raise ValueError(f"Заявка с ID {application_id} не существует")
+        self._check_initial_status(application_status_id)
+        application = Application(None, client_id, number_of_items, pollution_status_id, application_status_id,
+                                  slot_id)
+        # Существование клиента, статусов и слота проверяют внешние ключи при
+        # вставке; отдельные SELECT выполняются только чтобы объяснить ошибку
+        try:
+            return self.application_repo.save(application)
+        except sqlite3.IntegrityError as e:
+            if 'FOREIGN KEY' in str(e):
+                # Если ссылку успели восстановить или удалить иначе, остается исходная ошибка
+                self._raise_missing_reference(client_id, pollution_status_id, application_status_id, slot_id)
+            # Триггер занятости слота нарушил CHECK (booked <= capacity) таблицы Slot: слот уже заполнен
+            elif slot_id is not None and self._is_slot_full_error(e):
+                raise ValueError("Выбранное время уже занято, выберите другое") from None
+            raise
+
+    def _is_slot_full_error(self, error):
+        message = str(error)
+        return message.startswith('CHECK constraint failed') and 'booked' in message
+
+    def _check_initial_status(self, application_status_id):
+        """Новая заявка создается только в начальном статусе, дальше статус меняют переходы"""
+        if application_status_id not in INITIAL_STATUSES:
+            raise ValueError(f"Новая заявка не может быть создана в статусе {application_status_id}, "
+                             f"допустимо: {', '.join(INITIAL_STATUSES)}")
+
+    def _check_manual_status(self, status_id):
+        if status_id == 'PAID':
+            raise ValueError("Статус PAID ставится только оплатой заявки (pay_application)")
+
+    def _raise_missing_reference(self, client_id, pollution_status_id, application_status_id, slot_id=None):
+        """Определяет, на какую несуществующую запись ссылалась заявка, и сообщает об этом"""
+        if not self.get_client_by_id(client_id):
+            raise ValueError(f"Клиент с ID {client_id} не существует") from None
+        if not self.pollution_status_repo.find_by_id(pollution_status_id):
+            raise ValueError(f"Статус загрязнения {pollution_status_id} не существует") from None
+        if not self.application_status_repo.find_by_id(application_status_id):
+            raise ValueError(f"Статус заявки {application_status_id} не существует") from None
+        if slot_id is not None and not self.slot_repo.find_by_id(slot_id):
+            raise ValueError(f"Слот с ID {slot_id} не существует") from None
+
+    def generate_slots(self, start_date, days, day_start_hour=9, day_end_hour=21, slot_minutes=60, capacity=5):
+        """Создает слоты на days дней начиная с start_date (ГГГГ-ММ-ДД), возвращает число новых слотов"""
+        if slot_minutes <= 0 or capacity <= 0:
+            raise ValueError("Длительность и вместимость слота должны быть положительными")
+        first_day = datetime.strptime(start_date, '%Y-%m-%d')
+
+        def slots():
+            for day in range(days):
+                current = first_day + timedelta(days=day, hours=day_start_hour)
+                day_end = first_day + timedelta(days=day, hours=day_end_hour)
+                while current + timedelta(minutes=slot_minutes) <= day_end:
+                    end = current + timedelta(minutes=slot_minutes)
+                    yield Slot(None, current.strftime(SLOT_TIME_FORMAT), end.strftime(SLOT_TIME_FORMAT), capacity)
+                    current = end
+
+        return self.slot_repo.insert_many(slots())
+
+    def find_alternative_slots(self, desired_time, limit=5):
+        """Ближайшие к желаемому времени свободные слоты (время проверяет и нормализует репозиторий)"""
+        return self.slot_repo.find_nearest_free(desired_time, limit)
+
+    def create_applications(self, rows):
+        """Пакетное создание заявок: rows - кортежи (ID клиента, статус загрязнения, статус заявки, кол-во вещей)"""
+        rows = list(rows)
+        pollution_ids = {status.PollutionStatus_ID for status in self.get_all_pollution_statuses()}
+        application_status_ids = {status.ApplicationStatus_ID for status in self.get_all_application_statuses()}
+        existing_clients = self.client_repo.find_existing_ids(row[0] for row in rows)
+        applications = []
+        for client_id, pollution_status_id, application_status_id, number_of_items in rows:
+            if client_id not in existing_clients:
+                raise ValueError(f"Клиент с ID {client_id} не существует")
+            if pollution_status_id not in pollution_ids:
+                raise ValueError(f"Статус загрязнения {pollution_status_id} не существует")
+            if application_status_id not in application_status_ids:
+                raise ValueError(f"Статус заявки {application_status_id} не существует")
+            self._check_initial_status(application_status_id)
+            if number_of_items <= 0:
+                raise ValueError("Количество вещей должно быть положительным числом")
+            applications.append(Application(None, client_id, number_of_items, pollution_status_id,
+                                            application_status_id))
+        self.application_repo.insert_many(applications)
+        return applications
+
+    def update_applications_status(self, application_ids, status_id):
+        """Пакетная смена статуса заявок, возвращает количество обновленных заявок"""
+        self._check_manual_status(status_id)
         if not self.application_status_repo.find_by_id(status_id):
             raise ValueError(f"Статус заявки {status_id} не существует")
-        return self.application_repo.update_status(application_id, status_id)
+        return self.application_repo.update_status_many(application_ids, status_id)
+
+    def update_application_status(self, application_id, status_id, expected_version=None):
+        """
+        Смена статуса заявки по графу переходов StatusTransition
+        Проверка перехода и версии (если задана expected_version) выполняется
+        тем же UPDATE, что и запись; причина отказа выясняется только при ошибке.
+        Возвращает новую версию заявки. PAID так не ставится - только оплатой
+        """
+        self._check_manual_status(status_id)
+        version = self.application_repo.update_status(application_id, status_id, expected_version)
+        if version is not None:
+            return version
+
+        current = self.application_repo.find_status_version(application_id)
+        if current is None:
+            raise ValueError(f"Заявка с ID {application_id} не существует")
+        current_status, current_version = current
+        if expected_version is not None and current_version != expected_version:
+            raise StatusConflictError(
+                f"Заявка {application_id} изменена другим пользователем "
+                f"(версия {current_version}, ожидалась {expected_version})")
+        if self.application_status_repo.find_by_id(status_id) is None:
+            raise ValueError(f"Статус заявки {status_id} не существует")
+        if current_status == status_id:
+            raise ValueError(f"Заявка {application_id} уже в статусе {status_id}")
+        if status_id not in self.application_status_repo.find_transitions().get(current_status, []):
+            raise ValueError(f"Переход из статуса {current_status} в статус {status_id} не разрешен")
+        # Статус сменили между UPDATE и проверкой - повторный запрос увидит новое состояние
+        raise StatusConflictError(f"Заявка {application_id} изменена другим пользователем")
+
+    def get_application_status_history(self, application_id):
+        return self.application_repo.find_status_history(application_id)
+
+    def get_status_transitions(self):
+        return self.application_status_repo.find_transitions()
 
     def delete_application(self, application_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM Application WHERE Application_ID = ?', (application_id,))
-        affected_rows = cursor.rowcount
-        conn.commit()
-        conn.close()
-        return affected_rows > 0
+        return self.application_repo.delete(application_id)
 
-    def cleanup_duplicates(self):
-        """Очищает дублирующиеся записи клиентов и администраторов"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-
-        # Удаляем дубликаты клиентов (оставляем запись с минимальным ID)
-        cursor.execute('''
-            DELETE FROM Client 
-            WHERE Client_ID NOT IN (
-                SELECT MIN(Client_ID) 
-                FROM Client 
-                GROUP BY phone_number
-            )
-        ''')
-        # Удаляем дубликаты администраторов (оставляем запись с минимальным ID)
-        cursor.execute('''
-            DELETE FROM Admin 
-            WHERE Admin_ID NOT IN (
-                SELECT MIN(Admin_ID) 
-                FROM Admin 
-                GROUP BY phone_number
-            )
-        ''')
-        conn.commit()
-        conn.close()
+    def get_application_price(self, application_id):
+        """Цена заявки в копейках"""
+        application = self.application_repo.find_by_id(application_id)
+        if application is None:
+            raise ValueError(f"Заявка с ID {application_id} не существует")
+        return self.payments.quote(application)
+
+    def pay_application(self, application_id, idempotency_key=None):
+        """
+        Оплата заявки в статусе COMPLETED; успешная оплата переводит ее в PAID
+        Повтор с тем же idempotency_key возвращает прежний платеж
+        """
+        return self.payments.pay(application_id, idempotency_key)
+
+    def get_application_payments(self, application_id):
+        return self.payments.repository.find_by_application(application_id)
+
+    def get_revenue(self):
+        """Выручка по журналу проводок, в копейках"""
+        return self.payments.repository.balance()
+
+    def cleanup_duplicates(self, progress=None):
+        """
+        Офлайн-очистка дубликатов клиентов и администраторов по телефону (src/dedup.py)
+        При старте не вызывается: новых дубликатов не появляется благодаря UNIQUE-индексу телефона
+        """
+        from src.dedup import deduplicate, TABLES as DEDUP_TABLES
+
+        removed = sum(deduplicate(self.db, table, progress=progress) for table in DEDUP_TABLES)
+        for cache in (self.client_repo.cache, self.application_repo.cache):
+            if cache is not None:
+                cache.clear()
+        return removed
 
     def get_all_pollution_statuses(self):
         return self.pollution_status_repo.find_all()
@@ -135,21 +302,37 @@ class LaundrySystem:
     def get_all_application_statuses(self):
         return self.application_status_repo.find_all()
 
+    def get_entity_cache_stats(self):
+        """Статистика LRU-кэша клиентов и заявок (None, если кэш выключен)"""
+        return {
+            "client": self.client_repo.cache_stats(),
+            "application": self.application_repo.cache_stats(),
+        }
+
+    def get_status_cache_stats(self):
+        """Статистика попаданий в кэш справочников статусов"""
+        return {
+            "pollution_status": self.pollution_status_repo.cache_stats(),
+            "application_status": self.application_status_repo.cache_stats(),
+        }
+
+    def get_status_report(self):
+        return self.report_repo.applications_by_status()
+
+    def get_pollution_report(self):
+        return self.report_repo.items_by_pollution()
+
+    def get_top_clients_report(self, limit=10):
+        return self.report_repo.top_clients(limit)
+
+    def get_daily_throughput_report(self, days=14):
+        return self.report_repo.daily_throughput(days)
+
     def authenticate_client(self, name, phone_number):
-        clients = self.get_all_clients()
-        for client in clients:
-            if (client.name.lower() == name.lower() and
-                    str(client.phone_number) == str(phone_number)):
-                return client
-        return None
+        return self.client_repo.authenticate(name, phone_number)
 
     def authenticate_admin(self, name, phone_number):
-        admins = self.get_all_admins()
-        for admin in admins:
-            if (admin.name.lower() == name.lower() and
-                    str(admin.phone_number) == str(phone_number)):
-                return admin
-        return None
+        return self.admin_repo.authenticate(name, phone_number)
 
     def display_main_menu(self):
         print("\nДобро пожаловать в систему учета прачечной")
@@ -164,7 +347,8 @@ class LaundrySystem:
         print("2. Показать мои заявки")
         print("3. Редактировать профиль")
         print("4. Удалить профиль")
-        print("5. Выйти")
+        print("5. Оплатить заявку")
+        print("6. Выйти")
 
     def display_admin_menu(self):
         print(f"\nАдминистратор: {self.current_user.name} {self.current_user.last_name}")
@@ -176,7 +360,10 @@ class LaundrySystem:
         print("6. Удалить администратора")
         print("7. Удалить клиента")
         print("8. Удалить заявку")
-        print("9. Выйти")
+        print("9. Создать слоты времени")
+        print("10. Отчеты")
+        print("11. Поиск клиента")
+        print("12. Выйти")
 
     def _get_valid_input(self, prompt, validation_func, error_message):
         while True:
@@ -225,17 +412,49 @@ class LaundrySystem:
     def _validate_admin_exists(self, value):
         if not self._validate_number(value):
             return False
-        admins = self.get_all_admins()
-        for admin in admins:
-            if admin.Admin_ID == int(value):
-                return True
-        return False
+        return self.admin_repo.find_by_id(int(value)) is not None
+
+    def _print_paged(self, find_page, format_item, empty_message):
+        """
+        Постраничный вывод списка через keyset-пагинацию репозитория
+        Возвращает количество выведенных записей
+        """
+        page_token = None
+        printed = 0
+        while True:
+            items, page_token = find_page(page_token, self.page_size)
+            for item in items:
+                print(format_item(item))
+            printed += len(items)
+            if page_token is None:
+                break
+            if input("Enter - следующая страница, q - закончить просмотр: ").strip().lower() == 'q':
+                break
+        if not printed:
+            print(empty_message)
+        return printed
 
     def _validate_application_exists(self, value):
         if not self._validate_number(value):
             return False
         return self.application_repo.find_by_id(int(value)) is not None
 
+    def _validate_date(self, value):
+        try:
+            datetime.strptime(value.strip(), '%Y-%m-%d')
+            return True
+        except ValueError:
+            return False
+
+    def _validate_slot_time(self, value):
+        if not value.strip():
+            return True
+        try:
+            parse_slot_time(value.strip())
+            return True
+        except ValueError:
+            return False
+
     def _validate_pollution_status(self, value):
         return value in ['1', '2', '3']
 
@@ -245,15 +464,12 @@ class LaundrySystem:
     def client_login(self):
         print("\nВход клиента: ")
 
-        # Показываем всех клиентов для справки
-        print("\nСуществующие клиенты: ")
-        clients = self.get_all_clients()
-        if clients:
-            for client in clients:
+        # Подсказка по ФИО или телефону вместо вывода всех клиентов
+        query = input("Поиск по ФИО или телефону (Enter - пропустить): ").strip()
+        if query:
+            for client in self.search_clients(query, limit=5):
                 print(f"Имя: {client.name}, Телефон: {client.phone_number}")
-        else:
-            print("Зарегистрированных клиентов нет")
-        print("---")
+            print("---")
 
         name = self._get_valid_input("Имя: ", self._validate_not_empty, "Имя не может быть пустым!")
         phone_number = self._get_valid_input("Номер телефона: ", self._validate_phone,
@@ -274,12 +490,9 @@ class LaundrySystem:
 
         # Показываем всех администраторов для справки
         print("\nСуществующие администраторы: ")
-        admins = self.get_all_admins()
-        if admins:
-            for admin in admins:
-                print(f"Имя: {admin.name}, Телефон: {admin.phone_number}")
-        else:
-            print("Администраторов нет в системе")
+        self._print_paged(self.admin_repo.find_page,
+                          lambda admin: f"Имя: {admin.name}, Телефон: {admin.phone_number}",
+                          "Администраторов нет в системе")
         print("---")
 
         name = self._get_valid_input("Имя: ", self._validate_not_empty, "Имя не может быть пустым!")
@@ -330,26 +543,29 @@ class LaundrySystem:
 
     def show_all_clients(self):
         print("\nВсе клиенты: ")
-        clients = self.get_all_clients()
+        self._print_paged(
+            self.client_repo.find_page,
+            lambda client: f"ID: {client.Client_ID}, ФИО: {client.last_name} {client.name} {client.patronymic}, Телефон: {client.phone_number}, Email: {client.email}",
+            "Клиенты не найдены")
+
+    def search_clients_flow(self):
+        query = self._get_valid_input("Фамилия, имя, отчество, email или телефон: ", self._validate_not_empty,
+                                      "Запрос не может быть пустым!")
+        clients = self.search_clients(query, limit=self.page_size)
+        print("\nНайденные клиенты: ")
+        for client in clients:
+            print(f"ID: {client.Client_ID}, ФИО: {client.last_name} {client.name} {client.patronymic}, Телефон: {client.phone_number}, Email: {client.email}")
         if not clients:
             print("Клиенты не найдены")
-        else:
-            for client in clients:
-                print(
-                    f"ID: {client.Client_ID}, ФИО: {client.last_name} {client.name} {client.patronymic}, Телефон: {client.phone_number}, Email: {client.email}")
 
     def show_all_admins_info(self):
         """Показывает всех администраторов с их данными"""
         print("\nВсе администраторы: ")
-        admins = self.get_all_admins()
-        if not admins:
-            print("Администраторы не найдены")
-        else:
-            for admin in admins:
-                print(
-                    f"ID: {admin.Admin_ID}, ФИО: {admin.last_name} {admin.name} {admin.patronymic}, "
-                    f"Телефон: {admin.phone_number}, Email: {admin.email}"
-                )
+        self._print_paged(
+            self.admin_repo.find_page,
+            lambda admin: f"ID: {admin.Admin_ID}, ФИО: {admin.last_name} {admin.name} {admin.patronymic}, "
+                          f"Телефон: {admin.phone_number}, Email: {admin.email}",
+            "Администраторы не найдены")
 
     def create_application_flow(self):
         print("\nСоздание заявки: ")
@@ -370,6 +586,11 @@ class LaundrySystem:
         number_of_items = self._get_valid_input("\nКоличество вещей: ", self._validate_positive_number,
                                                 "Количество вещей должно быть положительным числом!")
 
+        proceed, slot_id = self._choose_slot()
+        if not proceed:
+            print("Оформление заявки отменено")
+            return
+
         try:
             if self.user_type == 'client':
                 client_id = self.current_user.Client_ID
@@ -379,64 +600,130 @@ class LaundrySystem:
                                                   "Неверный ID клиента или клиент не существует!")
 
             application = self.create_application(int(client_id), pollution_status_id, app_status_id,
-                                                  int(number_of_items))
+                                                  int(number_of_items), slot_id)
             print(f"Заявка создана с ID: {application.Application_ID}")
         except Exception as e:
             print(f"Ошибка: {e}")
 
+    def _choose_slot(self):
+        """
+        Выбор времени забора вещей
+        Возвращает (продолжать ли оформление, ID слота или None - без записи на время)
+        """
+        desired_time = self._get_valid_input(
+            "\nЖелаемое время забора вещей (ГГГГ-ММ-ДД ЧЧ:ММ, Enter - без записи на время): ",
+            self._validate_slot_time, "Неверный формат времени! Пример: 2025-05-20 10:00").strip()
+        if not desired_time:
+            return True, None
+        slots = self.find_alternative_slots(desired_time)
+        # Сравнение по времени, а не по строкам: "9:00" без ведущего нуля
+        desired = parse_slot_time(desired_time)
+        for slot in slots:
+            if parse_slot_time(slot.start_time) <= desired < parse_slot_time(slot.end_time):
+                return True, slot.Slot_ID
+
+        if not slots:
+            print("Свободного времени нет")
+            return False, None
+        print("Выбранное время недоступно. Ближайшее свободное время:")
+        for number, slot in enumerate(slots, 1):
+            print(f"{number}. {slot.start_time} - {slot.end_time[-5:]} (свободно мест: {slot.capacity - slot.booked})")
+        choice = self._get_valid_input(
+            "Выберите вариант (0 - отменить оформление заявки): ",
+            lambda value: value.isdigit() and 0 <= int(value) <= len(slots),
+            f"Введите число от 0 до {len(slots)}")
+        if choice == '0':
+            return False, None
+        return True, slots[int(choice) - 1].Slot_ID
+
     def show_all_applications(self):
         print("\nВсе заявки: ")
-        applications = self.get_all_applications()
+        return self._print_paged(self.application_repo.find_page_with_relations, self._format_application,
+                                 "Заявки не найдены")
 
-        if not applications:
-            print("Заявки не найдены")
-        else:
-            for app in applications:
-                client = self.get_client_by_id(app.Client_ID)
-                pollution = self.pollution_status_repo.find_by_id(app.PollutionStatus_ID)
-                status = self.application_status_repo.find_by_id(app.ApplicationStatus_ID)
-                client_name = f"{client.last_name} {client.name} {client.patronymic}" if client else "Неизвестный клиент"
-                pollution_name = pollution.name if pollution else "Неизвестно"
-                status_name = status.name if status else "Неизвестно"
-                print(
-                    f"Заявка ID: {app.Application_ID}, Клиент: {client_name}, Кол-во вещей: {app.Number_of_items}, Загрязнение: {pollution_name}, Статус: {status_name}, Время: {app.Time_of_receipt}")
+    def _format_application(self, app):
+        client = app["client"]
+        client_name = f"{client['last_name']} {client['name']} {client['patronymic']}" if client["client_id"] else "Неизвестный клиент"
+        pollution_name = app["pollution_status"]["name"] or "Неизвестно"
+        status_name = app["application_status"]["name"] or "Неизвестно"
+        time_of_receipt = app["time_of_receipt"] or "не выбрано"
+        return f"Заявка ID: {app['application_id']}, Клиент: {client_name}, Кол-во вещей: {app['number_of_items']}, Загрязнение: {pollution_name}, Статус: {status_name}, Время: {time_of_receipt}"
 
     def show_client_applications(self):
         print("\nМои заявки:")
         try:
             if self.user_type == 'client':
-                applications = self.get_applications_by_client(self.current_user.Client_ID)
+                applications = self.get_client_applications_with_relations(self.current_user.Client_ID)
             else:
                 self.show_all_clients()
                 client_id = self._get_valid_input("ID клиента: ", self._validate_client_exists,
                                                   "Неверный ID клиента или клиент не существует!")
-                applications = self.get_applications_by_client(int(client_id))
+                applications = self.get_client_applications_with_relations(int(client_id))
 
             if not applications:
                 print("Заявки не найдены")
             else:
                 for app in applications:
-                    pollution = self.pollution_status_repo.find_by_id(app.PollutionStatus_ID)
-                    status = self.application_status_repo.find_by_id(app.ApplicationStatus_ID)
-                    pollution_name = pollution.name if pollution else "Неизвестно"
-                    status_name = status.name if status else "Неизвестно"
+                    pollution_name = app["pollution_status"]["name"] or "Неизвестно"
+                    status_name = app["application_status"]["name"] or "Неизвестно"
+                    time_of_receipt = app["time_of_receipt"] or "не выбрано"
                     print(
-                        f"Заявка ID: {app.Application_ID}, Кол-во вещей: {app.Number_of_items}, Загрязнение: {pollution_name}, Статус: {status_name}, Время: {app.Time_of_receipt}")
+                        f"Заявка ID: {app['application_id']}, Кол-во вещей: {app['number_of_items']}, Загрязнение: {pollution_name}, Статус: {status_name}, Время: {time_of_receipt}")
         except Exception as e:
             print(f"Ошибка: {e}")
 
+    def pay_application_flow(self):
+        print("\nОплата заявки: ")
+        awaiting = [app for app in self.get_client_applications_with_relations(self.current_user.Client_ID)
+                    if app["application_status"]["application_status_id"] == 'COMPLETED']
+        if not awaiting:
+            print("Нет заявок, ожидающих оплаты")
+            return
+        for app in awaiting:
+            price = format_amount(self.get_application_price(app["application_id"]))
+            print(f"Заявка ID: {app['application_id']}, Кол-во вещей: {app['number_of_items']}, К оплате: {price}")
+        ids = {str(app["application_id"]) for app in awaiting}
+        app_id = self._get_valid_input("ID заявки: ", lambda value: value in ids, "Эта заявка не ожидает оплаты!")
+
+        # Один ключ на попытку оплаты: повтор после ошибки связи не спишет деньги дважды
+        idempotency_key = uuid.uuid4().hex
+        for attempt in range(3):
+            try:
+                payment = self.pay_application(int(app_id), idempotency_key)
+                break
+            except sqlite3.OperationalError as e:
+                print(f"Ошибка связи с базой ({e}), повтор...")
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return
+        else:
+            print("Оплата не выполнена, попробуйте позже")
+            return
+        if payment.status == 'SUCCEEDED':
+            print(f"Оплачено {format_amount(payment.amount)}, платеж №{payment.Payment_ID}")
+        else:
+            print("Платеж отклонен банком")
+
     def update_application_status_flow(self):
         print("\nОбновление статуса заявки: ")
-        self.show_all_applications()
-        applications = self.get_all_applications()
-        if not applications:
+        if not self.show_all_applications():
             print("Нет заявок для обновления!")
             return
         app_id = self._get_valid_input("ID заявки: ", self._validate_application_exists,
                                        "Неверный ID заявки или заявка не существует!")
 
+        # Версия запоминается при просмотре: если заявку успеют изменить, смена статуса не пройдет
+        found = self.application_repo.find_status_version(int(app_id))
+        if found is None:
+            # Заявку успели удалить после проверки ID
+            print("Заявка не найдена")
+            return
+        current_status, version = found
+        print(f"Текущий статус: {current_status}")
+
         application_status = self._get_valid_input(
-            "\nНовый статус заявки:\n1. В обработке\n2. Ожидает оплаты\n3. Отменена\nВыберите статус заявки (1-3): ",
+            "\nНовый статус заявки:\n1. В обработке\n2. Ожидает оплаты\n3. Отменена\n"
+            "Выберите статус заявки (1-3): ",
             self._validate_application_status, "Неверный выбор! Введите 1, 2 или 3")
 
         application_mapping = {
@@ -447,22 +734,19 @@ class LaundrySystem:
         new_status = application_mapping[application_status]
 
         try:
-            if self.update_application_status(int(app_id), new_status):
-                print("Статус заявки обновлен")
-            else:
-                print("Ошибка обновления статуса")
+            self.update_application_status(int(app_id), new_status, expected_version=version)
+            print("Статус заявки обновлен")
+        except StatusConflictError as e:
+            print(f"Ошибка: {e}. Обновите список заявок и повторите")
         except Exception as e:
             print(f"Ошибка: {e}")
 
     def show_admins(self):
         print("\nАдминистраторы: ")
-        admins = self.get_all_admins()
-        if not admins:
-            print("Администраторы не найдены")
-        else:
-            for admin in admins:
-                print(
-                    f"ID: {admin.Admin_ID}, ФИО: {admin.last_name} {admin.name} {admin.patronymic}, Телефон: {admin.phone_number}, Email: {admin.email}")
+        self._print_paged(
+            self.admin_repo.find_page,
+            lambda admin: f"ID: {admin.Admin_ID}, ФИО: {admin.last_name} {admin.name} {admin.patronymic}, Телефон: {admin.phone_number}, Email: {admin.email}",
+            "Администраторы не найдены")
 
     def add_admin(self):
         print("\nДобавление администратора: ")
@@ -518,6 +802,46 @@ class LaundrySystem:
         except Exception as e:
             print(f"Ошибка: {e}")
 
+    def generate_slots_flow(self):
+        print("\nСоздание слотов времени: ")
+        start_date = self._get_valid_input("Первый день (ГГГГ-ММ-ДД): ", self._validate_date,
+                                           "Неверный формат даты! Пример: 2025-05-20")
+        days = self._get_valid_input("Количество дней: ", self._validate_positive_number,
+                                     "Количество дней должно быть положительным числом!")
+        slot_minutes = self._get_valid_input("Длительность слота в минутах: ", self._validate_positive_number,
+                                             "Длительность должна быть положительным числом!")
+        capacity = self._get_valid_input("Заявок в одном слоте: ", self._validate_positive_number,
+                                         "Вместимость должна быть положительным числом!")
+        try:
+            created = self.generate_slots(start_date, int(days), slot_minutes=int(slot_minutes),
+                                          capacity=int(capacity))
+            print(f"Создано слотов: {created}")
+        except Exception as e:
+            print(f"Ошибка: {e}")
+
+    def show_reports(self):
+        print("\nЗаявки по статусам: ")
+        for row in self.get_status_report():
+            print(f"{row['name']}: заявок {row['applications']}, вещей {row['items']}")
+
+        print("\nВещи по степени загрязнения: ")
+        for row in self.get_pollution_report():
+            print(f"{row['name']}: вещей {row['items']} (заявок {row['applications']})")
+
+        print("\nКлиенты с наибольшим числом вещей: ")
+        for row in self.get_top_clients_report():
+            print(f"ID: {row['client_id']}, {row['last_name']} {row['name']}: "
+                  f"заявок {row['applications']}, вещей {row['items']}")
+
+        print(f"\nВыручка: {format_amount(self.get_revenue())}")
+
+        print("\nПропускная способность по дням: ")
+        days = self.get_daily_throughput_report()
+        if not days:
+            print("Данных пока нет")
+        for row in days:
+            print(f"{row['day']}: принято {row['received']}, выполнено {row['completed']}, вещей {row['items']}")
+
     def edit_client_profile(self):
         print("\nРедактирование профиля: ")
         print(f"Текущие данные: {self.current_user.last_name} {self.current_user.name} {self.current_user.patronymic}")
@@ -573,6 +897,8 @@ class LaundrySystem:
                     if self.delete_own_profile():
                         return
                 elif choice == '5':
+                    self.pay_application_flow()
+                elif choice == '6':
                     self.current_user = None
                     self.user_type = None
                     print("Выход из аккаунта клиента")
@@ -604,6 +930,12 @@ class LaundrySystem:
                 elif choice == '8':
                     self.delete_application_flow()
                 elif choice == '9':
+                    self.generate_slots_flow()
+                elif choice == '10':
+                    self.show_reports()
+                elif choice == '11':
+                    self.search_clients_flow()
+                elif choice == '12':
                     self.current_user = None
                     self.user_type = None
                     print("Выход из аккаунта администратора")
@@ -614,6 +946,12 @@ class LaundrySystem:
                 print(f"Ошибка: {e}")
 
     def run(self):
+        try:
+            self._run_menu()
+        finally:
+            self.close()
+
+    def _run_menu(self):
         while True:
             self.display_main_menu()
             choice = input("Выберите действие: ")
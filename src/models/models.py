@@ -9,6 +9,8 @@ class Client:
     - phone_number: номер телефона клиента
     - email: почта клиента
     """
+    __slots__ = ('Client_ID', 'last_name', 'name', 'patronymic', 'phone_number', 'email')
+
     def __init__(self, id, last_name, name, patronymic, phone_number, email):
         self.Client_ID = id
         self.last_name = last_name
@@ -17,6 +19,11 @@ class Client:
         self.phone_number = phone_number
         self.email = email
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
+
 class Admin:
     """
     Модель для таблицы Admins
@@ -28,6 +35,8 @@ class Admin:
     - phone_number: номер телефона админа
     - email: почта админа
     """
+    __slots__ = ('Admin_ID', 'last_name', 'name', 'patronymic', 'phone_number', 'email')
+
     def __init__(self, id, last_name, name, patronymic, phone_number, email):
         self.Admin_ID = id
         self.last_name = last_name
@@ -36,6 +45,11 @@ class Admin:
         self.phone_number = phone_number
         self.email = email
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
+
 class ApplicationStatus:
     """
     Модель для таблицы Application Status
@@ -44,11 +58,18 @@ class ApplicationStatus:
     - name: короткое название заявки
     - comment: статусы заявок
     """
+    __slots__ = ('ApplicationStatus_ID', 'name', 'comment')
+
     def __init__(self, id, name, comment):
         self.ApplicationStatus_ID = id
         self.name = name
         self.comment = comment
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
+
 class PollutionStatus:
     """
     Модель для таблицы PollutionStatus
@@ -57,11 +78,18 @@ class PollutionStatus:
     - name: короткое название степени загрязнения
     - comment: статусы заявок
     """
+    __slots__ = ('PollutionStatus_ID', 'name', 'comment')
+
     def __init__(self, id, name, comment):
         self.PollutionStatus_ID = id
         self.name = name
         self.comment = comment
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
+
 class Application:
     """
     Модель для таблицы Applications
@@ -71,11 +99,75 @@ class Application:
     - number_of_items: количество вещей в заявке (FK)
     - pollutionStatus_ID: степень загрязнения
     - applicationStatus_ID: статус заявки (FK)
+    - slot_ID: слот времени забора вещей (FK, может отсутствовать)
+    - version: номер версии, растет при каждом изменении заявки
     """
-    def __init__(self, id, client_ID, number_of_items, pollutionStatus_ID, applicationStatus_ID):
+    __slots__ = ('Application_ID', 'Client_ID', 'Number_of_items', 'PollutionStatus_ID', 'ApplicationStatus_ID',
+                 'Slot_ID', 'version')
+
+    def __init__(self, id, client_ID, number_of_items, pollutionStatus_ID, applicationStatus_ID, slot_ID=None,
+                 version=0):
         self.Application_ID = id
         self.Client_ID = client_ID
         self.Number_of_items = number_of_items
         self.PollutionStatus_ID = pollutionStatus_ID
         self.ApplicationStatus_ID = applicationStatus_ID
+        self.Slot_ID = slot_ID
+        self.version = version
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
+
+class Slot:
+    """
+    Модель для таблицы Slot
+    Поля:
+    - id: уникальный идентификатор слота (PK)
+    - start_time: начало интервала (ГГГГ-ММ-ДД ЧЧ:ММ)
+    - end_time: конец интервала (ГГГГ-ММ-ДД ЧЧ:ММ)
+    - capacity: сколько заявок можно принять в слот
+    - booked: сколько заявок уже записано
+    """
+    __slots__ = ('Slot_ID', 'start_time', 'end_time', 'capacity', 'booked')
+
+    def __init__(self, id, start_time, end_time, capacity, booked=0):
+        self.Slot_ID = id
+        self.start_time = start_time
+        self.end_time = end_time
+        self.capacity = capacity
+        self.booked = booked
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
+
+class Payment:
+    """
+    Модель для таблицы Payment
+    Поля:
+    - id: уникальный идентификатор платежа (PK)
+    - idempotency_key: ключ идемпотентности, повтор с тем же ключом не создает новый платеж
+    - application_ID: оплачиваемая заявка
+    - amount: сумма в копейках
+    - status: SUCCEEDED или DECLINED
+    - gateway_ref: идентификатор операции в платежном шлюзе
+    - created_at: время записи платежа
+    """
+    __slots__ = ('Payment_ID', 'idempotency_key', 'Application_ID', 'amount', 'status', 'gateway_ref', 'created_at')
+
+    def __init__(self, id, idempotency_key, application_ID, amount, status, gateway_ref=None, created_at=None):
+        self.Payment_ID = id
+        self.idempotency_key = idempotency_key
+        self.Application_ID = application_ID
+        self.amount = amount
+        self.status = status
+        self.gateway_ref = gateway_ref
+        self.created_at = created_at
 
+    @classmethod
+    def from_row(cls, cursor, row):
+        """row_factory для sqlite3: строит объект прямо из строки курсора"""
+        return cls(*row)
@@ -0,0 +1,122 @@
+"""
+Оплата заявок
+
+Клиент оплачивает заявку в статусе COMPLETED ("Ожидает оплаты"). Цена
+считается по тарифу степени загрязнения (таблица Tariff): базовая цена плюс
+цена за каждую вещь. Каждый платеж несет ключ идемпотентности: повторный
+запрос с тем же ключом (например, после обрыва связи) возвращает уже
+записанный результат и не списывает деньги второй раз - ни в шлюзе, ни в
+журнале. Платежи и проводки записываются пачками через LedgerWriter.
+"""
+import threading
+import time
+import uuid
+
+from src.models.models import Payment
+from src.repository.payments import PaymentRepository, LedgerWriter
+
+
+def calculate_price(number_of_items, base_price, item_price):
+    """Цена заявки в копейках"""
+    if number_of_items <= 0:
+        raise ValueError("Количество вещей должно быть положительным числом")
+    return base_price + item_price * number_of_items
+
+
+def format_amount(amount):
+    """Копейки -> строка в рублях"""
+    return f"{amount // 100}.{amount % 100:02d} руб."
+
+
+class FakePaymentGateway:
+    """
+    Локальный платежный шлюз для разработки и тестов
+    Идемпотентен по ключу, как настоящие шлюзы: повтор charge с тем же
+    ключом возвращает прежний ответ. Отклоняет платежи больше decline_over
+    копеек; latency - имитация сетевой задержки в секундах.
+    """
+    def __init__(self, decline_over=None, latency=0.0):
+        self.decline_over = decline_over
+        self.latency = latency
+        self.charges = {}
+        self.refunds = set()
+        self._lock = threading.Lock()
+
+    def charge(self, amount, idempotency_key):
+        """Списание: словарь {"approved": bool, "reference": str}"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            result = self.charges.get(idempotency_key)
+            if result is None:
+                approved = self.decline_over is None or amount <= self.decline_over
+                result = {"approved": approved, "reference": f"fake-{uuid.uuid4().hex[:16]}", "amount": amount}
+                self.charges[idempotency_key] = result
+            return result
+
+    def refund(self, reference):
+        with self._lock:
+            self.refunds.add(reference)
+
+
+class PaymentProcessor:
+    """
+    Прием платежей: проверка заявки, цена, списание в шлюзе, запись пачкой
+    Ответ шлюза сохраняется в базе под ключом идемпотентности. Если между
+    проверкой и записью заявку успели оплатить с другим ключом или запись
+    пачки не удалась, списание возвращается в шлюз.
+    """
+    def __init__(self, db, application_repo, gateway=None, batch_size=512):
+        self.application_repo = application_repo
+        self.gateway = gateway or FakePaymentGateway()
+        self.repository = PaymentRepository(db)
+        self.writer = LedgerWriter(db, self.repository, batch_size, on_commit=self._invalidate)
+
+    def quote(self, application):
+        """Цена заявки по тарифу ее степени загрязнения"""
+        tariff = self.repository.find_tariff(application.PollutionStatus_ID)
+        if tariff is None:
+            raise ValueError(f"Нет тарифа для степени загрязнения {application.PollutionStatus_ID}")
+        return calculate_price(application.Number_of_items, *tariff)
+
+    def pay(self, application_id, idempotency_key=None):
+        """Оплата заявки, возвращает записанный Payment (SUCCEEDED или DECLINED)"""
+        if idempotency_key is None:
+            idempotency_key = uuid.uuid4().hex
+        existing = self.repository.find_by_key(idempotency_key)
+        if existing is not None:
+            return self._replay(existing, application_id)
+
+        application = self.application_repo.find_by_id(application_id)
+        if application is None:
+            raise ValueError(f"Заявка с ID {application_id} не существует")
+        if application.ApplicationStatus_ID != 'COMPLETED':
+            raise ValueError(f"Заявка {application_id} не ожидает оплаты (статус {application.ApplicationStatus_ID})")
+        amount = self.quote(application)
+
+        result = self.gateway.charge(amount, idempotency_key)
+        payment = Payment(None, idempotency_key, application_id, amount,
+                          'SUCCEEDED' if result["approved"] else 'DECLINED', result["reference"])
+        # Любая ошибка записи - отказ (ValueError) или сбой всей пачки, например
+        # SQLITE_BUSY, - значит, платеж не записан: списание возвращается
+        try:
+            stored = self.writer.submit(payment).result()
+        except Exception:
+            if result["approved"]:
+                self.gateway.refund(result["reference"])
+            raise
+        # Тот же ключ мог прийти параллельно и записаться в этой же пачке раньше
+        return stored if stored is payment else self._replay(stored, application_id)
+
+    def close(self):
+        self.writer.close()
+
+    def _replay(self, payment, application_id):
+        if payment.Application_ID != application_id:
+            raise ValueError("Ключ идемпотентности уже использован для другой заявки")
+        return payment
+
+    def _invalidate(self, payments):
+        for payment in payments:
+            if payment.status == 'SUCCEEDED':
+                self.application_repo.invalidate(payment.Application_ID)
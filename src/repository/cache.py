@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReferenceCache:
+    """
+    Кэш небольшого справочника целиком в памяти (read-through)
+    При первом обращении загружает все строки через loader, дальше отдает
+    их без обращения к БД. invalidate() сбрасывает кэш после записи.
+    """
+    def __init__(self, loader, key):
+        self._loader = loader
+        self._key = key
+        self._items = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        items = self._items
+        if items is not None:
+            self.hits += 1
+            return items
+        with self._lock:
+            if self._items is None:
+                self.misses += 1
+                self._items = {self._key(item): item for item in self._loader()}
+            else:
+                self.hits += 1
+            return self._items
+
+    def warm_up(self):
+        """Загружает справочник заранее (при старте приложения)"""
+        with self._lock:
+            self._items = {self._key(item): item for item in self._loader()}
+
+    def get(self, key):
+        return self._load().get(key)
+
+    def all(self):
+        return list(self._load().values())
+
+    def invalidate(self):
+        self._items = None
+
+    def stats(self):
+        items = self._items
+        return {"hits": self.hits, "misses": self.misses, "size": len(items) if items is not None else 0}
+
+
+class LRUCache:
+    """
+    Ограниченный LRU-кэш сущностей по первичному ключу (identity map)
+    maxsize - максимум записей, ttl - время жизни записи в секундах (None - без срока).
+    Потокобезопасен, ведет счетчики попаданий, промахов и вытеснений.
+    """
+    def __init__(self, maxsize=1024, ttl=None):
+        if maxsize < 1:
+            raise ValueError("Размер кэша должен быть положительным числом")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.version = 0  # растет при каждом сбросе
+
+    def get(self, key):
+        """Возвращает значение или None, если записи нет или она устарела"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version=None):
+        """
+        Кладет значение в кэш
+        version - значение self.version до чтения из БД: если с тех пор был
+        сброс, прочитанная строка могла устареть и не кэшируется
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self.version += 1
+            self._items.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """Удаляет все записи, значения которых удовлетворяют predicate"""
+        with self._lock:
+            self.version += 1
+            for key in [key for key, (value, _) in self._items.items() if predicate(value)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._items),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
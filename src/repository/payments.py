@@ -0,0 +1,195 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from src.models.models import Payment
+from src.repository.cache import ReferenceCache
+
+PAYMENT_COLUMNS = 'Payment_ID, idempotency_key, Application_ID, amount, status, gateway_ref, created_at'
+
+# Перевод в PAID - только здесь, после записи успешного платежа (его проверяет
+# триггер trg_application_paid_update); в StatusTransition этого перехода нет
+PAY_SQL = '''
+    UPDATE Application SET ApplicationStatus_ID = 'PAID', version = version + 1
+    WHERE Application_ID = ? AND ApplicationStatus_ID = 'COMPLETED'
+'''
+
+# Счета журнала проводок
+CLIENT_ACCOUNT = 'CLIENT'
+REVENUE_ACCOUNT = 'REVENUE'
+
+
+class PaymentRepository:
+    """Тарифы (из кэша), платежи и журнал проводок"""
+    def __init__(self, db):
+        self.db = db
+        self.tariffs = ReferenceCache(self._load_tariffs, lambda tariff: tariff[0])
+
+    def find_tariff(self, pollution_status_id):
+        """(базовая цена, цена за вещь) в копейках или None"""
+        tariff = self.tariffs.get(pollution_status_id)
+        return tariff[1:] if tariff else None
+
+    def find_by_key(self, idempotency_key):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Payment.from_row
+            cursor.execute(f'SELECT {PAYMENT_COLUMNS} FROM Payment WHERE idempotency_key = ?', (idempotency_key,))
+            return cursor.fetchone()
+
+    def find_by_application(self, application_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Payment.from_row
+            cursor.execute(f'SELECT {PAYMENT_COLUMNS} FROM Payment WHERE Application_ID = ? ORDER BY Payment_ID',
+                           (application_id,))
+            return cursor.fetchall()
+
+    def find_ledger(self, payment_id):
+        """Проводки платежа: список словарей"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                'SELECT Entry_ID, account, amount, created_at FROM Ledger WHERE Payment_ID = ? ORDER BY Entry_ID',
+                (payment_id,))
+            return [{"entry_id": row[0], "account": row[1], "amount": row[2], "created_at": row[3]}
+                    for row in cursor.fetchall()]
+
+    def balance(self, account=REVENUE_ACCOUNT):
+        """Остаток счета в копейках (по покрывающему индексу idx_ledger_account)"""
+        with self.db.connection() as conn:
+            return conn.execute('SELECT COALESCE(SUM(amount), 0) FROM Ledger WHERE account = ?',
+                                (account,)).fetchone()[0]
+
+    def insert_batch(self, conn, payments):
+        """
+        Записывает платежи в открытой транзакции conn
+        Для каждого платежа возвращает сохраненный Payment или исключение:
+        повтор ключа идемпотентности отдает ранее записанный платеж. Успешный
+        платеж записывается вместе с переводом заявки в PAID под точкой
+        сохранения: если заявку успели отменить, удалить или оплатить с другим
+        ключом, ни платеж, ни проводки не остаются, а платеж получает
+        ValueError (списание в шлюзе возвращается)
+        """
+        cursor = conn.cursor()
+        results = []
+        entries = []
+        for payment in payments:
+            cursor.execute('SAVEPOINT payment')
+            row = cursor.execute(
+                'INSERT INTO Payment (idempotency_key, Application_ID, amount, status, gateway_ref) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT DO NOTHING RETURNING Payment_ID, created_at',
+                (payment.idempotency_key, payment.Application_ID, payment.amount, payment.status,
+                 payment.gateway_ref)).fetchone()
+            if row is None:
+                cursor.execute('RELEASE payment')
+                results.append(self._find_in_batch(cursor, payment.idempotency_key) or
+                               ValueError(f"Заявка {payment.Application_ID} уже оплачена"))
+                continue
+            if payment.status == 'SUCCEEDED':
+                cursor.execute(PAY_SQL, (payment.Application_ID,))
+                if cursor.rowcount == 0:
+                    cursor.execute('ROLLBACK TO payment')
+                    cursor.execute('RELEASE payment')
+                    results.append(ValueError(f"Заявка {payment.Application_ID} больше не ожидает оплаты"))
+                    continue
+                entries.append((row[0], CLIENT_ACCOUNT, -payment.amount))
+                entries.append((row[0], REVENUE_ACCOUNT, payment.amount))
+            cursor.execute('RELEASE payment')
+            payment.Payment_ID, payment.created_at = row
+            results.append(payment)
+        if entries:
+            cursor.executemany('INSERT INTO Ledger (Payment_ID, account, amount) VALUES (?, ?, ?)', entries)
+        return results
+
+    def _find_in_batch(self, cursor, idempotency_key):
+        cursor.row_factory = Payment.from_row
+        try:
+            return cursor.execute(f'SELECT {PAYMENT_COLUMNS} FROM Payment WHERE idempotency_key = ?',
+                                  (idempotency_key,)).fetchone()
+        finally:
+            cursor.row_factory = None
+
+    def _load_tariffs(self):
+        with self.db.connection() as conn:
+            return conn.execute('SELECT PollutionStatus_ID, base_price, item_price FROM Tariff').fetchall()
+
+
+class LedgerWriter:
+    """
+    Групповая фиксация платежей
+    Потоки, принимающие платежи, ставят их в очередь и ждут Future. Один
+    поток-писатель забирает из очереди все накопившиеся платежи (до
+    batch_size) и записывает их одной транзакцией: пока идет COMMIT одной
+    пачки, в очереди собирается следующая, и на платеж приходится доля
+    одной синхронизации с диском вместо целой.
+    """
+    def __init__(self, db, repository, batch_size=512, on_commit=None):
+        if batch_size < 1:
+            raise ValueError("Размер пачки должен быть положительным числом")
+        self.db = db
+        self.repository = repository
+        self.batch_size = batch_size
+        self.on_commit = on_commit
+        self.batches = 0
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, payment):
+        """Ставит платеж в очередь записи, возвращает Future с результатом"""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ledger-writer", daemon=True)
+                self._thread.start()
+            self._queue.put((payment, future))
+        return future
+
+    def close(self):
+        """Дописывает очередь и останавливает поток-писатель"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        payments = [payment for payment, _ in batch]
+        try:
+            with self.db.transaction() as conn:
+                results = self.repository.insert_batch(conn, payments)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.written += len(batch)
+        if self.on_commit is not None:
+            self.on_commit(payments)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,70 @@
+from src.database.migrations import rebuild_summaries
+
+
+class ReportRepository:
+    """
+    Отчеты для администратора
+    Читаются сводные таблицы (StatusSummary, PollutionSummary, ClientSummary,
+    DailySummary), которые триггеры таблицы Application обновляют при каждой
+    записи. Время отчета не зависит от числа заявок.
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def applications_by_status(self):
+        """Число заявок и вещей по статусам заявки"""
+        with self.db.connection() as conn:
+            cursor = conn.execute('''
+                SELECT s.ApplicationStatus_ID, s.name, COALESCE(t.applications, 0), COALESCE(t.items, 0)
+                FROM ApplicationStatus s
+                LEFT JOIN StatusSummary t ON t.ApplicationStatus_ID = s.ApplicationStatus_ID
+                ORDER BY s.ApplicationStatus_ID
+            ''')
+            return [{"status_id": row[0], "name": row[1], "applications": row[2], "items": row[3]}
+                    for row in cursor.fetchall()]
+
+    def items_by_pollution(self):
+        """Число заявок и вещей по степени загрязнения"""
+        with self.db.connection() as conn:
+            cursor = conn.execute('''
+                SELECT p.PollutionStatus_ID, p.name, COALESCE(t.applications, 0), COALESCE(t.items, 0)
+                FROM PollutionStatus p
+                LEFT JOIN PollutionSummary t ON t.PollutionStatus_ID = p.PollutionStatus_ID
+                ORDER BY p.PollutionStatus_ID
+            ''')
+            return [{"pollution_status_id": row[0], "name": row[1], "applications": row[2], "items": row[3]}
+                    for row in cursor.fetchall()]
+
+    def top_clients(self, limit=10):
+        """Клиенты с наибольшим числом вещей (по индексу idx_client_summary_items)"""
+        with self.db.connection() as conn:
+            cursor = conn.execute('''
+                SELECT t.Client_ID, c.last_name, c.name, t.applications, t.items
+                FROM ClientSummary t
+                LEFT JOIN Client c ON c.Client_ID = t.Client_ID
+                ORDER BY t.items DESC, t.applications DESC
+                LIMIT ?
+            ''', (limit,))
+            return [{"client_id": row[0], "last_name": row[1], "name": row[2], "applications": row[3],
+                     "items": row[4]} for row in cursor.fetchall()]
+
+    def client_totals(self, client_id):
+        """Итоги одного клиента: число заявок и вещей"""
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT applications, items FROM ClientSummary WHERE Client_ID = ?',
+                               (client_id,)).fetchone()
+        applications, items = row or (0, 0)
+        return {"client_id": client_id, "applications": applications, "items": items}
+
+    def daily_throughput(self, days=14):
+        """Принято и выполнено заявок по дням за последние days дней с данными"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                'SELECT day, received, completed, items FROM DailySummary ORDER BY day DESC LIMIT ?', (days,))
+            return [{"day": row[0], "received": row[1], "completed": row[2], "items": row[3]}
+                    for row in cursor.fetchall()]
+
+    def rebuild(self):
+        """Полный пересчет сводок по таблице Application (если данные меняли в обход триггеров)"""
+        with self.db.connection() as conn:
+            rebuild_summaries(conn.cursor())
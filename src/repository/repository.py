@@ -1,208 +1,1106 @@
+import base64
+import json
+import re
+import sqlite3
+from datetime import datetime
+from difflib import SequenceMatcher
+
 from src.database.db import Database
-from src.models.models import Client, Admin, Application, PollutionStatus, ApplicationStatus
+from src.models.models import Client, Admin, Application, PollutionStatus, ApplicationStatus, Slot
+from src.repository.cache import ReferenceCache
+
+
+def chunked(items, chunk_size):
+    """Разбивает последовательность (или генератор) на списки по chunk_size элементов"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_rows(cursor, sql, params):
+    """
+    Вставляет строки одним executemany и возвращает их ID
+    Внутри одной пишущей транзакции AUTOINCREMENT выдает ID подряд,
+    поэтому они восстанавливаются по last_insert_rowid()
+    """
+    cursor.executemany(sql, params)
+    last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+    return list(range(last_id - len(params) + 1, last_id + 1))
+
+
+def upsert_by_phone(cursor, table, id_column, values):
+    """
+    Вставка человека (клиента или администратора) с UPSERT по UNIQUE-индексу
+    телефона: если номер уже есть, обновляется существующая запись.
+    values - (фамилия, имя, отчество, телефон, email). Возвращает ID записи
+    """
+    cursor.execute(
+        f'INSERT INTO {table} (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT(phone_number) DO UPDATE SET last_name = excluded.last_name, name = excluded.name, '
+        f'patronymic = excluded.patronymic, email = excluded.email RETURNING {id_column}',
+        values)
+    return cursor.fetchall()[0][0]
+
+
+class DuplicatePhoneError(ValueError):
+    """Номер телефона уже принадлежит другой записи"""
+
+
+def check_duplicate_phone(error, phone_number):
+    """Превращает нарушение UNIQUE-индекса телефона в DuplicatePhoneError"""
+    if 'phone_number' in str(error):
+        raise DuplicatePhoneError(f"Номер телефона {phone_number} уже зарегистрирован") from None
+
+
+def insert_person(cursor, table, id_column, values):
+    """
+    Вставка одного человека (регистрация): в отличие от upsert_by_phone
+    существующая запись с тем же телефоном не перезаписывается, а
+    поднимается DuplicatePhoneError. Возвращает ID новой записи
+    """
+    try:
+        cursor.execute(
+            f'INSERT INTO {table} (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?) '
+            f'RETURNING {id_column}', values)
+        return cursor.fetchall()[0][0]
+    except sqlite3.IntegrityError as e:
+        check_duplicate_phone(e, values[3])
+        raise
+
+
+def insert_people(conn, table, id_column, params):
+    """
+    Вставка порции людей одним executemany (регистрация пачкой)
+    Если в порции есть уже зарегистрированные или повторяющиеся телефоны,
+    порция откатывается до точки сохранения - только она, а не вся
+    транзакция вызывающего - и поднимается DuplicatePhoneError со списком
+    номеров: чужие записи не перезаписываются. Возвращает ID записей по порядку
+    """
+    cursor = conn.cursor()
+    cursor.execute('SAVEPOINT insert_people')
+    try:
+        ids = insert_rows(
+            cursor, f'INSERT INTO {table} (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?)',
+            params)
+    except sqlite3.IntegrityError as e:
+        cursor.execute('ROLLBACK TO insert_people')
+        cursor.execute('RELEASE insert_people')
+        if 'phone_number' not in str(e):
+            raise
+        phones = [values[3] for values in params]
+        placeholders = ', '.join('?' * len(phones))
+        duplicates = {row[0] for row in cursor.execute(
+            f'SELECT phone_number FROM {table} WHERE phone_number IN ({placeholders})', phones)}
+        seen = set()
+        for phone in phones:
+            if phone in seen:
+                duplicates.add(phone)
+            seen.add(phone)
+        raise DuplicatePhoneError(
+            f"Номера телефонов уже зарегистрированы: {', '.join(map(str, sorted(duplicates)))}") from None
+    cursor.execute('RELEASE insert_people')
+    return ids
+
+
+def upsert_people(conn, table, id_column, params):
+    """
+    Импорт порции людей с UPSERT по телефону (upsert_by_phone) под точкой
+    сохранения. Только для слияния с внешними данными, не для регистрации.
+    Возвращает ID записей по порядку
+    """
+    cursor = conn.cursor()
+    cursor.execute('SAVEPOINT upsert_people')
+    try:
+        ids = [upsert_by_phone(cursor, table, id_column, values) for values in params]
+    except sqlite3.Error:
+        cursor.execute('ROLLBACK TO upsert_people')
+        cursor.execute('RELEASE upsert_people')
+        raise
+    cursor.execute('RELEASE upsert_people')
+    return ids
+
+# Поиск клиентов с опечатками: минимальное сходство слова и число кандидатов
+# триграммного поиска на одну позицию результата
+FUZZY_MIN_SIMILARITY = 0.6
+FUZZY_CANDIDATES = 10
+
+
+def search_words(query):
+    """Слова поискового запроса в нижнем регистре"""
+    return [word.lower() for word in re.findall(r'\w+', query or '')]
+
+
+def word_similarity(word, client):
+    """Сходство слова запроса с ближайшим словом клиента (0..1)"""
+    phone = str(client.phone_number)
+    if word.isdigit():
+        return 1.0 if word in phone else 0.0
+    candidates = [client.last_name, client.name, client.patronymic]
+    return max(SequenceMatcher(None, word, candidate.lower()).ratio() for candidate in candidates)
+
+
+SLOT_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def parse_slot_time(value):
+    """Разбирает время слота в формате ГГГГ-ММ-ДД ЧЧ:ММ"""
+    try:
+        return datetime.strptime(value, SLOT_TIME_FORMAT)
+    except (TypeError, ValueError):
+        raise ValueError("Неверный формат времени! Пример: 2025-05-20 10:00") from None
+
+
+def encode_page_token(key):
+    """Непрозрачный токен страницы из последнего ключа страницы"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_page_token(page_token, key_type=int):
+    """
+    Последний ключ предыдущей страницы из токена
+    Токен приходит от клиента, поэтому кроме base64 и JSON проверяется, что
+    внутри скаляр ожидаемого типа (key_type): список или объект иначе дошел
+    бы до cursor.execute или до сравнения с ключами
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(page_token.encode()))
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Неверный токен страницы") from None
+    if isinstance(key, bool) or not isinstance(key, key_type):
+        raise ValueError("Неверный токен страницы")
+    return key
+
+
+def fetch_page(db, select_sql, key_column, row_factory, key_of, page_token=None, limit=50, key_type=int):
+    """
+    Keyset-пагинация: строки с ключом больше последнего ключа предыдущей страницы
+    Возвращает (элементы страницы, токен следующей страницы или None)
+    """
+    if limit < 1:
+        raise ValueError("Размер страницы должен быть положительным числом")
+    params = []
+    sql = select_sql
+    if page_token is not None:
+        sql += f' WHERE {key_column} > ?'
+        params.append(decode_page_token(page_token, key_type))
+    sql += f' ORDER BY {key_column} LIMIT ?'
+    params.append(limit + 1)
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = row_factory
+        cursor.execute(sql, params)
+        items = cursor.fetchall()
+    if len(items) > limit:
+        items = items[:limit]
+        return items, encode_page_token(key_of(items[-1]))
+    return items, None
+
+
+def page_of_items(items, key_of, page_token=None, limit=50, key_type=str):
+    """Та же keyset-пагинация для справочника, уже загруженного в память"""
+    if limit < 1:
+        raise ValueError("Размер страницы должен быть положительным числом")
+    items = sorted(items, key=key_of)
+    if page_token is not None:
+        after = decode_page_token(page_token, key_type)
+        items = [item for item in items if key_of(item) > after]
+    if len(items) > limit:
+        items = items[:limit]
+        return items, encode_page_token(key_of(items[-1]))
+    return items, None
+
+
+def iter_pages(find_page, batch_size=1000):
+    """Ленивый обход всех страниц: соединение берется только на время чтения страницы"""
+    page_token = None
+    while True:
+        items, page_token = find_page(page_token, batch_size)
+        yield from items
+        if page_token is None:
+            return
+
 
 class ClientRepository:
-    def __init__(self, db):
+    def __init__(self, db, cache=None):
         self.db = db
+        self.cache = cache  # необязательный LRUCache по Client_ID
 
     def find_all(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client')
-        clients = []
-        for row in cursor.fetchall():
-            clients.append(Client(row[0], row[1], row[2], row[3], row[4], row[5]))
-        conn.close()
-        return clients
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Client.from_row
+            cursor.execute('SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client')
+            return cursor.fetchall()
 
     def find_by_id(self, client_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client WHERE Client_ID = ?',
-            (client_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return Client(row[0], row[1], row[2], row[3], row[4], row[5])
+        if self.cache is not None:
+            client = self.cache.get(client_id)
+            if client is not None:
+                return client
+            version = self.cache.version
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Client.from_row
+            cursor.execute(
+                'SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client WHERE Client_ID = ?',
+                (client_id,))
+            client = cursor.fetchone()
+        if client is not None and self.cache is not None:
+            self.cache.put(client_id, client, version)
+        return client
+
+    def invalidate(self, client_id):
+        """
+        Сбрасывает запись клиента в кэше после изменения или удаления
+        Внутри транзакции сброс повторяется после COMMIT: иначе параллельный
+        читатель успеет вернуть в кэш еще не удаленную строку
+        """
+        if self.cache is not None:
+            self.cache.invalidate(client_id)
+            self.db.after_commit(lambda: self.cache.invalidate(client_id))
+
+    def delete(self, client_id):
+        """Удаляет клиента (заявки клиента должны быть удалены раньше), возвращает True, если он был"""
+        with self.db.connection() as conn:
+            affected_rows = conn.execute('DELETE FROM Client WHERE Client_ID = ?', (client_id,)).rowcount
+        self.invalidate(client_id)
+        return affected_rows > 0
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def find_by_phone(self, phone_number):
+        """Поиск по номеру телефона через UNIQUE-индекс phone_number"""
+        try:
+            phone_number = int(phone_number)
+        except (TypeError, ValueError):
+            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Client.from_row
+            cursor.execute(
+                'SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client WHERE phone_number = ?',
+                (phone_number,))
+            return cursor.fetchone()
+
+    def authenticate(self, name, phone_number):
+        """
+        Проверка имени и телефона: строка ищется по индексу телефона,
+        имя сравнивается без учета регистра (SQLite lower() не знает кириллицу)
+        """
+        client = self.find_by_phone(phone_number)
+        if client and client.name.lower() == name.lower():
+            return client
         return None
 
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Поиск клиентов по ФИО, email и телефону через FTS5
+        Должны найтись все слова запроса. Сначала идут клиенты, у которых слова
+        совпали целиком, затем совпавшие по началу слова; если не нашлось
+        ничего и fuzzy=True - поиск с опечатками. Внутри каждой ступени
+        результаты упорядочены по релевантности (bm25)
+        """
+        words = search_words(query)
+        if not words:
+            return []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Client.from_row
+            clients = self._match(cursor, 'ClientSearch', ' '.join(f'"{word}"' for word in words), limit)
+            if len(clients) < limit:
+                found = {client.Client_ID for client in clients}
+                prefixed = self._match(cursor, 'ClientSearch', ' '.join(f'"{word}"*' for word in words),
+                                       limit + len(found))
+                clients.extend(client for client in prefixed if client.Client_ID not in found)
+            if fuzzy and not clients:
+                clients = self._search_fuzzy(cursor, words, limit)
+        return clients[:limit]
+
+    def _match(self, cursor, table, match, limit):
+        """Первые limit клиентов по релевантности (bm25), подходящих под выражение FTS5"""
+        # ORDER BY rank внутри подзапроса: FTS5 ранжирует все совпадения и
+        # только потом обрезает по LIMIT, поэтому первые по Client_ID
+        # совпадения не вытесняют лучшие
+        cursor.execute(f'''
+            SELECT c.Client_ID, c.last_name, c.name, c.patronymic, c.phone_number, c.email
+            FROM (SELECT rowid, rank FROM {table} WHERE {table} MATCH ? ORDER BY rank LIMIT ?) s
+            JOIN Client c ON c.Client_ID = s.rowid
+            ORDER BY s.rank, c.Client_ID
+        ''', (match, limit))
+        return cursor.fetchall()
+
+    def _search_fuzzy(self, cursor, words, limit):
+        """
+        Поиск с опечатками по триграммам (ClientTrigram ищет подстроки)
+        Кандидат должен содержать хотя бы одну триграмму каждого слова
+        запроса, а bm25 ставит выше клиентов с большим числом общих и более
+        редких триграмм - частая триграмма вроде "нов" не вытесняет настоящее
+        совпадение. Так находятся и короткие слова ("Ивнов"). Цифры ищутся
+        как часть телефона. Кандидаты пересортировываются по сходству слов,
+        слишком непохожие отбрасываются
+        """
+        conditions = []
+        for word in words:
+            if len(word) < 3:
+                continue
+            if word.isdigit():
+                conditions.append(f'"{word}"')
+                continue
+            trigrams = dict.fromkeys(word[i:i + 3] for i in range(len(word) - 2))
+            conditions.append('(' + ' OR '.join(f'"{trigram}"' for trigram in trigrams) + ')')
+        if not conditions:
+            return []
+        candidates = self._match(cursor, 'ClientTrigram', ' AND '.join(conditions), limit * FUZZY_CANDIDATES)
+        scored = []
+        for client in candidates:
+            similarity = sum(word_similarity(word, client) for word in words) / len(words)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, client))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [client for _, client in scored[:limit]]
+
+    def insert_many(self, clients, chunk_size=500):
+        """
+        Пакетная вставка новых записей через executemany
+        Каждая порция из chunk_size записей - одна транзакция (внутри
+        db.transaction() - часть общей). Уже зарегистрированный телефон -
+        DuplicatePhoneError, порция не записывается. Возвращает присвоенные ID
+        """
+        return self._insert_chunks(clients, chunk_size, insert_people)
+
+    def merge_many(self, clients, chunk_size=500):
+        """
+        Импорт клиентов из внешнего источника со слиянием по телефону
+        (UPSERT): запись с тем же телефоном обновляется. Регистрация
+        (save, insert_many) этим путем не пользуется
+        """
+        return self._insert_chunks(clients, chunk_size, upsert_people)
+
+    def _insert_chunks(self, clients, chunk_size, insert_chunk):
+        ids = []
+        with self.db.connection() as conn:
+            for chunk in chunked(clients, chunk_size):
+                chunk_ids = insert_chunk(
+                    conn, 'Client', 'Client_ID',
+                    [(client.last_name, client.name, client.patronymic, client.phone_number, client.email) for client in chunk])
+                self.db.commit_chunk(conn)
+                for client, client_id in zip(chunk, chunk_ids):
+                    client.Client_ID = client_id
+                    self.invalidate(client_id)
+                ids.extend(chunk_ids)
+        return ids
+
+    def save_many(self, clients, chunk_size=500):
+        """Пакетное сохранение: новые записи вставляются, существующие обновляются"""
+        clients = list(clients)
+        self.insert_many([client for client in clients if not client.Client_ID], chunk_size)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked((client for client in clients if client.Client_ID), chunk_size):
+                cursor.executemany(
+                    'UPDATE Client SET last_name = ?, name = ?, patronymic = ?, phone_number = ?, email = ? WHERE Client_ID = ?',
+                    [(client.last_name, client.name, client.patronymic, client.phone_number, client.email, client.Client_ID)
+                     for client in chunk])
+                self.db.commit_chunk(conn)
+                for client in chunk:
+                    self.invalidate(client.Client_ID)
+        return clients
+
     def save(self, client):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        if client.Client_ID:
-            cursor.execute(
-                'UPDATE Client SET last_name = ?, name = ?, patronymic = ?, phone_number = ?, email = ? WHERE Client_ID = ?',
-                (client.last_name, client.name, client.patronymic, client.phone_number, client.email, client.Client_ID))
-        else:
-            cursor.execute(
-                'INSERT INTO Client (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?)',
-                (client.last_name, client.name, client.patronymic, client.phone_number, client.email))
-            client.Client_ID = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        """
+        Регистрация или изменение клиента
+        Занятый другим клиентом телефон - DuplicatePhoneError: чужая запись
+        не перезаписывается (UPSERT только у импорта merge_many)
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            values = (client.last_name, client.name, client.patronymic, client.phone_number, client.email)
+            if client.Client_ID:
+                try:
+                    cursor.execute(
+                        'UPDATE Client SET last_name = ?, name = ?, patronymic = ?, phone_number = ?, email = ? WHERE Client_ID = ?',
+                        values + (client.Client_ID,))
+                except sqlite3.IntegrityError as e:
+                    check_duplicate_phone(e, client.phone_number)
+                    raise
+            else:
+                client.Client_ID = insert_person(cursor, 'Client', 'Client_ID', values)
+        self.invalidate(client.Client_ID)
         return client
 
+    def find_page(self, page_token=None, limit=50):
+        """Страница клиентов по возрастанию Client_ID: (клиенты, токен следующей страницы)"""
+        return fetch_page(self.db, 'SELECT Client_ID, last_name, name, patronymic, phone_number, email FROM Client',
+                          'Client_ID', Client.from_row, lambda client: client.Client_ID, page_token, limit)
+
+    def iter_all(self, batch_size=1000):
+        """Ленивый обход всех клиентов порциями по batch_size"""
+        return iter_pages(self.find_page, batch_size)
+
+    def find_existing_ids(self, client_ids, chunk_size=500):
+        """Возвращает множество ID из client_ids, которые есть в таблице Client"""
+        existing = set()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(set(client_ids), chunk_size):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f'SELECT Client_ID FROM Client WHERE Client_ID IN ({placeholders})', chunk)
+                existing.update(row[0] for row in cursor.fetchall())
+        return existing
+
 class AdminRepository:
     def __init__(self, db):
         self.db = db
 
     def find_all(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT Admin_ID, last_name, name, patronymic, phone_number, email FROM Admin')
-        admins = []
-        for row in cursor.fetchall():
-            admins.append(Admin(row[0], row[1], row[2], row[3], row[4], row[5]))
-        conn.close()
-        return admins
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Admin.from_row
+            cursor.execute('SELECT Admin_ID, last_name, name, patronymic, phone_number, email FROM Admin')
+            return cursor.fetchall()
 
     def find_by_id(self, admin_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT Admin_ID, last_name, name, patronymic, phone_number, email FROM Admin WHERE Admin_ID = ?',
-            (admin_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return Admin(row[0], row[1], row[2], row[3], row[4], row[5])
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Admin.from_row
+            cursor.execute(
+                'SELECT Admin_ID, last_name, name, patronymic, phone_number, email FROM Admin WHERE Admin_ID = ?',
+                (admin_id,))
+            return cursor.fetchone()
+
+    def find_by_phone(self, phone_number):
+        """Поиск по номеру телефона через UNIQUE-индекс phone_number"""
+        try:
+            phone_number = int(phone_number)
+        except (TypeError, ValueError):
+            return None
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Admin.from_row
+            cursor.execute(
+                'SELECT Admin_ID, last_name, name, patronymic, phone_number, email FROM Admin WHERE phone_number = ?',
+                (phone_number,))
+            return cursor.fetchone()
+
+    def authenticate(self, name, phone_number):
+        """
+        Проверка имени и телефона: строка ищется по индексу телефона,
+        имя сравнивается без учета регистра (SQLite lower() не знает кириллицу)
+        """
+        admin = self.find_by_phone(phone_number)
+        if admin and admin.name.lower() == name.lower():
+            return admin
         return None
 
+    def find_page(self, page_token=None, limit=50):
+        """Страница администраторов по возрастанию Admin_ID: (администраторы, токен следующей страницы)"""
+        return fetch_page(self.db, 'SELECT Admin_ID, last_name, name, patronymic, phone_number, email FROM Admin',
+                          'Admin_ID', Admin.from_row, lambda admin: admin.Admin_ID, page_token, limit)
+
+    def iter_all(self, batch_size=1000):
+        """Ленивый обход всех администраторов порциями по batch_size"""
+        return iter_pages(self.find_page, batch_size)
+
+    def insert_many(self, admins, chunk_size=500):
+        """
+        Пакетная вставка новых записей через executemany
+        Каждая порция из chunk_size записей - одна транзакция (внутри
+        db.transaction() - часть общей). Уже зарегистрированный телефон -
+        DuplicatePhoneError, порция не записывается. Возвращает присвоенные ID
+        """
+        ids = []
+        with self.db.connection() as conn:
+            for chunk in chunked(admins, chunk_size):
+                chunk_ids = insert_people(
+                    conn, 'Admin', 'Admin_ID',
+                    [(admin.last_name, admin.name, admin.patronymic, admin.phone_number, admin.email) for admin in chunk])
+                self.db.commit_chunk(conn)
+                for admin, admin_id in zip(chunk, chunk_ids):
+                    admin.Admin_ID = admin_id
+                ids.extend(chunk_ids)
+        return ids
+
+    def save_many(self, admins, chunk_size=500):
+        """Пакетное сохранение: новые записи вставляются, существующие обновляются"""
+        admins = list(admins)
+        self.insert_many([admin for admin in admins if not admin.Admin_ID], chunk_size)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked((admin for admin in admins if admin.Admin_ID), chunk_size):
+                cursor.executemany(
+                    'UPDATE Admin SET last_name = ?, name = ?, patronymic = ?, phone_number = ?, email = ? WHERE Admin_ID = ?',
+                    [(admin.last_name, admin.name, admin.patronymic, admin.phone_number, admin.email, admin.Admin_ID)
+                     for admin in chunk])
+                self.db.commit_chunk(conn)
+        return admins
+
     def save(self, admin):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        if admin.Admin_ID:
-            cursor.execute(
-                'UPDATE Admin SET last_name = ?, name = ?, patronymic = ?, phone_number = ?, email = ? WHERE Admin_ID = ?',
-                (admin.last_name, admin.name, admin.patronymic, admin.phone_number, admin.email, admin.Admin_ID))
-        else:
-            cursor.execute(
-                'INSERT INTO Admin (last_name, name, patronymic, phone_number, email) VALUES (?, ?, ?, ?, ?)',
-                (admin.last_name, admin.name, admin.patronymic, admin.phone_number, admin.email))
-            admin.Admin_ID = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return admin
+        """Добавление или изменение администратора; занятый телефон - DuplicatePhoneError"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            values = (admin.last_name, admin.name, admin.patronymic, admin.phone_number, admin.email)
+            if admin.Admin_ID:
+                try:
+                    cursor.execute(
+                        'UPDATE Admin SET last_name = ?, name = ?, patronymic = ?, phone_number = ?, email = ? WHERE Admin_ID = ?',
+                        values + (admin.Admin_ID,))
+                except sqlite3.IntegrityError as e:
+                    check_duplicate_phone(e, admin.phone_number)
+                    raise
+            else:
+                admin.Admin_ID = insert_person(cursor, 'Admin', 'Admin_ID', values)
+            return admin
 
 class ApplicationStatusRepository:
+    """Справочник статусов: чтения идут через кэш в памяти, запись сбрасывает кэш"""
     def __init__(self, db):
         self.db = db
+        self.cache = ReferenceCache(self._load_all, lambda status: status.ApplicationStatus_ID)
+
+    def warm_up(self):
+        """Загружает справочник в кэш при старте"""
+        self.cache.warm_up()
+
+    def cache_stats(self):
+        return self.cache.stats()
 
     def find_all(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT ApplicationStatus_ID, name, comment FROM ApplicationStatus')
-        statuses = []
-        for row in cursor.fetchall():
-            statuses.append(ApplicationStatus(row[0], row[1], row[2]))
-        conn.close()
-        return statuses
+        return self.cache.all()
 
     def find_by_id(self, status_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT ApplicationStatus_ID, name, comment FROM ApplicationStatus WHERE ApplicationStatus_ID = ?',
-            (status_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return ApplicationStatus(row[0], row[1], row[2])
-        return None
+        return self.cache.get(status_id)
+
+    def find_page(self, page_token=None, limit=50):
+        """Страница справочника по возрастанию ApplicationStatus_ID (из кэша)"""
+        return page_of_items(self.cache.all(), lambda status: status.ApplicationStatus_ID, page_token, limit)
+
+    def iter_all(self, batch_size=1000):
+        return iter_pages(self.find_page, batch_size)
+
+    def save(self, status):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'INSERT OR REPLACE INTO ApplicationStatus (ApplicationStatus_ID, name, comment) VALUES (?, ?, ?)',
+                (status.ApplicationStatus_ID, status.name, status.comment))
+        self.cache.invalidate()
+        return status
+
+    def find_transitions(self):
+        """Разрешенные переходы статусов: {исходный статус: [целевые статусы]}"""
+        with self.db.connection() as conn:
+            transitions = {}
+            for from_status, to_status in conn.execute(
+                    'SELECT from_status, to_status FROM StatusTransition ORDER BY from_status, to_status'):
+                transitions.setdefault(from_status, []).append(to_status)
+            return transitions
+
+    def _load_all(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = ApplicationStatus.from_row
+            cursor.execute('SELECT ApplicationStatus_ID, name, comment FROM ApplicationStatus')
+            return cursor.fetchall()
 
 class PollutionStatusRepository:
+    """Справочник степеней загрязнения: чтения идут через кэш в памяти, запись сбрасывает кэш"""
     def __init__(self, db):
         self.db = db
+        self.cache = ReferenceCache(self._load_all, lambda status: status.PollutionStatus_ID)
+
+    def warm_up(self):
+        """Загружает справочник в кэш при старте"""
+        self.cache.warm_up()
+
+    def cache_stats(self):
+        return self.cache.stats()
 
     def find_all(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT PollutionStatus_ID, name, comment FROM PollutionStatus')
-        statuses = []
-        for row in cursor.fetchall():
-            statuses.append(PollutionStatus(row[0], row[1], row[2]))
-        conn.close()
-        return statuses
+        return self.cache.all()
 
     def find_by_id(self, status_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT PollutionStatus_ID, name, comment FROM PollutionStatus WHERE PollutionStatus_ID = ?',
-                       (status_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return PollutionStatus(row[0], row[1], row[2])
-        return None
+        return self.cache.get(status_id)
+
+    def find_page(self, page_token=None, limit=50):
+        """Страница справочника по возрастанию PollutionStatus_ID (из кэша)"""
+        return page_of_items(self.cache.all(), lambda status: status.PollutionStatus_ID, page_token, limit)
+
+    def iter_all(self, batch_size=1000):
+        return iter_pages(self.find_page, batch_size)
+
+    def save(self, status):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'INSERT OR REPLACE INTO PollutionStatus (PollutionStatus_ID, name, comment) VALUES (?, ?, ?)',
+                (status.PollutionStatus_ID, status.name, status.comment))
+        self.cache.invalidate()
+        return status
+
+    def _load_all(self):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = PollutionStatus.from_row
+            cursor.execute('SELECT PollutionStatus_ID, name, comment FROM PollutionStatus')
+            return cursor.fetchall()
+
+APPLICATION_RELATIONS_SQL = '''
+    SELECT a.Application_ID, a.Number_of_items,
+           c.Client_ID, c.last_name, c.name, c.patronymic, c.phone_number, c.email,
+           p.PollutionStatus_ID, p.name, p.comment,
+           s.ApplicationStatus_ID, s.name, s.comment,
+           t.start_time
+    FROM Application a
+    LEFT JOIN Client c ON c.Client_ID = a.Client_ID
+    LEFT JOIN PollutionStatus p ON p.PollutionStatus_ID = a.PollutionStatus_ID
+    LEFT JOIN ApplicationStatus s ON s.ApplicationStatus_ID = a.ApplicationStatus_ID
+    LEFT JOIN Slot t ON t.Slot_ID = a.Slot_ID
+'''
+
+
+def application_relations_from_row(row):
+    """Собирает вложенный словарь заявки со связанными данными из строки JOIN-запроса"""
+    return {
+        "application_id": row[0],
+        "number_of_items": row[1],
+        "client": {
+            "client_id": row[2],
+            "last_name": row[3],
+            "name": row[4],
+            "patronymic": row[5],
+            "phone_number": row[6],
+            "email": row[7]
+        },
+        "pollution_status": {
+            "pollution_status_id": row[8],
+            "name": row[9],
+            "comment": row[10]
+        },
+        "application_status": {
+            "application_status_id": row[11],
+            "name": row[12],
+            "comment": row[13]
+        },
+        "time_of_receipt": row[14]
+    }
+
+# Условная смена статуса: параметры (новый статус, ID заявки, ожидаемая версия
+# или NULL, новый статус). Проверка перехода и версии и запись - одна инструкция,
+# поэтому параллельные изменения одной заявки не теряются и не нужны блокировки
+TRANSITION_SQL = '''
+    UPDATE Application SET ApplicationStatus_ID = ?, version = version + 1
+    WHERE Application_ID = ?
+      AND (?3 IS NULL OR version = ?3)
+      AND EXISTS (SELECT 1 FROM StatusTransition t
+                  WHERE t.from_status = Application.ApplicationStatus_ID AND t.to_status = ?4)
+'''
+
+
+# Статусы, в которых заявка может быть создана; дальше - только по StatusTransition
+INITIAL_STATUSES = ('IN_PROGRESS',)
+
+
+class StatusConflictError(ValueError):
+    """Заявку изменили одновременно с этим запросом (версия не совпала)"""
+
 
 class ApplicationRepository:
-    def __init__(self, db):
+    def __init__(self, db, cache=None):
         self.db = db
+        self.cache = cache  # необязательный LRUCache по Application_ID
+
+    def invalidate(self, application_id):
+        """Сбрасывает запись заявки в кэше после изменения или удаления (и повторно после COMMIT)"""
+        if self.cache is not None:
+            self.cache.invalidate(application_id)
+            self.db.after_commit(lambda: self.cache.invalidate(application_id))
+
+    def invalidate_client(self, client_id):
+        """Сбрасывает в кэше все заявки клиента (и повторно после COMMIT)"""
+        if self.cache is not None:
+            def invalidate():
+                self.cache.invalidate_where(lambda application: application.Client_ID == client_id)
+            invalidate()
+            self.db.after_commit(invalidate)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
 
     def find_all(self):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID FROM Application')
-        applications = []
-        for row in cursor.fetchall():
-            applications.append(Application(row[0], row[1], row[2], row[3], row[4]))
-        conn.close()
-        return applications
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Application.from_row
+            cursor.execute(
+                'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID, version FROM Application ORDER BY Application_ID')
+            return cursor.fetchall()
 
-    def find_by_client_id(self, client_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID FROM Application WHERE Client_ID = ?',
-            (client_id,))
+    def find_all_with_relations(self):
+        """Все заявки вместе с клиентом и статусами одним JOIN-запросом"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(APPLICATION_RELATIONS_SQL + ' ORDER BY a.Application_ID')
+            return [application_relations_from_row(row) for row in cursor.fetchall()]
+
+    def iter_all_with_relations(self, batch_size=1000):
+        """
+        Генератор заявок со связанными данными
+        Строки читаются из курсора порциями по batch_size, поэтому память
+        не зависит от размера таблицы
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(APPLICATION_RELATIONS_SQL + ' ORDER BY a.Application_ID')
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield application_relations_from_row(row)
+
+    def find_page(self, page_token=None, limit=50):
+        """Страница заявок по возрастанию Application_ID: (заявки, токен следующей страницы)"""
+        return fetch_page(
+            self.db,
+            'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID, version FROM Application',
+            'Application_ID', Application.from_row, lambda application: application.Application_ID, page_token, limit)
+
+    def iter_all(self, batch_size=1000):
+        """Ленивый обход всех заявок порциями по batch_size"""
+        return iter_pages(self.find_page, batch_size)
+
+    def find_page_with_relations(self, page_token=None, limit=50):
+        """Страница заявок со связанными данными: (словари заявок, токен следующей страницы)"""
+        return fetch_page(self.db, APPLICATION_RELATIONS_SQL, 'a.Application_ID',
+                          lambda cursor, row: application_relations_from_row(row),
+                          lambda application: application["application_id"], page_token, limit)
+
+    def find_with_relations_by_ids(self, application_ids, chunk_size=500):
+        """Заявки с указанными ID со связанными данными, по возрастанию ID"""
         applications = []
-        for row in cursor.fetchall():
-            applications.append(Application(row[0], row[1], row[2], row[3], row[4]))
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(sorted(set(application_ids)), chunk_size):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(APPLICATION_RELATIONS_SQL + f' WHERE a.Application_ID IN ({placeholders}) '
+                               'ORDER BY a.Application_ID', chunk)
+                applications.extend(application_relations_from_row(row) for row in cursor.fetchall())
         return applications
 
-    def save(self, application):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        if application.Application_ID:
+    def find_by_client_id_with_relations(self, client_id):
+        """Заявки клиента вместе с клиентом и статусами одним JOIN-запросом"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(APPLICATION_RELATIONS_SQL + ' WHERE a.Client_ID = ? ORDER BY a.Application_ID',
+                           (client_id,))
+            return [application_relations_from_row(row) for row in cursor.fetchall()]
+
+    def find_by_client_id(self, client_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Application.from_row
             cursor.execute(
-                'UPDATE Application SET Client_ID = ?, Number_of_items = ?, PollutionStatus_ID = ?, ApplicationStatus_ID = ? WHERE Application_ID = ?',
-                (application.Client_ID, application.Number_of_items, application.PollutionStatus_ID,
-                 application.ApplicationStatus_ID, application.Application_ID))
-        else:
+                'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID, version FROM Application WHERE Client_ID = ? ORDER BY Application_ID',
+                (client_id,))
+            return cursor.fetchall()
+
+    def find_by_status(self, status_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Application.from_row
             cursor.execute(
-                'INSERT INTO Application (Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID) VALUES (?, ?, ?, ?)',
-                (application.Client_ID, application.Number_of_items, application.PollutionStatus_ID,
-                 application.ApplicationStatus_ID))
-            application.Application_ID = cursor.lastrowid
-        conn.commit()
-        conn.close()
+                'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID, version FROM Application WHERE ApplicationStatus_ID = ? ORDER BY Application_ID',
+                (status_id,))
+            return cursor.fetchall()
+
+    def save(self, application):
+        """
+        Создание или изменение заявки
+        Статус существующей заявки здесь не меняется: UPDATE проходит, только
+        если статус в объекте совпадает с записанным, смена статуса идет через
+        update_status и граф переходов StatusTransition
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            if application.Application_ID:
+                row = cursor.execute(
+                    'UPDATE Application SET Client_ID = ?, Number_of_items = ?, PollutionStatus_ID = ?, Slot_ID = ?, version = version + 1 '
+                    'WHERE Application_ID = ? AND ApplicationStatus_ID = ? RETURNING version',
+                    (application.Client_ID, application.Number_of_items, application.PollutionStatus_ID,
+                     application.Slot_ID, application.Application_ID, application.ApplicationStatus_ID)).fetchone()
+                if row is None:
+                    self._raise_not_saved(cursor, application)
+                application.version = row[0]
+            else:
+                cursor.execute(
+                    'INSERT INTO Application (Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID) VALUES (?, ?, ?, ?, ?)',
+                    (application.Client_ID, application.Number_of_items, application.PollutionStatus_ID,
+                     application.ApplicationStatus_ID, application.Slot_ID))
+                application.Application_ID = cursor.lastrowid
+        self.invalidate(application.Application_ID)
         return application
 
+    def _raise_not_saved(self, cursor, application):
+        """Объясняет, почему UPDATE заявки не изменил ни одной строки"""
+        row = cursor.execute('SELECT ApplicationStatus_ID FROM Application WHERE Application_ID = ?',
+                             (application.Application_ID,)).fetchone()
+        if row is None:
+            raise ValueError(f"Заявка с ID {application.Application_ID} не существует")
+        raise ValueError(f"Статус заявки {application.Application_ID} ({row[0]}) меняется только через "
+                         f"смену статуса, а не сохранением заявки")
+
     def find_by_id(self, application_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID FROM Application WHERE Application_ID = ?',
-            (application_id,))
-        row = cursor.fetchone()
-        conn.close()
-        if row:
-            return Application(row[0], row[1], row[2], row[3], row[4])
-        return None
+        if self.cache is not None:
+            application = self.cache.get(application_id)
+            if application is not None:
+                return application
+            version = self.cache.version
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Application.from_row
+            cursor.execute(
+                'SELECT Application_ID, Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID, version FROM Application WHERE Application_ID = ?',
+                (application_id,))
+            application = cursor.fetchone()
+        if application is not None and self.cache is not None:
+            self.cache.put(application_id, application, version)
+        return application
 
-    def update_status(self, application_id, status_id):
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE Application SET ApplicationStatus_ID = ? WHERE Application_ID = ?',
-                       (status_id, application_id))
-        affected_rows = cursor.rowcount
-        conn.commit()
-        conn.close()
+    def insert_many(self, applications, chunk_size=500):
+        """
+        Пакетная вставка новых заявок через executemany
+        Каждая порция из chunk_size заявок - одна транзакция. Возвращает присвоенные ID
+        """
+        ids = []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(applications, chunk_size):
+                chunk_ids = insert_rows(
+                    cursor,
+                    'INSERT INTO Application (Client_ID, Number_of_items, PollutionStatus_ID, ApplicationStatus_ID, Slot_ID) VALUES (?, ?, ?, ?, ?)',
+                    [(application.Client_ID, application.Number_of_items, application.PollutionStatus_ID,
+                      application.ApplicationStatus_ID, application.Slot_ID) for application in chunk])
+                self.db.commit_chunk(conn)
+                for application, application_id in zip(chunk, chunk_ids):
+                    application.Application_ID = application_id
+                ids.extend(chunk_ids)
+        return ids
+
+    def save_many(self, applications, chunk_size=500):
+        """Пакетное сохранение: новые заявки вставляются, существующие обновляются"""
+        applications = list(applications)
+        self.insert_many([application for application in applications if not application.Application_ID],
+                         chunk_size)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked((application for application in applications if application.Application_ID),
+                                 chunk_size):
+                # Как и в save(), статус не меняется: порция со сменой статуса
+                # или несуществующей заявкой откатывается целиком
+                cursor.execute('SAVEPOINT save_applications')
+                cursor.executemany(
+                    'UPDATE Application SET Client_ID = ?, Number_of_items = ?, PollutionStatus_ID = ?, Slot_ID = ?, version = version + 1 '
+                    'WHERE Application_ID = ? AND ApplicationStatus_ID = ?',
+                    [(application.Client_ID, application.Number_of_items, application.PollutionStatus_ID,
+                      application.Slot_ID, application.Application_ID, application.ApplicationStatus_ID) for application in chunk])
+                if cursor.rowcount != len(chunk):
+                    cursor.execute('ROLLBACK TO save_applications')
+                    cursor.execute('RELEASE save_applications')
+                    for application in chunk:
+                        if cursor.execute('SELECT 1 FROM Application WHERE Application_ID = ? AND ApplicationStatus_ID = ?',
+                                          (application.Application_ID, application.ApplicationStatus_ID)).fetchone() is None:
+                            self._raise_not_saved(cursor, application)
+                    raise ValueError("Заявки изменены параллельно, повторите сохранение")
+                cursor.execute('RELEASE save_applications')
+                self.db.commit_chunk(conn)
+                for application in chunk:
+                    self.invalidate(application.Application_ID)
+        return applications
+
+    def update_status_many(self, application_ids, status_id, chunk_size=500):
+        """
+        Пакетная смена статуса заявок, возвращает количество обновленных строк
+        Заявки, для которых переход в status_id не разрешен, пропускаются
+        """
+        updated = 0
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(application_ids, chunk_size):
+                cursor.executemany(TRANSITION_SQL, [(status_id, application_id, None, status_id)
+                                                    for application_id in chunk])
+                updated += cursor.rowcount
+                self.db.commit_chunk(conn)
+                for application_id in chunk:
+                    self.invalidate(application_id)
+        return updated
+
+    def update_status(self, application_id, status_id, expected_version=None):
+        """
+        Смена статуса одной инструкцией UPDATE с проверкой перехода и версии
+        Заявка меняется, только если переход из ее текущего статуса в status_id
+        есть в StatusTransition и (если задана expected_version) версия не
+        изменилась. Возвращает новую версию или None, если условие не выполнено
+        """
+        with self.db.connection() as conn:
+            row = conn.execute(TRANSITION_SQL + ' RETURNING version',
+                               (status_id, application_id, expected_version, status_id)).fetchone()
+        self.invalidate(application_id)
+        return row[0] if row else None
+
+    def find_status_version(self, application_id):
+        """Текущие (статус, версия) заявки или None"""
+        with self.db.connection() as conn:
+            return conn.execute('SELECT ApplicationStatus_ID, version FROM Application WHERE Application_ID = ?',
+                                (application_id,)).fetchone()
+
+    def find_status_history(self, application_id):
+        """История смены статусов заявки, от ранних к поздним"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                'SELECT from_status, to_status, version, changed_at FROM ApplicationStatusHistory '
+                'WHERE Application_ID = ? ORDER BY History_ID', (application_id,))
+            return [{"from_status": row[0], "to_status": row[1], "version": row[2], "changed_at": row[3]}
+                    for row in cursor.fetchall()]
+
+    def delete(self, application_id):
+        with self.db.connection() as conn:
+            affected_rows = conn.execute('DELETE FROM Application WHERE Application_ID = ?',
+                                         (application_id,)).rowcount
+        self.invalidate(application_id)
         return affected_rows > 0
 
+    def delete_by_client(self, client_id):
+        """Удаляет все заявки клиента, возвращает их количество"""
+        with self.db.connection() as conn:
+            affected_rows = conn.execute('DELETE FROM Application WHERE Client_ID = ?', (client_id,)).rowcount
+        self.invalidate_client(client_id)
+        return affected_rows
+
+
+class SlotRepository:
+    """Слоты времени забора вещей. Занятость слота поддерживается триггерами таблицы Application"""
+    def __init__(self, db):
+        self.db = db
+
+    def find_by_id(self, slot_id):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Slot.from_row
+            cursor.execute('SELECT Slot_ID, start_time, end_time, capacity, booked FROM Slot WHERE Slot_ID = ?',
+                           (slot_id,))
+            return cursor.fetchone()
+
+    def find_by_start_time(self, start_time):
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Slot.from_row
+            cursor.execute('SELECT Slot_ID, start_time, end_time, capacity, booked FROM Slot WHERE start_time = ?',
+                           (start_time,))
+            return cursor.fetchone()
+
+    def find_page(self, page_token=None, limit=50):
+        """Страница слотов по возрастанию Slot_ID: (слоты, токен следующей страницы)"""
+        return fetch_page(self.db, 'SELECT Slot_ID, start_time, end_time, capacity, booked FROM Slot',
+                          'Slot_ID', Slot.from_row, lambda slot: slot.Slot_ID, page_token, limit)
+
+    def iter_all(self, batch_size=1000):
+        return iter_pages(self.find_page, batch_size)
+
+    def insert_many(self, slots, chunk_size=500):
+        """Пакетное создание слотов, уже существующие по start_time пропускаются"""
+        created = 0
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            for chunk in chunked(slots, chunk_size):
+                cursor.executemany(
+                    'INSERT OR IGNORE INTO Slot (start_time, end_time, capacity) VALUES (?, ?, ?)',
+                    [(slot.start_time, slot.end_time, slot.capacity) for slot in chunk])
+                created += cursor.rowcount
+                self.db.commit_chunk(conn)
+        return created
+
+    def find_nearest_free(self, desired_time, limit=5):
+        """
+        Ближайшие к desired_time свободные слоты (не больше limit)
+        Два поиска по частичному индексу idx_slot_free - вперед и назад от
+        желаемого времени, затем слияние по удаленности. Время приводится к
+        SLOT_TIME_FORMAT: строки сравниваются лексикографически, и "9:00" без
+        ведущего нуля оказалось бы позже "10:00"
+        """
+        desired = parse_slot_time(desired_time)
+        desired_time = desired.strftime(SLOT_TIME_FORMAT)
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Slot.from_row
+            cursor.execute(
+                'SELECT Slot_ID, start_time, end_time, capacity, booked FROM Slot '
+                'WHERE booked < capacity AND start_time >= ? ORDER BY start_time LIMIT ?',
+                (desired_time, limit))
+            later = cursor.fetchall()
+            cursor.execute(
+                'SELECT Slot_ID, start_time, end_time, capacity, booked FROM Slot '
+                'WHERE booked < capacity AND start_time < ? ORDER BY start_time DESC LIMIT ?',
+                (desired_time, limit))
+            earlier = cursor.fetchall()
+        candidates = sorted(later + earlier,
+                            key=lambda slot: abs((parse_slot_time(slot.start_time) - desired).total_seconds()))
+        return candidates[:limit]
+
+
+class ChangeLogRepository:
+    """
+    Журнал изменений заявок и клиентов (заполняется триггерами) и отметки
+    экспорта: до какого Change_ID изменения уже выгружены
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def last_change_id(self):
+        """Последний выданный Change_ID (берется из sqlite_sequence: журнал мог быть очищен prune)"""
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'").fetchone()
+            return row[0] if row else 0
+
+    def changed_application_ids(self, after_change_id, up_to_change_id):
+        """
+        ID заявок, затронутых изменениями с Change_ID в (after_change_id, up_to_change_id]:
+        измененные, добавленные и удаленные заявки, а также заявки измененных клиентов
+        """
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT row_id FROM ChangeLog
+                WHERE Change_ID > ? AND Change_ID <= ? AND table_name = 'Application'
+                UNION
+                SELECT Application_ID FROM Application
+                WHERE Client_ID IN (
+                    SELECT row_id FROM ChangeLog
+                    WHERE Change_ID > ? AND Change_ID <= ? AND table_name = 'Client'
+                )
+            ''', (after_change_id, up_to_change_id, after_change_id, up_to_change_id))
+            return {row[0] for row in cursor.fetchall()}
 
+    def get_watermark(self, name):
+        """Отметка экспорта name (None, если такой экспорт еще не выполнялся)"""
+        with self.db.connection() as conn:
+            row = conn.execute('SELECT change_id FROM ExportWatermark WHERE name = ?', (name,)).fetchone()
+            return row[0] if row else None
 
+    def save_watermark(self, name, change_id):
+        with self.db.connection() as conn:
+            conn.execute(
+                '''INSERT INTO ExportWatermark (name, change_id) VALUES (?, ?)
+                   ON CONFLICT(name) DO UPDATE SET change_id = excluded.change_id, exported_at = CURRENT_TIMESTAMP''',
+                (name, change_id))
 
+    def prune(self):
+        """Удаляет записи журнала, уже выгруженные всеми экспортами; возвращает их число"""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                'DELETE FROM ChangeLog WHERE Change_ID <= (SELECT COALESCE(MIN(change_id), 0) FROM ExportWatermark)')
+            return cursor.rowcount
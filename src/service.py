@@ -0,0 +1,115 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from src.database.db import Database
+from src.main import LaundrySystem
+
+
+class AsyncLaundryService:
+    """
+    Асинхронный сервисный слой над LaundrySystem
+    Операции доступны как корутины: работа с SQLite выполняется в
+    ограниченном пуле потоков, число одновременно выполняемых операций
+    ограничено семафором (concurrency), остальные ждут своей очереди.
+    """
+    def __init__(self, system=None, max_workers=8, concurrency=64):
+        if max_workers < 1 or concurrency < 1:
+            raise ValueError("Размер пула и лимит параллельности должны быть положительными")
+        # Пул соединений не меньше пула потоков, чтобы потоки не ждали соединений
+        self._owns_system = system is None
+        self.system = system or LaundrySystem(db=Database(pool_size=max_workers))
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="laundry-db")
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """
+        Останавливает пул потоков (дожидаясь начатых операций); созданный
+        сервисом LaundrySystem закрывается, переданный снаружи - нет
+        """
+        self._executor.shutdown(wait=True)
+        if self._owns_system:
+            self.system.close()
+
+    async def _run(self, func, *args, **kwargs):
+        """Выполняет блокирующую операцию LaundrySystem в пуле потоков"""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    # Клиенты
+    async def authenticate_client(self, name, phone_number):
+        return await self._run(self.system.authenticate_client, name, phone_number)
+
+    async def get_client_by_id(self, client_id):
+        return await self._run(self.system.get_client_by_id, client_id)
+
+    async def create_client(self, last_name, name, patronymic, phone_number, email):
+        return await self._run(self.system.create_client, last_name, name, patronymic, phone_number, email)
+
+    async def create_clients(self, rows):
+        return await self._run(self.system.create_clients, rows)
+
+    async def delete_client(self, client_id):
+        return await self._run(self.system.delete_client, client_id)
+
+    async def search_clients(self, query, limit=10, fuzzy=True):
+        return await self._run(self.system.search_clients, query, limit, fuzzy)
+
+    # Администраторы
+    async def authenticate_admin(self, name, phone_number):
+        return await self._run(self.system.authenticate_admin, name, phone_number)
+
+    async def create_admin(self, last_name, name, patronymic, phone_number, email):
+        return await self._run(self.system.create_admin, last_name, name, patronymic, phone_number, email)
+
+    async def delete_admin(self, admin_id):
+        return await self._run(self.system.delete_admin, admin_id)
+
+    # Заявки
+    async def create_application(self, client_id, pollution_status_id, application_status_id, number_of_items,
+                                 slot_id=None):
+        return await self._run(self.system.create_application, client_id, pollution_status_id,
+                               application_status_id, number_of_items, slot_id)
+
+    async def create_applications(self, rows):
+        return await self._run(self.system.create_applications, rows)
+
+    async def update_application_status(self, application_id, status_id, expected_version=None):
+        return await self._run(self.system.update_application_status, application_id, status_id, expected_version)
+
+    async def update_applications_status(self, application_ids, status_id):
+        return await self._run(self.system.update_applications_status, application_ids, status_id)
+
+    async def pay_application(self, application_id, idempotency_key=None):
+        return await self._run(self.system.pay_application, application_id, idempotency_key)
+
+    async def delete_application(self, application_id):
+        return await self._run(self.system.delete_application, application_id)
+
+    async def get_applications_by_client(self, client_id):
+        return await self._run(self.system.get_applications_by_client, client_id)
+
+    async def get_client_applications_with_relations(self, client_id):
+        return await self._run(self.system.get_client_applications_with_relations, client_id)
+
+    async def get_applications_page(self, page_token=None, limit=50):
+        return await self._run(self.system.application_repo.find_page_with_relations, page_token, limit)
+
+    # Справочники и время
+    async def get_all_pollution_statuses(self):
+        return await self._run(self.system.get_all_pollution_statuses)
+
+    async def get_all_application_statuses(self):
+        return await self._run(self.system.get_all_application_statuses)
+
+    async def find_alternative_slots(self, desired_time, limit=5):
+        return await self._run(self.system.find_alternative_slots, desired_time, limit)